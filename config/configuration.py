@@ -8,7 +8,83 @@ class DatasetConfig:
     raw_table: str = "LIUXIN_crf_product_reference"
     clean_table: str = "LIUXIN_crf_product_reference_cleaned"
     excluded_table: str = "LIUXIN_crf_product_reference_excluded"
+    # The working tables default to names derived from clean_table / excluded_table,
+    # so two configs never share them
+    delta_table: str = None # keys changed by the last incremental run, default <clean_table>_delta
+    delta_clean_table: str = None # cleaned rows of these keys, merged into the clean table, default <clean_table>_delta_clean
+    prediction_table: str = "LIUXIN_crf_product_reference_predicted" # output of the hierarchy prediction job
+    near_duplicate_table: str = None # pairs of the near_duplicate rule, to review, default <excluded_table>_near_duplicate
+    mapping_table: str = None # variant -> standard of the standarized brand columns, default <clean_table>_mapping
+
+    clean_clustering: str = "country_id, barcode" # clustering columns of the clean table (at most 4), None for none
+    excluded_clustering: str = "country_id, reason" # reason: the reasons of a row joined by ","
+    clean_partitioning: str = None # DATE / TIMESTAMP column partitioning the clean table, e.g. the watermark column
+    excluded_partitioning: str = None
+    partition_granularity: str = "DAY" # or "HOUR", "MONTH", "YEAR"
 
     dataset_type: str = "supermarket" # or "cinema"
     key_cle: str = "country_id, barcode"
-    main_barcode: str = "barcode"
\ No newline at end of file
+    main_barcode: str = "barcode"
+    hierarchy_cols: str = (
+        "hierarchy_level1_desc, local_hierarchy_level2_desc, local_hierarchy_level3_desc, "
+        "local_hierarchy_level4_desc, local_hierarchy_level5_desc, local_hierarchy_level6_desc"
+    ) # levels of the product hierarchy, from the root, checked by the hierarchy_consistency rule
+    taxonomy_table: str = None # reference taxonomy with the hierarchy_cols, default the frequent paths of the clean table
+    min_path_count: int = 5 # without taxonomy, a parent->child link seen fewer times is invalid
+
+    near_duplicate_model: str = "../sentence-transformers" # embedding model of the near_duplicate rule (or ONNX export folder)
+    near_duplicate_backend: str = "torch" # or "onnx-int8"
+    near_duplicate_threshold: float = 0.95 # minimum cosine similarity of two near-duplicate products
+    near_duplicate_block_cols: str = "country_id, local_brand_name" # only products of the same block are compared
+    near_duplicate_partitions: int = 16 # hash partitions of the blocks, each one is read and compared in memory
+    embedding_cache_dir: str = None # optional folder of the embedding cache of the near_duplicate rule
+
+    fuzzy_distance: int = 0 # > 0 also merges the standardized brands within this edit distance (e.g. LOREAL / LOREL)
+    mapping_path: str = None # optional CSV of the brand mapping, to review the merges
+
+    spell_cols: str = None # e.g. "item_desc", text columns spell-corrected after the cleaning
+    spell_index_path: str = "data/french_spell_index.pkl" # SymSpell index built by modules/generateDictionary.py
+    brand_cols: str = "local_brand_name, global_brand_name" # their words are never spell-corrected
+    spell_workers: int = 1 # worker processes of the spell correction
+
+    incremental: bool = False # clean/validate only the keys changed since the last run
+    watermark_col: str = None # e.g. a last update TIMESTAMP, required by the incremental mode
+
+    dry_run_check: bool = False # estimate each query with a dry run before submitting it
+    max_bytes_per_step: int = None # abort a step whose estimated bytes exceed this budget
+    report_path: str = None # optional JSON file of the per-step job stats
+    stage_cache_path: str = None # optional JSON file of the stage fingerprints, unchanged stages are skipped
+
+    backend: str = "bigquery" # or "local"
+    local_dir: str = "data" # folder of the <table>.parquet / <table>.csv files for the local backend
+    local_format: str = "parquet" # or "csv"
+
+    def __post_init__(self):
+        if self.delta_table is None:
+            self.delta_table = f"{self.clean_table}_delta"
+        if self.delta_clean_table is None:
+            self.delta_clean_table = f"{self.clean_table}_delta_clean"
+        if self.near_duplicate_table is None:
+            self.near_duplicate_table = f"{self.excluded_table}_near_duplicate"
+        if self.mapping_table is None:
+            self.mapping_table = f"{self.clean_table}_mapping"
+
+
+@dataclass
+class TrainingConfig:
+    batch_size: int = 512
+    epochs: int = 50
+    learning_rate: float = 0.001
+    hidden_dim: int = 128
+
+    threads: int = None # torch CPU threads, default all cores
+    compile: bool = False # torch.compile the model (graph compilation, slower first epoch)
+    num_workers: int = 0 # DataLoader worker processes
+
+    val_fraction: float = 0.1 # rows held out for the validation accuracy
+    patience: int = 3 # epochs without improvement of the validation accuracy before stopping
+    min_delta: float = 0.001 # minimal improvement of the mean per-level validation accuracy
+    seed: int = 42
+
+    checkpoint_path: str = None # checkpoint of the last epoch, resumed from if it exists
+    best_path: str = None # checkpoint of the best validation epoch
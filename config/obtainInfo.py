@@ -5,6 +5,7 @@
 from config.configuration import DatasetConfig
 from google.cloud import bigquery
 import pandas as pd
+from typing import Iterator
 
 def obtain_table_name(cfg:DatasetConfig, tableType: str) -> str:
     
@@ -14,19 +15,104 @@ def obtain_table_name(cfg:DatasetConfig, tableType: str) -> str:
         table = cfg.clean_table
     elif tableType == "excluded":
         table = cfg.excluded_table
+    elif tableType == "delta":
+        table = cfg.delta_table
+    elif tableType == "delta_clean":
+        table = cfg.delta_clean_table
+    elif tableType == "prediction":
+        table = cfg.prediction_table
+    elif tableType == "taxonomy":
+        table = cfg.taxonomy_table
+    elif tableType == "near_duplicate":
+        table = cfg.near_duplicate_table
+    elif tableType == "mapping":
+        table = cfg.mapping_table
     else:
-        raise ValueError("Invalid table type. Choose from 'raw', 'clean', or 'excluded'.")
+        raise ValueError("Invalid table type. Choose from 'raw', 'clean', 'excluded', 'delta', 'delta_clean', 'prediction', 'taxonomy', 'near_duplicate' or 'mapping'.")
     return table
 
-def obtain_dataframe(cfg:DatasetConfig,client:bigquery.Client, tableType: str) -> pd.DataFrame:
+def obtain_dataframe(cfg:DatasetConfig,client:bigquery.Client, tableType: str, columns: list = None) -> pd.DataFrame:
 
     table = obtain_table_name(cfg, tableType)
+    select_clause = ", ".join(columns) if columns else "*"
     data = client.query(f"""
-                        SELECT * FROM `{cfg.project}.{cfg.dataset}.{table}`
+                        SELECT {select_clause} FROM `{cfg.project}.{cfg.dataset}.{table}`
                         """).to_dataframe()
     
     return data
 
+def compact_dtypes(df: pd.DataFrame, categorical_ratio: float = 0.5, string_cols: list = None) -> pd.DataFrame:
+    """
+    Reduce the memory of the text columns of a dataframe:
+    low-cardinality columns (distinct values <= categorical_ratio * rows) become
+    categorical, the others Arrow-backed strings instead of Python objects.
+
+    Args:
+        string_cols: Columns holding text (the STRING fields of the schema), default
+            all the object columns. NUMERIC (Decimal), DATE and REPEATED columns are
+            objects too and must not be converted
+    """
+    for col in df.columns if string_cols is None else [col for col in string_cols if col in df.columns]:
+        dtype = df[col].dtype
+        if not (pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)):
+            continue
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if df[col].nunique(dropna=True) <= categorical_ratio * len(df):
+            df[col] = df[col].astype("category")
+        else:
+            df[col] = df[col].astype("string[pyarrow]")
+    return df
+
+def iter_dataframe(
+        cfg:DatasetConfig,
+        client:bigquery.Client,
+        tableType: str,
+        columns: list = None,
+        page_size: int = 100_000,
+        use_storage_api: bool = False,
+        as_arrow: bool = False,
+        categorical_ratio: float = 0.5,
+        credentials=None
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a table page by page instead of materializing it at once.
+    Reading table data with list_rows does not run (nor bill) a query job.
+
+    Args:
+        columns: Optional projection, only these columns are fetched
+        page_size: Number of rows of each page / chunk
+        use_storage_api: Read with the BigQuery Storage Read API (columnar and parallel),
+            needs the google-cloud-bigquery-storage package
+        as_arrow: Yield pyarrow.RecordBatch instead of DataFrame chunks
+        categorical_ratio: See compact_dtypes (only the STRING fields), None keeps the default dtypes
+        credentials: Optional credentials of the Storage API client, the ones of client if
+            it was built with explicit credentials, default the application default credentials
+    """
+    table = obtain_table_name(cfg, tableType)
+    table_ref = client.get_table(f"{cfg.project}.{cfg.dataset}.{table}")
+    selected_fields = None
+    if columns:
+        selected_fields = [field for field in table_ref.schema if field.name in columns]
+    string_cols = [
+        field.name for field in (selected_fields or table_ref.schema)
+        if field.field_type == "STRING" and field.mode != "REPEATED"
+    ]
+
+    bqstorage_client = None
+    if use_storage_api:
+        from google.cloud import bigquery_storage
+        bqstorage_client = bigquery_storage.BigQueryReadClient(credentials=credentials)
+
+    rows = client.list_rows(table_ref, selected_fields=selected_fields, page_size=page_size)
+    if as_arrow:
+        yield from rows.to_arrow_iterable(bqstorage_client=bqstorage_client)
+        return
+    for chunk in rows.to_dataframe_iterable(bqstorage_client=bqstorage_client):
+        if categorical_ratio is not None:
+            chunk = compact_dtypes(chunk, categorical_ratio, string_cols)
+        yield chunk
+
 def load_check_rules(dataset_type: str, yaml_path: str = "config/check_rules.yaml") -> list:
     """
     Load check rules from a YAML file based on the dataset type.
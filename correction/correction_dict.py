@@ -31,3 +31,8 @@ correction_dict_es_cinema = {
     "es Todo lo que no s?": "es Todo lo que no sé",
     "es Una noche en Zo?polis": "es Una noche en Zoópolis"
 }
+
+# Dictionaries available to correction.textRepair, by "<language>_<dataset_type>"
+correction_dicts = {
+    "es_cinema": correction_dict_es_cinema,
+}
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import re
+import multiprocessing
+import unicodedata
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+
+# Words, the apostrophes are not part of them so "D'ORTHGRAPHE" is looked up as "D" and "ORTHGRAPHE"
+WORD_PATTERN = re.compile(r"\b\w+\b")
+
+_worker_corrector = None
+
+
+def build_spell_index(dictionary_path: str, index_path: str, max_edit_distance: int = 2, prefix_length: int = 7) -> None:
+    """
+    Build the SymSpell index of a "<word> <count>" frequency dictionary
+    (see modules/generateDictionary.py) once, and save it as a pickle.
+    """
+    from symspellpy import SymSpell
+    sym_spell = SymSpell(max_dictionary_edit_distance=max_edit_distance, prefix_length=prefix_length)
+    sym_spell.load_dictionary(dictionary_path, term_index=0, count_index=1, separator=" ")
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    # Uncompressed: loading is then a plain unpickling
+    sym_spell.save_pickle(index_path, compressed=False)
+
+def strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.category(c).startswith("M"))
+
+
+class SpellCorrector:
+    """
+    Correct the spelling of product descriptions with a prebuilt SymSpell index.
+
+    Each distinct word of a batch is looked up once, through a bounded LRU memo
+    shared by all the batches; the texts are then rebuilt by replacing their words,
+    so the spaces and apostrophes are kept as they are. Words shorter than
+    min_length (e.g. the elided "L'" / "D'"), words with digits and protected words
+    (brand names) are never corrected. The case of each word is kept, and accents
+    are removed from the corrections of unaccented words (e.g. the cleaned columns).
+
+    Args:
+        index_path: Pickle of build_spell_index
+        max_edit_distance: Maximum edit distance of a correction (<= the one of the index)
+        protected: Words or brand names never corrected (compared in upper case)
+        min_length: Minimum length of a corrected word
+        memo_size: Maximum number of words kept in the memo (of each worker)
+        n_workers: Number of worker processes, 1 corrects in the current process
+    """
+    def __init__(self, index_path: str, max_edit_distance: int = 2, protected=None, min_length: int = 3, memo_size: int = 200_000, n_workers: int = 1):
+        from symspellpy import SymSpell
+        self.index_path = index_path
+        self.max_edit_distance = max_edit_distance
+        self.min_length = min_length
+        self.memo_size = memo_size
+        self.protected = set()
+        self.protect(protected or [])
+        self.lookup = lru_cache(maxsize=memo_size)(self._lookup)
+
+        self.sym_spell = None
+        self.pool = None
+        self.worker_protected = set(self.protected)
+        if n_workers > 1:
+            self.pool = multiprocessing.get_context("spawn").Pool(
+                n_workers,
+                initializer=_init_worker,
+                initargs=(index_path, max_edit_distance, self.protected, min_length, memo_size)
+            )
+        else:
+            self.sym_spell = SymSpell()
+            self.sym_spell.load_pickle(index_path, compressed=False)
+
+    @staticmethod
+    def protected_words(names) -> set:
+        return {word.upper() for name in names if isinstance(name, str) for word in WORD_PATTERN.findall(name)}
+
+    def protect(self, names) -> None:
+        """
+        Protect all the words of names (e.g. the values of the brand columns).
+        """
+        self.protected.update(self.protected_words(names))
+
+    def _lookup(self, word: str) -> str:
+        from symspellpy import Verbosity
+        if len(word) < self.min_length or any(c.isdigit() for c in word):
+            return word
+        suggestions = self.sym_spell.lookup(word.lower(), Verbosity.CLOSEST, max_edit_distance=self.max_edit_distance)
+        if not suggestions:
+            return word
+        corrected = suggestions[0].term
+        if word.isascii():
+            corrected = strip_accents(corrected)
+        if word.isupper():
+            return corrected.upper()
+        if word[0].isupper():
+            return corrected.capitalize()
+        return corrected
+
+    def correct_word(self, word: str, protected: set = None) -> str:
+        # Protection is checked outside of the memo, it can differ between batches
+        upper = word.upper()
+        if upper in self.protected or (protected and upper in protected):
+            return word
+        return self.lookup(word)
+
+    def correct_text(self, text: str) -> str:
+        return WORD_PATTERN.sub(lambda match: self.correct_word(match.group(0)), text)
+
+    def correct_values(self, values: list, protected: set = None) -> list:
+        """
+        Correct a batch of distinct texts, each distinct word of the batch only once.
+        """
+        words = set()
+        for text in values:
+            words.update(WORD_PATTERN.findall(text))
+        corrections = {word: self.correct_word(word, protected) for word in words}
+        return [WORD_PATTERN.sub(lambda match: corrections[match.group(0)], text) for text in values]
+
+    def correct_series(self, s: pd.Series, protected: set = None, batch_size: int = 20_000) -> pd.Series:
+        """
+        Each distinct text is corrected once (spread over the workers by batches of
+        batch_size), NULL values are kept.
+        """
+        codes, uniques = pd.factorize(s)
+        uniques = [str(text) for text in uniques]
+        batches = [uniques[i:i + batch_size] for i in range(0, len(uniques), batch_size)]
+        if self.pool is not None:
+            # The workers only know the words protected when they were started
+            protected = (protected or set()) | (self.protected - self.worker_protected)
+            results = self.pool.map(_correct_values, [(batch, protected) for batch in batches], chunksize=1)
+        else:
+            results = [self.correct_values(batch, protected) for batch in batches]
+        corrected = np.array([None] * (len(uniques) + 1), dtype=object)
+        corrected[:len(uniques)] = [text for batch in results for text in batch]
+        return pd.Series(corrected[codes], index=s.index, name=s.name, dtype=object)
+
+    def correct_dataframe(self, df: pd.DataFrame, cols: list, brand_cols: list = None) -> pd.DataFrame:
+        """
+        Spell-correct the text columns cols of df (e.g. ["item_desc"]),
+        the words of the brand_cols values of df are protected.
+        """
+        protected = set()
+        for col in brand_cols or []:
+            protected |= self.protected_words(df[col].dropna().unique())
+        df = df.copy()
+        for col in cols:
+            df[col] = self.correct_series(df[col], protected)
+        return df
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _init_worker(index_path: str, max_edit_distance: int, protected: set, min_length: int, memo_size: int) -> None:
+    global _worker_corrector
+    _worker_corrector = SpellCorrector(index_path, max_edit_distance, protected, min_length, memo_size)
+
+def _correct_values(task: tuple) -> list:
+    values, protected = task
+    return _worker_corrector.correct_values(values, protected)
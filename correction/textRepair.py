@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import re
+import numpy as np
+import pandas as pd
+from correction.correction_dict import correction_dicts
+
+
+class TextRepairer:
+    """
+    Repair broken characters (e.g. "?" instead of an accent) with one or several
+    correction dictionaries, compiled once into a multi-pattern matcher.
+
+    Every occurrence of a dictionary key ending at a word boundary (or at the end
+    of the text) is replaced, also inside longer texts: a truncated key such as
+    "El casopl?" does not match the start of "El casopl?n".
+    When keys overlap the leftmost, then longest, key wins.
+    The matcher is an Aho-Corasick automaton when pyahocorasick is installed,
+    otherwise a single compiled regex alternation (longest keys first).
+
+    Args:
+        dict_names: Names of the dictionaries of correction.correction_dict.correction_dicts,
+            e.g. ["es_cinema"]
+        extra_dict: Optional additional {broken: repaired} entries (priority over dict_names)
+        marker: Character that must be in a text for it to be repaired
+    """
+    def __init__(self, dict_names: list = None, extra_dict: dict = None, marker: str = "?"):
+        self.marker = marker
+        self.corrections = {}
+        for name in dict_names or []:
+            if name not in correction_dicts:
+                raise ValueError(f"Unknown correction dictionary '{name}'. Choose from {list(correction_dicts)}.")
+            self.corrections.update(correction_dicts[name])
+        self.corrections.update(extra_dict or {})
+
+        self.automaton = None
+        self.pattern = None
+        if not self.corrections:
+            return
+        try:
+            import ahocorasick
+        except ImportError:
+            keys = sorted(self.corrections, key=len, reverse=True)
+            self.pattern = re.compile("(?:" + "|".join(re.escape(key) for key in keys) + r")(?!\w)")
+        else:
+            self.automaton = ahocorasick.Automaton()
+            for key, value in self.corrections.items():
+                self.automaton.add_word(key, (len(key), value))
+            self.automaton.make_automaton()
+
+    @staticmethod
+    def ends_word(text: str, end: int) -> bool:
+        """
+        Whether a match ending at the index end (inclusive) ends at a word boundary.
+        """
+        return end + 1 == len(text) or not (text[end + 1].isalnum() or text[end + 1] == "_")
+
+    def repair_text(self, text: str) -> str:
+        if self.automaton is not None:
+            # All the matches (also overlapping ones), then leftmost-longest among the valid ones
+            matches = sorted(
+                (end - length + 1, -length, value)
+                for end, (length, value) in self.automaton.iter(text)
+                if self.ends_word(text, end)
+            )
+            parts = []
+            last = 0
+            for start, length, value in matches:
+                if start < last:
+                    continue
+                parts.append(text[last:start])
+                parts.append(value)
+                last = start - length
+            parts.append(text[last:])
+            return "".join(parts)
+        if self.pattern is not None:
+            return self.pattern.sub(lambda match: self.corrections[match.group(0)], text)
+        return text
+
+    def repair_series(self, s: pd.Series) -> pd.Series:
+        """
+        Only the texts containing the marker (vectorized prefilter) are repaired,
+        and each distinct one only once.
+        """
+        has_marker = s.astype("string").str.contains(self.marker, regex=False).fillna(False).to_numpy(dtype=bool)
+        if not has_marker.any():
+            return s
+
+        codes, uniques = pd.factorize(s[has_marker])
+        repaired = np.array([self.repair_text(text) for text in uniques], dtype=object)
+
+        s = s.astype(object).copy()
+        s[has_marker] = repaired[codes]
+        return s
+
+    def repair_dataframe(self, schema: list, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Repair all the STRING fields of the schema, other columns are left untouched.
+        """
+        df = df.copy(deep=False)
+        for field in schema:
+            if field.field_type == "STRING" and field.name in df.columns:
+                df[field.name] = self.repair_series(df[field.name])
+        return df
@@ -2,45 +2,73 @@
 #Author: Liuxin YANG
 #Date: 2025-06-02
 
-from google.cloud import bigquery
 from config.configuration import DatasetConfig
-from config.obtainInfo import obtain_dataframe
-from modules.standarize import standarize_by_frequence
-from modules.generateQuery import (
-    generate_clean_query,
-    generate_check_exclude_query,
-    do_query_job,
-    do_data2table_job
-)
+from modules.executionBackend import obtain_backend
+from modules.stageCache import StageCache, stage_key, stage_tables, stage_fingerprint
 
 
 
+STAGES = ("clean", "validate")
+
+
 class DataCleaningPipeline:
-    def __init__(self, config: DatasetConfig):
+    def __init__(self, config: DatasetConfig, backend=None):
         self.cfg = config
-        self.client = bigquery.Client()
-        self.schema = self.client.get_table(f"{self.cfg.project}.{self.cfg.dataset}.{self.cfg.raw_table}").schema
+        self.backend = backend if backend is not None else obtain_backend(self.cfg)
+        self.schema = self.backend.get_schema("raw")
+        self.stage_cache = StageCache(self.cfg.stage_cache_path) if self.cfg.stage_cache_path else None
+        # Once a stage runs, all the next ones run too
+        self.resumed = False
 
-    def run(self):
+    def standarize_cols(self) -> list:
+        return [
+            field.name for field in self.schema
+            if field.field_type == "STRING"
+            and ("brand" in field.name.lower() or "supplier" in field.name.lower())
+        ]
+
+    def clean(self):
         print("Step 1: Data Cleaning...")
         print("Step 1.1: Running Format-level Cleaning...")
-        clean_query = generate_clean_query(self.cfg, self.client, "raw")
-        do_query_job(self.cfg, self.client, "clean", clean_query)
-
         print("Step 1.2: Running Semantic-level Cleaning...")
         print("--------> Handling missing values...")
         print("--------> Standarize column values...")
-        clean_data = obtain_dataframe(self.cfg, self.client, "clean")
-        target_cols = [field.name for field in self.schema if "brand" in field.name.lower() or "supplier" in field.name.lower()]
-        clean_data = standarize_by_frequence(clean_data,target_cols)
-        do_data2table_job(self.cfg, self.client, "clean", clean_data,self.schema)
+        self.backend.clean(self.standarize_cols())
 
+    def validate(self):
         print("Step 2: Data validation...")
-        exclude_query,final_query = generate_check_exclude_query(self.cfg, self.client)
-        do_query_job(self.cfg, self.client, "excluded", exclude_query)
-        #do_query_job(self.cfg, self.client, "clean", final_query)
+        self.backend.validate()
+
+    def run_stage(self, stage: str):
+        """
+        Run a stage, or skip it when the stage cache has the same fingerprint
+        (inputs, SQL, rules, settings and code) and its outputs are unchanged.
+        """
+        if self.stage_cache is None:
+            getattr(self, stage)()
+            return
+        reads, writes = stage_tables(self.cfg, stage)
+        inputs = {tableType: self.backend.table_info(tableType) for tableType in reads}
+        fingerprint = stage_fingerprint(self.cfg, stage, inputs, self.backend.stage_sql(stage, self.standarize_cols()))
+        outputs = {tableType: self.backend.table_info(tableType) for tableType in writes}
+        key = stage_key(self.cfg, stage)
+        if not self.resumed and self.stage_cache.is_valid(key, fingerprint, outputs):
+            print(f"Stage {stage} unchanged, skipped.")
+            return
+        self.resumed = True
+        self.stage_cache.invalidate(key)
+        getattr(self, stage)()
+        outputs = {tableType: self.backend.table_info(tableType) for tableType in writes}
+        self.stage_cache.record(key, fingerprint, outputs)
+
+    def run(self):
+        for stage in STAGES:
+            self.run_stage(stage)
 
         print("Pipeline finished.")
+        print(self.backend.report.summary())
+        if self.cfg.report_path:
+            self.backend.report.save(self.cfg.report_path)
 
 
 if __name__ == "__main__":    
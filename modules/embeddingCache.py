@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import json
+import hashlib
+import numpy as np
+from typing import Callable
+
+# Small files of a model folder hashed by content, the other files (weights) by name, size and mtime
+CONFIG_EXTENSIONS = (".json", ".txt", ".model", ".cfg")
+
+
+def model_fingerprint(model_name: str) -> str:
+    """
+    Hash of the configuration and weights of a model folder (or file), so a model
+    retrained or exported again at the same path invalidates the cache.
+    A name which is not a local path (e.g. a hub model) is its own fingerprint.
+    """
+    if not os.path.exists(model_name):
+        return model_name
+    paths = [model_name]
+    if os.path.isdir(model_name):
+        paths = sorted(
+            os.path.join(folder, name)
+            for folder, _, names in os.walk(model_name) for name in names
+        )
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        digest.update(os.path.relpath(path, model_name).encode("utf-8") + b"\0")
+        if path.endswith(CONFIG_EXTENSIONS) and os.path.getsize(path) < 1024 ** 2:
+            with open(path, "rb") as file:
+                digest.update(file.read())
+        else:
+            stat = os.stat(path)
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode("ascii"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed store of text embeddings.
+
+    Vectors are kept in a memory-mapped float32 file (vectors.f32), one slot per
+    text, and an index (index.npz) maps the hash of (model, text) to its slot.
+    The store is reset when it is opened with another model (or the same path
+    with other weights, see model_fingerprint), and the least recently used slots
+    are reused once max_bytes is reached.
+    The index is written every flush_every encode calls and by close (use the
+    cache as a context manager); a store not closed properly is reset when reopened.
+
+    Args:
+        cache_dir: Folder of the store
+        model_name: Identifier of the embedding model (e.g. its path or name + version)
+        max_bytes: Maximum size of the vectors file
+        flush_every: Number of encode calls between two writes of the index
+    """
+    def __init__(self, cache_dir: str, model_name: str, max_bytes: int = 2 * 1024 ** 3, flush_every: int = 64):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.fingerprint = model_fingerprint(model_name)
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.vectors_path = os.path.join(cache_dir, "vectors.f32")
+        self.index_path = os.path.join(cache_dir, "index.npz")
+        self.meta_path = os.path.join(cache_dir, "meta.json")
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.dim = None
+        self.capacity = 0
+        self.clock = 0
+        self.slots = {}
+        self.last_used = np.zeros(0, dtype="int64")
+        self.slot_keys = np.zeros(0, dtype="S32")
+        self.vectors = None
+        self.dirty = False
+        self.stale = False
+        self.pending = 0
+        self.load()
+
+    def key(self, text: str) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest().encode("ascii")
+
+    def load(self) -> None:
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path) as file:
+            meta = json.load(file)
+        if meta.get("model_name") != self.model_name or meta.get("model_fingerprint") != self.fingerprint or not meta.get("closed"):
+            # Another model, or an index older than the vectors: all the stored vectors are invalid
+            self.clear()
+            return
+        self.dim = meta["dim"]
+        self.capacity = meta["capacity"]
+        self.clock = meta["clock"]
+        index = np.load(self.index_path)
+        self.slot_keys = index["slot_keys"]
+        self.last_used = index["last_used"]
+        self.slots = {key: slot for slot, key in enumerate(self.slot_keys) if key}
+        self.vectors = np.memmap(self.vectors_path, dtype="float32", mode="r+", shape=(self.capacity, self.dim))
+
+    def clear(self) -> None:
+        for path in [self.vectors_path, self.index_path, self.meta_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        self.dim = None
+        self.capacity = 0
+        self.slots = {}
+        self.last_used = np.zeros(0, dtype="int64")
+        self.slot_keys = np.zeros(0, dtype="S32")
+        self.vectors = None
+
+    def write_meta(self, closed: bool) -> None:
+        """
+        closed=False marks the index on disk as stale until the next flush.
+        """
+        with open(self.meta_path, "w") as file:
+            json.dump({
+                "model_name": self.model_name, "model_fingerprint": self.fingerprint, "dim": self.dim,
+                "capacity": self.capacity, "clock": self.clock, "closed": closed
+            }, file)
+
+    def mark_stale(self) -> None:
+        """
+        Called before overwriting vectors: until the next flush the index on disk does not match them.
+        """
+        if not self.stale:
+            self.stale = True
+            self.write_meta(closed=False)
+
+    def flush(self) -> None:
+        self.pending = 0
+        if self.vectors is None or not self.dirty:
+            return
+        self.vectors.flush()
+        tmp_path = self.index_path + ".tmp.npz"
+        np.savez(tmp_path, slot_keys=self.slot_keys, last_used=self.last_used)
+        os.replace(tmp_path, self.index_path)
+        self.write_meta(closed=True)
+        self.dirty = False
+        self.stale = False
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def max_slots(self) -> int:
+        return max(1, self.max_bytes // (4 * self.dim))
+
+    def grow(self, needed: int) -> None:
+        """
+        Extend the vectors file so it has at least `needed` slots (bounded by max_bytes).
+        """
+        capacity = min(self.max_slots, max(needed, 2 * self.capacity, 1024))
+        if capacity <= self.capacity:
+            return
+        if self.vectors is not None:
+            self.vectors.flush()
+        with open(self.vectors_path, "ab") as file:
+            file.truncate(capacity * self.dim * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype="float32", mode="r+", shape=(capacity, self.dim))
+        self.slot_keys = np.concatenate([self.slot_keys, np.zeros(capacity - self.capacity, dtype="S32")])
+        self.last_used = np.concatenate([self.last_used, np.zeros(capacity - self.capacity, dtype="int64")])
+        self.capacity = capacity
+
+    def allocate(self, n: int) -> np.ndarray:
+        """
+        Return n slots to write: free slots first, then the least recently used ones.
+        """
+        self.grow(len(self.slots) + n)
+        free = np.flatnonzero(self.slot_keys == b"")
+        if len(free) >= n:
+            return free[:n]
+        # Slots used by the current batch (last_used == clock) are never evicted
+        used = np.flatnonzero((self.slot_keys != b"") & (self.last_used < self.clock))
+        if len(free) + len(used) < n:
+            raise ValueError("The batch has more distinct texts than the cache can hold, increase max_bytes.")
+        evicted = used[np.argsort(self.last_used[used], kind="stable")[:n - len(free)]]
+        for slot in evicted:
+            del self.slots[self.slot_keys[slot]]
+        return np.concatenate([free, evicted])
+
+    def encode(self, texts, encode_fn: Callable) -> np.ndarray:
+        """
+        Return the embeddings of texts (in input order), encoding with encode_fn(list of texts)
+        only the distinct texts which are not in the store yet.
+        """
+        texts = ["" if text is None else str(text) for text in texts]
+        keys = [self.key(text) for text in texts]
+        self.clock += 1
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in self.slots:
+                self.last_used[self.slots[key]] = self.clock
+            elif key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_vectors = np.asarray(encode_fn(list(missing.values())), dtype="float32")
+            if self.dim is None:
+                self.dim = new_vectors.shape[1]
+            self.mark_stale()
+            new_slots = self.allocate(len(missing))
+            self.vectors[new_slots] = new_vectors
+            for slot, key in zip(new_slots, missing):
+                self.slots[key] = slot
+                self.slot_keys[slot] = key
+            self.last_used[new_slots] = self.clock
+
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        slots = np.fromiter((self.slots[key] for key in keys), dtype="int64", count=len(keys))
+        embeddings = np.asarray(self.vectors[slots])
+        self.dirty = True
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+        return embeddings
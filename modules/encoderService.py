@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import time
+import multiprocessing
+import numpy as np
+from typing import Iterator
+
+_worker_model = None
+
+
+def _load_model(model_path: str, threads: int):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        torch.set_num_threads(threads)
+    return SentenceTransformer(model_path, device="cpu")
+
+def _init_worker(model_path: str, threads: int) -> None:
+    global _worker_model
+    _worker_model = _load_model(model_path, threads)
+
+def _encode_batch(texts: list) -> np.ndarray:
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False)
+
+
+class EncoderService:
+    """
+    Reusable CPU encoder: the SentenceTransformer is loaded once (in each worker
+    process when n_workers > 1) and reused for every call.
+
+    Texts are sorted by length inside windows of `window` texts so each batch has
+    texts of similar length (less padding), batches are spread over the worker
+    pool, and the embeddings are streamed back window by window in input order.
+
+    Args:
+        model_path: Path or name of the SentenceTransformer model
+        batch_size: Texts per batch
+        n_workers: Number of worker processes, 1 encodes in the current process
+        threads_per_worker: torch threads of each worker, default cpu_count // n_workers
+        window: Texts sorted together, default 32 batches per worker
+    """
+    def __init__(self, model_path: str, batch_size: int = 64, n_workers: int = 1, threads_per_worker: int = None, window: int = None):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.n_workers = n_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // n_workers)
+        self.window = window or batch_size * n_workers * 32
+        self.stats = {"texts": 0, "seconds": 0.0, "texts_per_sec": 0.0}
+
+        self.model = None
+        self.pool = None
+        if n_workers > 1:
+            self.pool = multiprocessing.get_context("spawn").Pool(
+                n_workers, initializer=_init_worker, initargs=(model_path, self.threads_per_worker)
+            )
+        else:
+            self.model = _load_model(model_path, self.threads_per_worker)
+
+    def encode_batches(self, batches: list) -> list:
+        if self.pool is not None:
+            return self.pool.map(_encode_batch, batches, chunksize=1)
+        return [
+            self.model.encode(batch, batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False)
+            for batch in batches
+        ]
+
+    def encode_iter(self, texts) -> Iterator[np.ndarray]:
+        """
+        Yield the float32 embeddings of texts, one array per window, in input order.
+        """
+        texts = ["" if text is None else str(text) for text in texts]
+        for start in range(0, len(texts), self.window):
+            window_start = time.perf_counter()
+            window = texts[start:start + self.window]
+            order = np.argsort([len(text) for text in window], kind="stable")
+            sorted_texts = [window[i] for i in order]
+            batches = [
+                sorted_texts[i:i + self.batch_size] for i in range(0, len(sorted_texts), self.batch_size)
+            ]
+            sorted_embeddings = np.vstack(self.encode_batches(batches)).astype("float32", copy=False)
+
+            embeddings = np.empty_like(sorted_embeddings)
+            embeddings[order] = sorted_embeddings
+
+            self.stats["texts"] += len(window)
+            self.stats["seconds"] += time.perf_counter() - window_start
+            self.stats["texts_per_sec"] = self.stats["texts"] / max(self.stats["seconds"], 1e-9)
+            yield embeddings
+
+    def encode(self, texts) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        return np.vstack(list(self.encode_iter(texts)))
+
+    def close(self) -> None:
+        """
+        Stop the worker pool and report the throughput of all the calls once.
+        """
+        if self.stats["texts"]:
+            print(f"Encoded {self.stats['texts']} texts, {self.stats['texts_per_sec']:.1f} texts/sec overall")
+            self.stats = {"texts": 0, "seconds": 0.0, "texts_per_sec": 0.0}
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
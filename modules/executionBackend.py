@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import pandas as pd
+from config.configuration import DatasetConfig
+from config.obtainInfo import obtain_table_name
+from modules.jobMonitor import RunReport, InstrumentedClient
+
+
+class BigQueryBackend:
+    """
+    Run the pipeline steps as BigQuery jobs (default backend).
+
+    Args:
+        metadata: Optional modules.stageCache.MetadataCache shared with other backends,
+            default one for this backend (each table is fetched once per run)
+    """
+    def __init__(self, cfg: DatasetConfig, client=None, metadata=None):
+        from google.cloud import bigquery
+        from modules.stageCache import MetadataCache
+        self.cfg = cfg
+        self.report = RunReport()
+        self.client = InstrumentedClient(
+            client if client is not None else bigquery.Client(),
+            self.report,
+            max_bytes_per_step=cfg.max_bytes_per_step,
+            dry_run=cfg.dry_run_check,
+            metadata=metadata if metadata is not None else MetadataCache()
+        )
+        self.delta_ready = False
+
+    def get_schema(self, tableType: str) -> list:
+        table = obtain_table_name(self.cfg, tableType)
+        return self.client.get_table(f"{self.cfg.project}.{self.cfg.dataset}.{table}").schema
+
+    def table_exists(self, tableType: str) -> bool:
+        from google.api_core.exceptions import NotFound
+        try:
+            self.get_schema(tableType)
+        except NotFound:
+            return False
+        return True
+
+    def table_has_layout(self, tableType: str) -> bool:
+        """
+        True if the table exists with the configured partitioning / clustering,
+        otherwise it must be rebuilt in full (an incremental MERGE keeps the layout).
+        """
+        from google.api_core.exceptions import NotFound
+        from modules.generateQuery import layout_matches
+        table = obtain_table_name(self.cfg, tableType)
+        try:
+            table_ref = self.client.get_table(f"{self.cfg.project}.{self.cfg.dataset}.{table}")
+        except NotFound:
+            return False
+        return layout_matches(self.cfg, tableType, table_ref)
+
+    def table_info(self, tableType: str) -> dict:
+        """
+        Last modified time, rows and schema of a table (None if it does not exist), for the stage cache.
+        """
+        from google.api_core.exceptions import NotFound
+        table = obtain_table_name(self.cfg, tableType)
+        try:
+            table_ref = self.client.get_table(f"{self.cfg.project}.{self.cfg.dataset}.{table}")
+        except NotFound:
+            return None
+        return {
+            "modified": table_ref.modified,
+            "num_rows": table_ref.num_rows,
+            "schema": [(field.name, field.field_type, field.mode) for field in table_ref.schema],
+        }
+
+    def stage_sql(self, stage: str, standarize_cols: list = None) -> str:
+        """
+        SQL generated for a stage, part of its fingerprint in the stage cache.
+        """
+        from modules.generateQuery import generate_clean_query, generate_check_exclude_query
+        if stage == "clean":
+            return generate_clean_query(self.cfg, self.client, "raw", standarize_cols, self.mapping_table_id())
+        exclude_query, _ = generate_check_exclude_query(self.cfg, self.client)
+        return exclude_query
+
+    def table_id(self, tableType: str) -> str:
+        return f"{self.cfg.project}.{self.cfg.dataset}.{obtain_table_name(self.cfg, tableType)}"
+
+    def mapping_table_id(self) -> str:
+        """
+        The mapping table joined by the cleaning, only built when it is needed: the
+        fuzzy merges are computed locally, the incremental mode reads its changed
+        flags and mapping_path saves it. Otherwise (None) the standarization runs
+        in the cleaning query itself, see generate_standarize_clause.
+        """
+        if self.cfg.fuzzy_distance > 0 or self.cfg.incremental or self.cfg.mapping_path:
+            return self.table_id("mapping")
+        return None
+
+    def clean(self, standarize_cols: list = None) -> None:
+        """
+        Full rebuild, or with cfg.incremental and an existing clean table: clean
+        the rows of the changed keys into the delta_clean table, spell-correct
+        them there, then merge them into the clean table.
+        """
+        from modules.generateQuery import (
+            generate_clean_query,
+            generate_incremental_clean_query,
+            generate_incremental_merge_query,
+            generate_mapping_applied_query,
+            do_query_job,
+            do_script_job
+        )
+        incremental = self.cfg.incremental and self.table_has_layout("clean")
+        mapping_table = self.mapping_table_id() if standarize_cols else None
+        with self.client.step("clean"):
+            if mapping_table:
+                self.standarize_mapping(standarize_cols)
+            if incremental:
+                incremental_query = generate_incremental_clean_query(self.cfg, self.client, standarize_cols)
+                do_script_job(self.cfg, self.client, incremental_query)
+            else:
+                clean_query = generate_clean_query(self.cfg, self.client, "raw", standarize_cols, mapping_table)
+                do_query_job(self.cfg, self.client, "clean", clean_query)
+                if mapping_table:
+                    do_script_job(self.cfg, self.client, generate_mapping_applied_query(self.cfg))
+        if self.cfg.spell_cols:
+            self.spell_correct("delta_clean" if incremental else "clean")
+        if incremental:
+            with self.client.step("clean"):
+                do_script_job(self.cfg, self.client, generate_incremental_merge_query(self.cfg, standarize_cols))
+        self.delta_ready = incremental
+
+    def standarize_mapping(self, cols: list) -> None:
+        """
+        Build the variant -> standard mapping of cols (exact and, with
+        cfg.fuzzy_distance > 0, fuzzy merges) locally from the counts of the
+        cleaned raw values, as the local backend does (only the distinct values
+        are downloaded), and upload it to the mapping table joined by the cleaning.
+        The variants whose standard changed since the previous mapping table are
+        flagged, see modules.standarize.flag_mapping_changes.
+        """
+        from google.cloud import bigquery
+        from modules.standarize import (
+            build_frequence_mapping,
+            counts_from_table,
+            flag_mapping_changes,
+            mapping_to_table,
+            save_frequence_mapping
+        )
+        from modules.generateQuery import generate_variant_counts_query
+        counts = self.client.query(generate_variant_counts_query(self.cfg, self.client, cols)).to_dataframe()
+        mapping = build_frequence_mapping(counts_from_table(counts, cols), self.cfg.fuzzy_distance)
+        if self.cfg.mapping_path:
+            save_frequence_mapping(mapping, self.cfg.mapping_path)
+
+        previous = None
+        if self.table_exists("mapping") and "changed" in [field.name for field in self.get_schema("mapping")]:
+            previous = self.client.query(
+                f"SELECT column_name, variant, standard, changed FROM `{self.table_id('mapping')}`"
+            ).to_dataframe()
+        table = flag_mapping_changes(mapping_to_table(mapping), previous)
+        if "fuzzy" in table.columns:
+            print(f"Fuzzy standarization: {int(table['fuzzy'].sum())} value(s) merged")
+        print(f"Standarization: {int(table['changed'].sum())} value(s) with a new standard")
+        job = self.client.load_table_from_dataframe(
+            table, self.table_id("mapping"),
+            job_config=bigquery.LoadJobConfig(write_disposition="WRITE_TRUNCATE")
+        )
+        job.result()
+
+    def spell_correct(self, tableType: str = "clean") -> None:
+        """
+        Stream a table (the clean table, or the delta_clean rows of an
+        incremental run) through the spell correction and replace it.
+        The words of all the brands of the clean table (and of the streamed
+        table) are protected, fetched once before the first page.
+        """
+        from correction.spellCorrection import SpellCorrector
+        from config.obtainInfo import iter_dataframe
+        from modules.generateQuery import generate_distinct_values_query, do_data2table_job
+        cols = [col.strip() for col in self.cfg.spell_cols.split(",")]
+        brand_cols = [col.strip() for col in self.cfg.brand_cols.split(",")] if self.cfg.brand_cols else []
+        with self.client.step("spell_correct"):
+            schema = self.get_schema(tableType)
+            brands = []
+            if brand_cols:
+                tableTypes = list(dict.fromkeys(["clean", tableType]))
+                brands = self.client.query(generate_distinct_values_query(self.cfg, brand_cols, tableTypes)).to_dataframe()["value"].tolist()
+            with SpellCorrector(self.cfg.spell_index_path, protected=brands, n_workers=self.cfg.spell_workers) as corrector:
+                chunks = (
+                    corrector.correct_dataframe(chunk, cols)
+                    for chunk in iter_dataframe(self.cfg, self.client, tableType, categorical_ratio=None)
+                )
+                do_data2table_job(self.cfg, self.client, tableType, chunks, schema)
+
+    def validate(self) -> None:
+        from modules.generateQuery import (
+            generate_check_exclude_query,
+            generate_incremental_check_query,
+            do_query_job,
+            do_script_job
+        )
+        from config.obtainInfo import load_check_rules
+        with self.client.step("validate"):
+            # Only the keys rebuilt by an incremental cleaning of this run can be validated alone
+            if self.delta_ready and self.table_has_layout("excluded"):
+                incremental_query = generate_incremental_check_query(self.cfg, self.client)
+                do_script_job(self.cfg, self.client, incremental_query)
+            else:
+                exclude_query, final_query = generate_check_exclude_query(self.cfg, self.client)
+                do_query_job(self.cfg, self.client, "excluded", exclude_query)
+                #do_query_job(self.cfg, self.client, "clean", final_query)
+        if "near_duplicate" in load_check_rules(self.cfg.dataset_type):
+            self.near_duplicates()
+
+    def near_duplicates(self) -> None:
+        """
+        near_duplicate rule: the clean rows not excluded yet are written once to
+        a temporary table partitioned by a hash of their block
+        (cfg.near_duplicate_block_cols, cfg.near_duplicate_partitions partitions).
+        Each partition is then read (with the BigQuery Storage API when
+        google-cloud-bigquery-storage is installed), embedded and compared block
+        by block with an LSH index. The pairs are written to the near-duplicate
+        table, then their rows are merged into the excluded table.
+        """
+        from google.cloud import bigquery
+        from modules.nearDuplicate import ProductEmbedder, find_near_duplicates
+        from modules.generateEmbedding import TEXT_COLS
+        from modules.generateQuery import (
+            generate_near_duplicate_source_query,
+            generate_near_duplicate_merge,
+            do_data2table_job,
+            do_script_job
+        )
+        columns = [field.name for field in self.get_schema("raw")]
+        block_cols = [col.strip() for col in self.cfg.near_duplicate_block_cols.split(",")]
+        n_partitions = self.cfg.near_duplicate_partitions
+        cache = None
+        if self.cfg.embedding_cache_dir:
+            from modules.embeddingCache import EmbeddingCache
+            cache = EmbeddingCache(self.cfg.embedding_cache_dir, self.cfg.near_duplicate_model)
+        schema = [
+            bigquery.SchemaField("row_id", "STRING"),
+            bigquery.SchemaField("near_duplicate_of", "STRING"),
+            bigquery.SchemaField("similarity", "FLOAT"),
+        ]
+        source_table = f"{self.table_id('near_duplicate')}__source"
+
+        def partitions():
+            for partition in range(n_partitions):
+                # Only this partition is scanned (integer range partitioning)
+                rows = self.client.query(
+                    f"SELECT * EXCEPT (_partition) FROM `{source_table}` WHERE _partition = {partition}"
+                ).to_dataframe()
+                yield rows.sort_values(block_cols, kind="stable").reset_index(drop=True)
+
+        with self.client.step("near_duplicate"):
+            source_query = generate_near_duplicate_source_query(self.cfg, list(dict.fromkeys(block_cols + TEXT_COLS)))
+            job = self.client.query(source_query, job_config=bigquery.QueryJobConfig(
+                destination=source_table,
+                write_disposition="WRITE_TRUNCATE",
+                range_partitioning=bigquery.RangePartitioning(
+                    field="_partition",
+                    range_=bigquery.PartitionRange(start=0, end=n_partitions, interval=1)
+                )
+            ))
+            job.result()
+            try:
+                with ProductEmbedder(self.cfg.near_duplicate_model, cache, self.cfg.near_duplicate_backend) as embed:
+                    pairs = (
+                        block_pairs
+                        for rows in partitions()
+                        for block_pairs in find_near_duplicates([rows], block_cols, embed, self.cfg.near_duplicate_threshold)
+                    )
+                    do_data2table_job(self.cfg, self.client, "near_duplicate", pairs, schema)
+            finally:
+                self.client.delete_table(source_table, not_found_ok=True)
+            do_script_job(self.cfg, self.client, generate_near_duplicate_merge(self.cfg, columns))
+
+
+class LocalBackend:
+    """
+    Run the same pipeline steps in-process with pandas, on <table>.parquet or
+    <table>.csv files stored in cfg.local_dir. No BigQuery client is needed.
+    """
+    def __init__(self, cfg: DatasetConfig, schema: list = None):
+        self.cfg = cfg
+        self.schema = schema
+        self.report = RunReport()
+        self.delta_ready = False
+
+    def table_path(self, tableType: str) -> str:
+        table = obtain_table_name(self.cfg, tableType)
+        return os.path.join(self.cfg.local_dir, f"{table}.{self.cfg.local_format}")
+
+    def table_exists(self, tableType: str) -> bool:
+        return os.path.exists(self.table_path(tableType))
+
+    def table_info(self, tableType: str) -> dict:
+        """
+        Last modified time and size of a table file (None if it does not exist), for the stage cache.
+        """
+        if not self.table_exists(tableType):
+            return None
+        stat = os.stat(self.table_path(tableType))
+        return {"modified": stat.st_mtime_ns, "size": stat.st_size}
+
+    def stage_sql(self, stage: str, standarize_cols: list = None) -> str:
+        return None
+
+    def read_table(self, tableType: str) -> pd.DataFrame:
+        path = self.table_path(tableType)
+        if self.cfg.local_format == "parquet":
+            return pd.read_parquet(path)
+        elif self.cfg.local_format == "csv":
+            # Same as a BigQuery CSV load: keep all values as text, only empty cells are NULL
+            return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+        raise ValueError("Invalid local format. Choose from 'parquet' or 'csv'.")
+
+    def write_table(self, tableType: str, df: pd.DataFrame) -> None:
+        path = self.table_path(tableType)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if self.cfg.local_format == "parquet":
+            df.to_parquet(path, index=False)
+        elif self.cfg.local_format == "csv":
+            df.to_csv(path, index=False)
+        else:
+            raise ValueError("Invalid local format. Choose from 'parquet' or 'csv'.")
+
+    def get_schema(self, tableType: str) -> list:
+        from modules.localEngine import infer_schema
+        if self.schema is None:
+            self.schema = infer_schema(self.read_table("raw"))
+        return self.schema
+
+    def clean(self, standarize_cols: list = None) -> None:
+        from modules.localEngine import clean_dataframe, incremental_clean_dataframe, key_mask
+        from modules.standarize import apply_frequence_mapping
+        with self.report.timed("clean"):
+            raw = self.read_table("raw")
+            mapping, mapping_table = self.standarize_mapping(raw, standarize_cols) if standarize_cols else ({}, None)
+            if self.cfg.incremental and self.table_exists("clean"):
+                clean, delta = incremental_clean_dataframe(
+                    self.cfg, raw, self.read_table("clean"), self.get_schema("raw"), mapping, mapping_table
+                )
+                if self.cfg.spell_cols:
+                    clean = self.spell_correct(clean, key_mask(self.cfg, clean, delta))
+                self.write_table("clean", clean)
+                self.write_table("delta", delta)
+                self.delta_ready = True
+            else:
+                clean = apply_frequence_mapping(clean_dataframe(raw, self.get_schema("raw")), mapping)
+                if self.cfg.spell_cols:
+                    clean = self.spell_correct(clean)
+                self.write_table("clean", clean)
+                self.delta_ready = False
+            # Written once the clean table uses its standards, see BigQueryBackend.standarize_mapping
+            if mapping_table is not None:
+                self.write_table("mapping", mapping_table.assign(changed=False))
+
+    def standarize_mapping(self, raw: pd.DataFrame, cols: list) -> tuple:
+        """
+        Mapping of the standarization of cols built from the counts of the cleaned
+        raw values, and its table with the variants whose standard changed since
+        the previous mapping table flagged (see modules.standarize.flag_mapping_changes).
+        """
+        from modules.localEngine import clean_series
+        from modules.standarize import build_frequence_mapping, flag_mapping_changes, mapping_to_table, save_frequence_mapping
+        counts = {col: clean_series(raw[col]).dropna().value_counts() for col in cols}
+        counts = {col: pd.Series(col_counts.to_numpy(dtype="int64"), index=pd.Index(col_counts.index, dtype=object)) for col, col_counts in counts.items()}
+        mapping = build_frequence_mapping(counts, self.cfg.fuzzy_distance)
+        if self.cfg.mapping_path:
+            save_frequence_mapping(mapping, self.cfg.mapping_path)
+        previous = self.read_table("mapping") if self.table_exists("mapping") else None
+        return mapping, flag_mapping_changes(mapping_to_table(mapping), previous)
+
+    def spell_correct(self, df: pd.DataFrame, mask: pd.Series = None) -> pd.DataFrame:
+        """
+        Spell-correct cfg.spell_cols of the rows of mask (all by default),
+        the words of all the brands of df are protected.
+        """
+        from correction.spellCorrection import SpellCorrector
+        cols = [col.strip() for col in self.cfg.spell_cols.split(",")]
+        brand_cols = [col.strip() for col in self.cfg.brand_cols.split(",")] if self.cfg.brand_cols else []
+        brands = [name for col in brand_cols for name in df[col].dropna().unique()]
+        with self.report.timed("spell_correct"):
+            with SpellCorrector(self.cfg.spell_index_path, protected=brands, n_workers=self.cfg.spell_workers) as corrector:
+                if mask is None:
+                    return corrector.correct_dataframe(df, cols)
+                df = df.copy()
+                df.loc[mask, cols] = corrector.correct_dataframe(df.loc[mask, cols], cols)
+                return df
+
+    def validate(self) -> None:
+        from config.obtainInfo import load_check_rules
+        from modules.localEngine import check_exclude_dataframe, incremental_check_exclude_dataframe
+        with self.report.timed("validate"):
+            clean = self.read_table("clean")
+            taxonomy = self.read_table("taxonomy") if self.cfg.taxonomy_table else None
+            if self.delta_ready and self.table_exists("excluded"):
+                excluded = incremental_check_exclude_dataframe(
+                    self.cfg, clean, self.read_table("excluded"), self.read_table("delta"), self.get_schema("raw"), taxonomy
+                )
+            else:
+                excluded, filtered = check_exclude_dataframe(self.cfg, clean, self.get_schema("raw"), taxonomy)
+                #self.write_table("clean", filtered)
+        if "near_duplicate" in load_check_rules(self.cfg.dataset_type):
+            excluded = self.near_duplicates(clean, excluded)
+        self.write_table("excluded", excluded)
+
+    def near_duplicates(self, clean: pd.DataFrame, excluded: pd.DataFrame) -> pd.DataFrame:
+        """
+        near_duplicate rule, the pairs are written to the near-duplicate table.
+        Returns the excluded table with the near duplicates added.
+        """
+        from modules.localEngine import near_duplicate_dataframe
+        from modules.nearDuplicate import ProductEmbedder
+        cache = None
+        if self.cfg.embedding_cache_dir:
+            from modules.embeddingCache import EmbeddingCache
+            cache = EmbeddingCache(self.cfg.embedding_cache_dir, self.cfg.near_duplicate_model)
+        with self.report.timed("near_duplicate"):
+            with ProductEmbedder(self.cfg.near_duplicate_model, cache, self.cfg.near_duplicate_backend) as embed:
+                excluded, pairs = near_duplicate_dataframe(self.cfg, clean, excluded, self.get_schema("raw"), embed)
+            self.write_table("near_duplicate", pairs)
+        return excluded
+
+
+def obtain_backend(cfg: DatasetConfig):
+    """
+    Build the execution backend selected in the configuration.
+    """
+    if cfg.backend == "bigquery":
+        return BigQueryBackend(cfg)
+    elif cfg.backend == "local":
+        return LocalBackend(cfg)
+    raise ValueError("Invalid backend. Choose from 'bigquery' or 'local'.")
@@ -1,24 +1,151 @@
-import json
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
 
-input_path = '/Users/liuxinyang/Documents/kaikki.org-dictionary-French.jsonl'
-output_path = '/Users/liuxinyang/Documents/Code/data/french_dictionary.txt'
+import os
+import bz2
+import gzip
+import lzma
+import time
+import argparse
+import multiprocessing
+from collections import Counter, deque
 
+try:
+    import orjson as json_parser
+except ImportError:
+    import json as json_parser
 
-word_counts = {}
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
 
-with open(input_path, 'r', encoding='utf-8') as fin:
-    for line in fin:
-        data = json.loads(line.strip())
-        if data.get('lang') == 'French':
-            word = data.get('word')
-            if word:
-                word = word.lower()
-                word_counts[word] = word_counts.get(word, 0) + 1
 
-with open(output_path, 'w', encoding='utf-8') as fout:
-    for word, count in word_counts.items():
-        if " " not in word:
-            fout.write(f"{word} {count}\n")
+def count_lines(lines, languages: list) -> dict:
+    """
+    Count the entries of each word (lower case) of the given languages in Kaikki JSONL lines (bytes).
+    """
+    counts = {language: Counter() for language in languages}
+    # Cheap prefilter: a line of a language contains its name
+    markers = [language.encode("utf-8") for language in languages]
+    for line in lines:
+        if not any(marker in line for marker in markers):
+            continue
+        data = json_parser.loads(line)
+        language = data.get("lang")
+        word = data.get("word")
+        if word and language in counts:
+            counts[language][word.lower()] += 1
+    return counts
 
-print("french_dictionary.txt est généré avec succès.")
+def count_byte_range(task: tuple) -> dict:
+    """
+    Count the lines starting in [start, end) of an uncompressed file.
+    """
+    path, start, end, languages = task
 
+    def lines():
+        with open(path, "rb") as file:
+            if start > 0:
+                # Skip the rest of the line in progress at start - 1, it belongs to the
+                # previous range (only its newline when a line starts exactly at start)
+                file.seek(start - 1)
+                file.readline()
+            while file.tell() < end:
+                line = file.readline()
+                if not line:
+                    break
+                yield line
+
+    return count_lines(lines(), languages)
+
+def count_line_batch(task: tuple) -> dict:
+    lines, languages = task
+    return count_lines(lines, languages)
+
+def byte_ranges(path: str, chunk_bytes: int) -> list:
+    size = os.path.getsize(path)
+    return [(start, min(start + chunk_bytes, size)) for start in range(0, size, chunk_bytes)]
+
+def iter_line_batches(path: str, batch_lines: int):
+    """
+    Decompress a .gz / .bz2 / .xz file as a stream, by batches of batch_lines lines.
+    """
+    opener = COMPRESSED_OPENERS[os.path.splitext(path)[1]]
+    batch = []
+    with opener(path, "rb") as file:
+        for line in file:
+            batch.append(line)
+            if len(batch) >= batch_lines:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def count_words(path: str, languages: list, workers: int = None, chunk_bytes: int = 64 * 1024 ** 2, batch_lines: int = 50_000) -> dict:
+    """
+    Count the words of several languages in one pass over a Kaikki JSONL dump.
+    An uncompressed file is split into byte ranges parsed by parallel workers;
+    a compressed one is decompressed in this process and its line batches are
+    parsed by the workers.
+    Returns {language: Counter of words}.
+    """
+    workers = workers or os.cpu_count() or 1
+    totals = {language: Counter() for language in languages}
+
+    def merge(counts: dict) -> None:
+        for language, counter in counts.items():
+            totals[language].update(counter)
+
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        if os.path.splitext(path)[1] in COMPRESSED_OPENERS:
+            # At most 2 batches per worker in memory (imap would read the whole stream ahead)
+            in_flight = deque()
+            for batch in iter_line_batches(path, batch_lines):
+                if len(in_flight) >= 2 * workers:
+                    merge(in_flight.popleft().get())
+                in_flight.append(pool.apply_async(count_line_batch, ((batch, languages),)))
+            while in_flight:
+                merge(in_flight.popleft().get())
+        else:
+            tasks = [(path, start, end, languages) for start, end in byte_ranges(path, chunk_bytes)]
+            for counts in pool.imap_unordered(count_byte_range, tasks):
+                merge(counts)
+    return totals
+
+def write_dictionary(counts: Counter, output_path: str) -> int:
+    """
+    Write the "<word> <count>" frequency dictionary (single words only), returns its number of words.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    n_words = 0
+    with open(output_path, "w", encoding="utf-8") as fout:
+        for word, count in counts.items():
+            if " " not in word:
+                fout.write(f"{word} {count}\n")
+                n_words += 1
+    return n_words
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the frequency dictionaries and spell indexes of a Kaikki JSONL dump.")
+    parser.add_argument("input", help="Kaikki JSONL file, optionally .gz / .bz2 / .xz compressed")
+    parser.add_argument("--lang", nargs="+", default=["French"], help="Languages of the 'lang' field, e.g. French Spanish")
+    parser.add_argument("--output-dir", default="data")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, default all cores")
+    parser.add_argument("--chunk-mb", type=int, default=64, help="Size of the byte ranges of an uncompressed input")
+    parser.add_argument("--max-edit-distance", type=int, default=2)
+    parser.add_argument("--no-index", action="store_true", help="Do not build the spell indexes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    totals = count_words(args.input, args.lang, args.workers, args.chunk_mb * 1024 ** 2)
+    print(f"Parsed {args.input} in {time.perf_counter() - start:.1f}s")
+
+    for language, counts in totals.items():
+        dictionary_path = os.path.join(args.output_dir, f"{language.lower()}_dictionary.txt")
+        n_words = write_dictionary(counts, dictionary_path)
+        print(f"{dictionary_path} est généré avec succès ({n_words} mots).")
+        if not args.no_index:
+            from correction.spellCorrection import build_spell_index
+            index_path = os.path.join(args.output_dir, f"{language.lower()}_spell_index.pkl")
+            build_spell_index(dictionary_path, index_path, args.max_edit_distance)
+            print(f"{index_path} est généré avec succès.")
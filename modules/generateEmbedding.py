@@ -3,61 +3,185 @@
 #Date: 2025-05-31
 
 import torch
+import joblib
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from sentence_transformers import SentenceTransformer
+from sklearn.feature_extraction import FeatureHasher
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 
 
-def generate_embedding(df: pd.DataFrame, model_path, text_cols, value_cols, category_cols, label_cols: str) -> None:
-    st_model = SentenceTransformer(model_path)
-    
-    if text_cols is not None:
-        desc_embeddings = st_model.encode(
-            df[text_cols].fillna(""),
+# Columns of product_description
+TEXT_COLS = ["item_desc", "local_brand_name", "global_brand_name"]
+
+
+def product_description(df: pd.DataFrame) -> pd.Series:
+    """
+    Text encoded for each product, the same at training and at prediction time.
+    """
+    return "Produit description:" + df["item_desc"]+ "local_brand_name: " + df["local_brand_name"] + ", global_brand_name: " + df["global_brand_name"]
+
+
+def build_encoder(model_path: str, backend: str = "torch"):
+    """
+    Encoder of the product descriptions, created once and reused for every batch.
+    The caller closes it.
+
+    Args:
+        model_path: SentenceTransformer folder, or the export folder of
+            modules.quantizeModel.export_onnx_int8 with backend="onnx-int8"
+        backend: "torch" (modules.encoderService.EncoderService) or "onnx-int8"
+            (modules.quantizeModel.OnnxEncoder)
+    """
+    if backend == "onnx-int8":
+        from modules.quantizeModel import OnnxEncoder
+        return OnnxEncoder(model_path)
+    if backend == "torch":
+        from modules.encoderService import EncoderService
+        return EncoderService(model_path)
+    raise ValueError("Invalid backend. Choose from 'torch' or 'onnx-int8'.")
+
+
+class FeatureBuilder:
+    """
+    Fit once, then transform any batch (e.g. at inference) with the same encoders:
+        - value_cols: standardized (StandardScaler)
+        - category_cols: one-hot encoded, or hashed into hash_features columns
+          (fixed width, no vocabulary, unseen values need no refit)
+        - label_cols: index of each label in the vocabulary of the fit (-1 if unseen)
+    The categorical block is a scipy CSR matrix when sparse=True. All features are float32.
+    The fitted builder can be saved with save() and reloaded with FeatureBuilder.load().
+    """
+    def __init__(self, value_cols: list = None, category_cols: list = None, label_cols: list = None, sparse: bool = False, hash_features: int = None):
+        self.value_cols = value_cols
+        self.category_cols = category_cols
+        self.label_cols = label_cols
+        self.sparse = sparse
+        self.hash_features = hash_features
+        self.scaler = None
+        self.encoder = None
+        self.label_map = None
+        self.fitted = False
+
+    def fit(self, df: pd.DataFrame):
+        if self.value_cols is not None:
+            self.scaler = StandardScaler().fit(df[self.value_cols])
+        if self.category_cols is not None:
+            if self.hash_features is not None:
+                self.encoder = FeatureHasher(n_features=self.hash_features, input_type="string", alternate_sign=False, dtype=np.float32)
+            else:
+                self.encoder = OneHotEncoder(sparse_output=True, handle_unknown='ignore', dtype=np.float32)
+                self.encoder.fit(df[self.category_cols])
+        if self.label_cols is not None:
+            for col in self.label_cols:
+                if col not in df.columns:
+                    raise ValueError(f"Label column '{col}' not found in DataFrame.")
+            self.label_map = {col: {v: i for i, v in enumerate(df[col].unique())} for col in self.label_cols}
+        self.fitted = True
+        return self
+
+    def transform(self, df: pd.DataFrame):
+        """
+        Returns (scaled values or None, categorical block or None).
+        """
+        value_scaled = None
+        if self.scaler is not None:
+            value_scaled = self.scaler.transform(df[self.value_cols]).astype(np.float32)
+
+        category_block = None
+        if self.encoder is not None:
+            if self.hash_features is not None:
+                tokens = np.column_stack([
+                    (col + "=" + df[col].astype("string").fillna("")).to_numpy(dtype=object)
+                    for col in self.category_cols
+                ])
+                category_block = self.encoder.transform(tokens.tolist())
+            else:
+                category_block = self.encoder.transform(df[self.category_cols])
+            category_block = sp.csr_matrix(category_block, dtype=np.float32)
+            if not self.sparse:
+                category_block = category_block.toarray()
+        return value_scaled, category_block
+
+    def transform_labels(self, df: pd.DataFrame) -> np.ndarray:
+        return np.column_stack([
+            df[col].map(self.label_map[col]).fillna(-1).astype("int64").to_numpy() for col in self.label_cols
+        ])
+
+    def save(self, path: str) -> None:
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path: str) -> "FeatureBuilder":
+        return joblib.load(path)
+
+
+def generate_embedding(df: pd.DataFrame, model_path, text_cols, value_cols, category_cols, label_cols: str, cache=None, encoder=None, backend: str = "torch", sparse: bool = False, hash_features: int = None, feature_builder: FeatureBuilder = None):
+    """
+    Returns (X, y). X is a dense float32 array, or with sparse=True a tuple
+    (dense float32 text/value features, CSR float32 categorical block) for
+    NLPHierarchyClassifier(sparse_dim=...).
+
+    Args:
+        cache: Optional modules.embeddingCache.EmbeddingCache, only the texts which
+            are not in the cache are encoded (the model is not even loaded if none)
+        encoder: Optional modules.encoderService.EncoderService, reused instead of
+            loading the model at each call
+        backend: "torch" (fp32 SentenceTransformer) or "onnx-int8", then model_path is
+            the output folder of modules.quantizeModel.export_onnx_int8
+        sparse: Keep the categorical block sparse
+        hash_features: Hash the categories into this fixed number of columns instead of one-hot
+        feature_builder: Optional FeatureBuilder, fitted on df if it is not fitted yet,
+            otherwise only used to transform df (value_cols, category_cols, label_cols,
+            sparse and hash_features are then taken from it)
+    """
+    st_model = None
+    if encoder is None and backend == "onnx-int8":
+        encoder = build_encoder(model_path, backend)
+    elif backend not in ("torch", "onnx-int8"):
+        raise ValueError("Invalid backend. Choose from 'torch' or 'onnx-int8'.")
+
+    def encode(texts):
+        nonlocal st_model
+        if encoder is not None:
+            return encoder.encode(list(texts))
+        if st_model is None:
+            st_model = SentenceTransformer(model_path)
+        return st_model.encode(
+            texts,
             convert_to_tensor=False, 
             batch_size=8,
             device="cuda" if st_model.device.type == "cuda" else "cpu",
             show_progress_bar=True
         )
+    
+    if text_cols is not None:
+        texts = df[text_cols].fillna("").tolist()
+        if cache is not None:
+            desc_embeddings = cache.encode(texts, encode)
+        else:
+            desc_embeddings = encode(texts)
     else:
         desc_embeddings = np.array([])
     
-    value_scaled = []
-    if value_cols is not None:
-        scaler = StandardScaler()
-        for col in value_cols:
-            value_scaled.append(scaler.fit_transform(df[[col]]))
-        value_scaled = np.hstack(value_scaled)
-    else:
-        value_scaled = np.array([])
-
-    category_onehot = []
-    if category_cols is not None:
-        for col in category_cols:
-            onehot = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
-            category_onehot.append(onehot.fit_transform(df[[col]]))
-        category_onehot = np.hstack(category_onehot)
-    else:
-        category_onehot = np.array([])
-
+    if feature_builder is None:
+        feature_builder = FeatureBuilder(value_cols, category_cols, label_cols, sparse=sparse, hash_features=hash_features)
+    if not feature_builder.fitted:
+        feature_builder.fit(df)
+    value_scaled, category_block = feature_builder.transform(df)
     y = None
-    if label_cols is not None:
-        for col in label_cols:
-            if col not in df.columns:
-                raise ValueError(f"Label column '{col}' not found in DataFrame.")
-            
-        label_map = {col: {v: i for i, v in enumerate(df[col].unique())} for col in label_cols}
-        
-        for col in label_cols:
-            df[col + "_idx"] = df[col].map(label_map[col])
-        y = df[[col + "_idx" for col in label_cols]].values
-
-    feature_parts = []
-    for part in [desc_embeddings, value_scaled, category_onehot]:
-        if isinstance(part, (np.ndarray, torch.Tensor)) and part.size > 0:
-            feature_parts.append(part)
-    X = np.hstack(feature_parts)
+    if feature_builder.label_cols is not None and all(col in df.columns for col in feature_builder.label_cols):
+        y = feature_builder.transform_labels(df)
 
+    dense_parts = []
+    for part in [desc_embeddings, value_scaled]:
+        if isinstance(part, (np.ndarray, torch.Tensor)) and part.size > 0:
+            dense_parts.append(np.asarray(part, dtype=np.float32))
+    X_dense = np.hstack(dense_parts) if dense_parts else np.zeros((len(df), 0), dtype=np.float32)
 
-    return X, y
\ No newline at end of file
+    if feature_builder.sparse:
+        return (X_dense, category_block), y
+    if category_block is not None:
+        X_dense = np.hstack([X_dense, category_block])
+    return X_dense, y
@@ -8,9 +8,11 @@ from config.obtainInfo import (
     obtain_table_name,
     load_check_rules
 )
+import io
+import uuid
 import pandas as pd 
-import importlib
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Tuple, Iterable, Iterator, Union
 
 def generate_clean_clause(schema, prefix: str = None) -> str:
     """Generate a cleaning clause to normalize all STRING columns.
@@ -43,12 +45,53 @@ def generate_clean_clause(schema, prefix: str = None) -> str:
             clean_clause.append(f"{field_ref} AS {field.name}")
     return ",\n    ".join(clean_clause)
 
-def generate_clean_query(cfg:DatasetConfig, client:bigquery.Client, tableType:str) -> str:
+def generate_standarize_clause(cols: list, from_table: str, prefix: str = None) -> Tuple[str, str]:
+    """Generate the SQL equivalent of modules.standarize.standarize_by_frequence.
+        1. Remove all non-alphanumeric characters to normalize the variants
+        2. Count the frequency of each original value within its normalized group
+        3. Keep the most frequent original value of each group (ties -> smallest value)
+        4. Map every value to the selected value of its group
+
+        Args:
+        cols: Columns to standarize (already cleaned, so in upper case)
+        from_table: Table or CTE name containing the cleaned columns
+        prefix: Optional table alias prefix of from_table, e.g. "c"
+
+        Returns:
+        (mapping CTEs, join clause), the select list should use "{col}_map.standard AS {col}"
+    """
+    mapping_ctes = []
+    join_clause = []
+    for col in cols:
+        col_ref = f"{prefix}.{col}" if prefix else col
+        mapping_ctes.append(f"""{col}_map AS (
+        SELECT
+            normalized,
+            ARRAY_AGG({col} ORDER BY cnt DESC, {col} ASC LIMIT 1)[OFFSET(0)] AS standard
+        FROM (
+            SELECT REGEXP_REPLACE({col}, r'[^A-Z0-9]', '') AS normalized, {col}, COUNT(*) AS cnt
+            FROM {from_table}
+            WHERE {col} IS NOT NULL
+            GROUP BY normalized, {col}
+        )
+        GROUP BY normalized
+    )""")
+        join_clause.append(
+            f"LEFT JOIN {col}_map ON REGEXP_REPLACE({col_ref}, r'[^A-Z0-9]', '') = {col}_map.normalized"
+        )
+    return ",\n    ".join(mapping_ctes), "\n    ".join(join_clause)
+
+def generate_clean_query(cfg:DatasetConfig, client:bigquery.Client, tableType:str, standarize_cols: list = None, mapping_table: str = None) -> str:
     """
     Apply the cleaning clause to the table of the specified type (tableType).
+    If standarize_cols is given, the brand/supplier standarization is fused into
+    the same query so the clean table is written only once.
 
     Args:
         tableType: Type of table to clean (raw, clean, excluded)
+        standarize_cols: Optional STRING columns to standarize by frequence
+        mapping_table: Optional table of the variant -> standard mapping of standarize_cols
+            (columns column_name, variant, standard), default computed in the query
     """
     table = obtain_table_name(cfg, tableType)
     data = client.get_table(f"{cfg.project}.{cfg.dataset}.{table}")
@@ -58,42 +101,109 @@ def generate_clean_query(cfg:DatasetConfig, client:bigquery.Client, tableType:st
     SELECT {clean_clause_str} 
     FROM `{cfg.project}.{cfg.dataset}.{table}`
     """
+    if not standarize_cols:
+        return clean_query
+    if mapping_table:
+        return generate_mapping_join_query(clean_query, standarize_cols, mapping_table)
+
+    mapping_ctes, join_clause = generate_standarize_clause(standarize_cols, "cleaned", "c")
+    replace_clause = ", ".join(f"{col}_map.standard AS {col}" for col in standarize_cols)
+    clean_query = f"""
+    WITH cleaned AS (
+        {clean_query}
+    ),
+    {mapping_ctes}
+    SELECT c.* REPLACE ({replace_clause})
+    FROM cleaned c
+    {join_clause}
+    """
     return clean_query
 
-def duplicate_rows_query(cfg:DatasetConfig, from_table, all_columns_clause:str) -> str:
+def generate_variant_counts_query(cfg:DatasetConfig, client:bigquery.Client, cols:list) -> str:
     """
-    Generate a query to find duplicate rows in the clean table.
+    Frequency of each cleaned value of cols in the raw table (columns column_name, variant, count),
+    input of modules.standarize.build_frequence_mapping: the same counts as the
+    standarization of the local backend, so both pick the same standard values.
     """
-    # 1. Duplicate rows
-    rule_row = f"""
-    SELECT 'all_line_duplicate' AS reason, *
-    FROM `{from_table}`
-    QUALIFY ROW_NUMBER() OVER (PARTITION BY {all_columns_clause}) > 1
+    raw_table = f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}"
+    schema = client.get_table(raw_table).schema
+    clean_clause = generate_clean_clause([field for field in schema if field.name in cols], None)
+    variants = ", ".join(f"STRUCT('{col}' AS column_name, {col} AS variant)" for col in cols)
+    return f"""
+    SELECT v.column_name, v.variant, COUNT(*) AS count
+    FROM (SELECT {clean_clause} FROM `{raw_table}`), UNNEST([{variants}]) AS v
+    WHERE v.variant IS NOT NULL
+    GROUP BY column_name, variant
     """
-    
-    return rule_row
 
-def duplicate_keys_query(cfg:DatasetConfig, from_table:str) -> str:
-    # 2. Duplicate keys
-    rule_key = f"""
-    SELECT 'primary_key_duplicate' AS reason, *
-    FROM `{from_table}`
-    QUALIFY ROW_NUMBER() OVER (PARTITION BY {cfg.key_cle}) > 1
+def generate_distinct_values_query(cfg:DatasetConfig, cols:list, tableTypes:list) -> str:
+    """
+    Distinct non-NULL values (column value) of cols over the tables of tableTypes,
+    e.g. the brand names protected from the spell correction.
+    """
+    tables = "\n        UNION ALL\n        ".join(
+        f"SELECT {', '.join(cols)} FROM `{cfg.project}.{cfg.dataset}.{obtain_table_name(cfg, tableType)}`"
+        for tableType in tableTypes
+    )
+    return f"""
+    SELECT DISTINCT value
+    FROM (
+        {tables}
+    ), UNNEST([{", ".join(cols)}]) AS value
+    WHERE value IS NOT NULL
     """
 
-    return rule_key
+def generate_mapping_join_query(clean_query:str, cols:list, mapping_table:str) -> str:
+    """
+    Replace the values of cols of the rows of clean_query by their standard value in
+    mapping_table (columns column_name, variant, standard), values not in it are kept.
+    """
+    mapping_ctes = ",\n    ".join(
+        f"""{col}_map AS (
+        SELECT variant, standard FROM `{mapping_table}` WHERE column_name = '{col}'
+    )""" for col in cols
+    )
+    replace_clause = ", ".join(f"COALESCE({col}_map.standard, c.{col}) AS {col}" for col in cols)
+    join_clause = "\n    ".join(f"LEFT JOIN {col}_map ON c.{col} = {col}_map.variant" for col in cols)
+    return f"""
+    WITH cleaned AS (
+        {clean_query}
+    ),
+    {mapping_ctes}
+    SELECT c.* REPLACE ({replace_clause})
+    FROM cleaned c
+    {join_clause}
+    """
 
-def barcode_length_query(cfg:DatasetConfig, from_table:str) -> str:
-    # 3. Invalid barcode length
-    rule_barcode = f"""
-    SELECT 'wrong_barcode_length' AS reason, *
-    FROM `{from_table}`
-    WHERE LENGTH({cfg.main_barcode}) NOT IN (7, 8, 10, 13)
+def duplicate_rows_rule(cfg:DatasetConfig) -> Tuple[str,str]:
+    """
+    1. Duplicate rows: every copy of a row but the first one.
+    _occurrence numbers the identical rows (same _row_fingerprint).
     """
+    return "all_line_duplicate", "_occurrence > 1"
 
-    return rule_barcode
+def duplicate_keys_rule(cfg:DatasetConfig, schema:list) -> Tuple[str,str]:
+    """
+    2. Duplicate keys: every row of a key but the first one, ordered by the values
+    of the row (NULLs first, as modules.localEngine.check_flags), so both backends
+    keep the same row. ARRAY / STRUCT columns cannot be ordered, _row_fingerprint
+    only breaks the ties of rows differing in these columns.
+    """
+    order_cols = [
+        field.name for field in schema
+        if field.mode != "REPEATED" and field.field_type not in ("RECORD", "STRUCT", "GEOGRAPHY", "JSON")
+    ]
+    rule_key = (
+        f"ROW_NUMBER() OVER (PARTITION BY {cfg.key_cle} "
+        f"ORDER BY {', '.join(order_cols + ['_row_fingerprint', '_occurrence'])}) > 1"
+    )
+    return "primary_key_duplicate", rule_key
 
-def date_format_query(cfg:DatasetConfig,from_table:str, schema:list) -> str:
+def barcode_length_rule(cfg:DatasetConfig) -> Tuple[str,str]:
+    # 3. Invalid barcode length
+    return "wrong_barcode_length", f"LENGTH({cfg.main_barcode}) NOT IN (7, 8, 10, 13)"
+
+def date_format_rule(cfg:DatasetConfig, schema:list) -> Tuple[str,str]:
 
     for field in schema:
         if field.field_type == "DATE":
@@ -102,96 +212,517 @@ def date_format_query(cfg:DatasetConfig,from_table:str, schema:list) -> str:
     else:
         raise ValueError("No DATE field found in the schema.")
 
-        # 4. Invalid date format
-    rule_date = f"""
-    SELECT 'wrong_date' AS reason, *
-    FROM `{from_table}`
-    WHERE EXTRACT(YEAR FROM {date_ref}) < 1900 OR
-          EXTRACT(YEAR FROM {date_ref}) > 2100 OR
-          {date_ref} IS NULL
+    # 4. Invalid date format
+    rule_date = (
+        f"EXTRACT(YEAR FROM {date_ref}) < 1900 OR "
+        f"EXTRACT(YEAR FROM {date_ref}) > 2100 OR "
+        f"{date_ref} IS NULL"
+    )
+    return "wrong_date", rule_date
+
+def hierarchy_edge_fingerprint(level:int, parent:str, child:str) -> str:
+    return f"FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({level} AS level, {parent} AS parent, {child} AS child)))"
+
+def generate_hierarchy_edges_query(cfg:DatasetConfig, schema:list) -> str:
+    """
+    Compact parent->child index of the hierarchy: one fingerprint per valid link
+    (level, parent, child), from the reference taxonomy if cfg.taxonomy_table is set,
+    otherwise from the links seen at least cfg.min_path_count times in the clean table.
     """
+    cols = [col.strip() for col in cfg.hierarchy_cols.split(",")]
+    missing = set(cols) - {field.name for field in schema}
+    if missing:
+        raise ValueError(f"Hierarchy columns not found in the schema: {sorted(missing)}.")
+
+    if cfg.taxonomy_table:
+        source_table = f"{cfg.project}.{cfg.dataset}.{cfg.taxonomy_table}"
+        having_clause = ""
+    else:
+        # The whole clean table, also when only a delta of it is checked
+        source_table = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+        having_clause = f"HAVING COUNT(*) >= {cfg.min_path_count}"
 
-    return rule_date
+    edges_queries = [
+        f"""SELECT {hierarchy_edge_fingerprint(level, parent, child)} AS edge
+            FROM `{source_table}`
+            WHERE {parent} IS NOT NULL AND {child} IS NOT NULL
+            GROUP BY edge
+            {having_clause}"""
+        for level, (parent, child) in enumerate(zip(cols[:-1], cols[1:]))
+    ]
+    return "\n            UNION ALL\n            ".join(edges_queries)
 
+def hierarchy_consistency_rule(cfg:DatasetConfig) -> Tuple[str,str]:
+    """
+    5. Hierarchy chain which is not a valid path: a level is filled while its parent
+    is empty, or the link parent->child is not in the _hierarchy_edges index
+    (see generate_hierarchy_edges_query). Empty trailing levels are allowed.
+    """
+    cols = [col.strip() for col in cfg.hierarchy_cols.split(",")]
+    checks = [
+        f"({child} IS NOT NULL AND ({parent} IS NULL OR "
+        f"{hierarchy_edge_fingerprint(level, parent, child)} NOT IN (SELECT edge FROM _hierarchy_edges)))"
+        for level, (parent, child) in enumerate(zip(cols[:-1], cols[1:]))
+    ]
+    return "hierarchy_inconsistent", "\n                    OR ".join(checks)
+
+def generate_row_id_query(from_table:str) -> str:
+    """
+    Number the rows of from_table with a deterministic row_id:
+    fingerprint of the whole row + occurrence of this row among its identical copies.
+    """
+    row_id_query = f"""
+    SELECT *, FORMAT('%d-%d', _row_fingerprint, _occurrence) AS row_id
+    FROM (
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY _row_fingerprint) AS _occurrence
+        FROM (
+            SELECT t.*, FARM_FINGERPRINT(TO_JSON_STRING(t)) AS _row_fingerprint
+            FROM `{from_table}` t
+        )
+    )
+    """
+    return row_id_query
 
-def generate_check_exclude_query(cfg:DatasetConfig, client:bigquery.Client) -> Tuple[str,str]:
+def generate_check_exclude_query(cfg:DatasetConfig, client:bigquery.Client, from_table:str = None) -> Tuple[str,str]:
     """
-    Query1 : Check duplicates across the entire line
-    Query2 : Check duplicates based on primary key
-    Query3 : Check barcode length
-    Query4 : Check date format
-    This function generates a query to check for data quality issues in the clean table.
+    Rule1 : Check duplicates across the entire line
+    Rule2 : Check duplicates based on primary key
+    Rule3 : Check barcode length
+    Rule4 : Check date format
+    Rule5 : Check the hierarchy chain is a valid path
+    All the active rules are compiled into flags computed in a single scan of the
+    clean table, then each row gets the array of its reasons.
+    Returns the query of the excluded rows (reasons, reason, row_id, columns) and the query
+    of the remaining clean rows, split from the excluded ones by row_id.
+
+    Args:
+        from_table: Optional table to check instead of the clean table (e.g. a script temp table)
     """
     schema = client.get_table(f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}").schema
     columns = [field.name for field in schema]
     all_columns_clause = ", ".join(columns)   
 
-    clean_table = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    clean_table = from_table or f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
     excluded_table = f"{cfg.project}.{cfg.dataset}.{cfg.excluded_table}"
     
-    # Combine all rules into a single query
-    rule_queries = []
+    # Compile all rules into flags of a single query
+    rules = []
     active_rules = load_check_rules(cfg.dataset_type)
     if "duplicate_row" in active_rules:
-        rule_queries.append(duplicate_rows_query(cfg, clean_table, all_columns_clause))
+        rules.append(duplicate_rows_rule(cfg))
     if "duplicate_key" in active_rules:
-        rule_queries.append(duplicate_keys_query(cfg, clean_table))
+        rules.append(duplicate_keys_rule(cfg, schema))
     if "barcode_length" in active_rules:
-        rule_queries.append(barcode_length_query(cfg, clean_table))
+        rules.append(barcode_length_rule(cfg))
     if "date_format" in active_rules:
-        date_q = date_format_query(cfg, clean_table, schema)
-        if date_q:
-            rule_queries.append(date_q)
+        rules.append(date_format_rule(cfg, schema))
+    edges_clause = ""
+    if "hierarchy_consistency" in active_rules:
+        rules.append(hierarchy_consistency_rule(cfg))
+        edges_clause = f"""_hierarchy_edges AS (
+            {generate_hierarchy_edges_query(cfg, schema)}
+        ),"""
 
-    union_query = " UNION ALL ".join(rule_queries)
+    flags_clause = ",\n                ".join(
+        f"IFNULL({predicate}, FALSE) AS _flag_{reason}" for reason, predicate in rules
+    )
+    reasons_clause = ", ".join(f"IF(_flag_{reason}, '{reason}', NULL)" for reason, _ in rules)
     exclude_query = f"""
-        WITH check_errors AS (
-            {union_query}
+        WITH {edges_clause}
+        numbered AS (
+            {generate_row_id_query(clean_table)}
+        ),
+        flagged AS (
+            SELECT
+                *,
+                {flags_clause}
+            FROM numbered
         ),
-        grouped AS (
+        checked AS (
             SELECT
-                ARRAY_AGG(DISTINCT reason) AS reasons,
+                ARRAY(
+                    SELECT reason FROM UNNEST([{reasons_clause}]) AS reason
+                    WHERE reason IS NOT NULL
+                ) AS reasons,
+                row_id,
                 {all_columns_clause}
-            FROM check_errors
-            GROUP BY {all_columns_clause}
+            FROM flagged
         )
-        SELECT * FROM grouped
+        SELECT reasons, ARRAY_TO_STRING(reasons, ',') AS reason, * EXCEPT (reasons)
+        FROM checked
+        WHERE ARRAY_LENGTH(reasons) > 0
     """
 
     filter_query = f"""
-    SELECT * FROM `{clean_table}` 
-    EXCEPT DISTINCT 
-    SELECT {all_columns_clause} FROM `{excluded_table}`
+    WITH numbered AS (
+        {generate_row_id_query(clean_table)}
+    )
+    SELECT {", ".join(f"n.{col}" for col in columns)}
+    FROM numbered n
+    LEFT JOIN `{excluded_table}` e ON n.row_id = e.row_id
+    WHERE e.row_id IS NULL
     """
 
     return exclude_query,filter_query
 
+def generate_near_duplicate_source_query(cfg:DatasetConfig, columns:list) -> str:
+    """
+    Rows of the near_duplicate rule: the clean rows not excluded by the other
+    rules, with their row_id and the hash partition (_partition) of their block,
+    so the blocks can be read and compared one partition at a time.
+    """
+    clean_table = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    excluded_table = f"{cfg.project}.{cfg.dataset}.{cfg.excluded_table}"
+    block_cols = [col.strip() for col in cfg.near_duplicate_block_cols.split(",")]
+    block_clause = ", ".join(f"n.{col}" for col in block_cols)
+    return f"""
+    WITH numbered AS (
+        {generate_row_id_query(clean_table)}
+    )
+    SELECT
+        n.row_id, {", ".join(f"n.{col}" for col in columns)},
+        MOD(ABS(FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({block_clause})))), {cfg.near_duplicate_partitions}) AS _partition
+    FROM numbered n
+    LEFT JOIN `{excluded_table}` e ON n.row_id = e.row_id
+    WHERE e.row_id IS NULL
+    """
 
-def do_query_job(cfg:DatasetConfig,client:bigquery.Client, tableType:str, query:str) -> None:
+def generate_near_duplicate_merge(cfg:DatasetConfig, columns:list) -> str:
     """
-    Execute the query and save the result in the specified table
+    Add the rows of the near-duplicate table to the excluded table with the
+    reason 'near_duplicate' (appended to the reasons of an already excluded row).
     """
-    table = obtain_table_name(cfg, tableType)
-    job = client.query(
-        query,
-        job_config=bigquery.QueryJobConfig(
-            destination = f"{cfg.project}.{cfg.dataset}.{table}",
-            write_disposition = "WRITE_TRUNCATE",
+    clean_table = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    excluded_table = f"{cfg.project}.{cfg.dataset}.{cfg.excluded_table}"
+    near_duplicate_table = f"{cfg.project}.{cfg.dataset}.{cfg.near_duplicate_table}"
+    return f"""
+    MERGE `{excluded_table}` T
+    USING (
+        WITH numbered AS (
+            {generate_row_id_query(clean_table)}
         )
+        SELECT n.* FROM numbered n
+        JOIN `{near_duplicate_table}` d ON n.row_id = d.row_id
+    ) S
+    ON T.row_id = S.row_id
+    WHEN MATCHED AND 'near_duplicate' NOT IN UNNEST(T.reasons) THEN
+        UPDATE SET
+            reasons = ARRAY_CONCAT(T.reasons, ['near_duplicate']),
+            reason = ARRAY_TO_STRING(ARRAY_CONCAT(T.reasons, ['near_duplicate']), ',')
+    WHEN NOT MATCHED THEN
+        INSERT (reasons, reason, row_id, {", ".join(columns)})
+        VALUES (['near_duplicate'], 'near_duplicate', S.row_id, {", ".join(f"S.{col}" for col in columns)})
+    """
+
+
+def generate_key_fingerprint(cfg:DatasetConfig, prefix: str = None) -> str:
+    """
+    Fingerprint of the primary key (cfg.key_cle), NULL-safe so it can be used in IN / JOIN.
+
+    Args:
+        prefix: Optional table alias prefix, e.g. "T"
+    """
+    keys = [key.strip() for key in cfg.key_cle.split(",")]
+    key_refs = ", ".join(f"{prefix}.{key}" if prefix else key for key in keys)
+    return f"FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({key_refs})))"
+
+def generate_replace_keys_merge(cfg:DatasetConfig, target_table:str, source_table:str) -> str:
+    """
+    Replace, in one atomic MERGE, all the rows of target_table whose key changed
+    (listed in the delta table) by the rows of source_table.
+    """
+    delta_table = f"{cfg.project}.{cfg.dataset}.{cfg.delta_table}"
+    return f"""
+    MERGE `{target_table}` T
+    USING `{source_table}` S
+    ON FALSE
+    WHEN NOT MATCHED BY SOURCE
+        AND {generate_key_fingerprint(cfg, "T")} IN (SELECT key_fingerprint FROM `{delta_table}`)
+        THEN DELETE
+    WHEN NOT MATCHED THEN INSERT ROW
+    """
+
+def generate_incremental_clean_query(cfg:DatasetConfig, client:bigquery.Client, standarize_cols: list = None) -> str:
+    """
+    Script writing the changed keys to the delta table and their cleaned rows to
+    the delta_clean table, merged into the clean table by generate_incremental_merge_query.
+    A key changes when one of its raw rows is newer than the watermark (max of
+    cfg.watermark_col in the clean table), or has a brand whose standard changed
+    in the mapping table (flagged by modules.standarize.flag_mapping_changes), so
+    a brand never keeps two spellings. All the rows of a changed key are rebuilt,
+    so the duplicate checks stay correct when validating only these keys.
+    The raw rows are filtered on the changed keys before being cleaned.
+    Rows deleted from the raw table are only removed by a full rebuild.
+    """
+    if cfg.watermark_col is None:
+        raise ValueError("The incremental mode needs cfg.watermark_col.")
+
+    raw_table = f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}"
+    clean_table = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    delta_table = f"{cfg.project}.{cfg.dataset}.{cfg.delta_table}"
+    delta_clean_table = f"{cfg.project}.{cfg.dataset}.{cfg.delta_clean_table}"
+    mapping_table = f"{cfg.project}.{cfg.dataset}.{cfg.mapping_table}"
+
+    schema = client.get_table(raw_table).schema
+    fields = {field.name: field for field in schema}
+    keys = [key.strip() for key in cfg.key_cle.split(",")]
+    standarize_cols = standarize_cols or []
+    # Cleaned keys in the order of cfg.key_cle, as generate_key_fingerprint
+    key_clause = generate_clean_clause([fields[key] for key in keys], None)
+    changed_clause = "".join(
+        f"\n        OR {col} IN (SELECT variant FROM `{mapping_table}` WHERE column_name = '{col}' AND changed)"
+        for col in standarize_cols
+    )
+    delta_rows = f"""
+        SELECT {generate_clean_clause(schema, None)}
+        FROM `{raw_table}`
+        WHERE FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({key_clause}))) IN (SELECT key_fingerprint FROM `{delta_table}`)
+    """
+    if standarize_cols:
+        delta_rows = generate_mapping_join_query(delta_rows, standarize_cols, mapping_table)
+
+    incremental_query = f"""
+    DECLARE last_watermark DEFAULT (SELECT MAX({cfg.watermark_col}) FROM `{clean_table}`);
+
+    CREATE OR REPLACE TABLE `{delta_table}` AS
+    SELECT DISTINCT {generate_key_fingerprint(cfg)} AS key_fingerprint, {", ".join(keys)}
+    FROM (
+        SELECT {generate_clean_clause([fields[col] for col in dict.fromkeys(keys + standarize_cols)], None)}, {cfg.watermark_col} AS _watermark
+        FROM `{raw_table}`
+    )
+    WHERE last_watermark IS NULL OR _watermark > last_watermark{changed_clause};
+
+    CREATE OR REPLACE TABLE `{delta_clean_table}` AS
+    {delta_rows};
+    """
+    return incremental_query
+
+def generate_mapping_applied_query(cfg:DatasetConfig) -> str:
+    """
+    Clear the changed flags of the mapping table once the clean table uses its standards.
+    """
+    return f"UPDATE `{cfg.project}.{cfg.dataset}.{cfg.mapping_table}` SET changed = FALSE WHERE changed"
+
+def generate_incremental_merge_query(cfg:DatasetConfig, standarize_cols: list = None) -> str:
+    """
+    Script replacing the rows of the changed keys of the clean table by the
+    rows of the delta_clean table (see generate_incremental_clean_query).
+    """
+    clean_table = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    delta_clean_table = f"{cfg.project}.{cfg.dataset}.{cfg.delta_clean_table}"
+    mapping_clause = f"{generate_mapping_applied_query(cfg)};" if standarize_cols else ""
+    return f"""
+    {generate_replace_keys_merge(cfg, clean_table, delta_clean_table)};
+
+    {mapping_clause}
+    """
+
+def generate_incremental_check_query(cfg:DatasetConfig, client:bigquery.Client) -> str:
+    """
+    Script validating only the clean rows of the keys changed by the last
+    incremental cleaning, then merging the result into the excluded table.
+    """
+    clean_table = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    excluded_table = f"{cfg.project}.{cfg.dataset}.{cfg.excluded_table}"
+    delta_table = f"{cfg.project}.{cfg.dataset}.{cfg.delta_table}"
+
+    exclude_query, _ = generate_check_exclude_query(cfg, client, "_delta_rows")
+
+    # A constant array of the values of the first clustering column lets BigQuery prune the clean table
+    keys = [key.strip() for key in cfg.key_cle.split(",")]
+    clustering, _ = table_layout(cfg, "clean")
+    declare_clause, prune_clause = "", ""
+    if clustering and clustering[0] in keys:
+        col = clustering[0]
+        declare_clause = f"DECLARE _delta_{col} DEFAULT (SELECT ARRAY_AGG(DISTINCT {col} IGNORE NULLS) FROM `{delta_table}`);"
+        prune_clause = f"({col} IN UNNEST(_delta_{col}) OR {col} IS NULL) AND"
+
+    incremental_query = f"""
+    {declare_clause}
+
+    CREATE TEMP TABLE _delta_rows AS
+    SELECT * FROM `{clean_table}`
+    WHERE {prune_clause} {generate_key_fingerprint(cfg)} IN (SELECT key_fingerprint FROM `{delta_table}`);
+
+    CREATE TEMP TABLE _delta_excluded AS
+    {exclude_query};
+
+    {generate_replace_keys_merge(cfg, excluded_table, "_delta_excluded")};
+    """
+    return incremental_query
+
+def table_layout(cfg:DatasetConfig, tableType:str) -> Tuple[list, str]:
+    """
+    (clustering columns, partitioning column) of a table type from the configuration,
+    only the clean and excluded tables have a layout.
+    """
+    if tableType == "clean":
+        clustering, partitioning = cfg.clean_clustering, cfg.clean_partitioning
+    elif tableType == "excluded":
+        clustering, partitioning = cfg.excluded_clustering, cfg.excluded_partitioning
+    else:
+        return None, None
+    clustering = [col.strip() for col in clustering.split(",")] if clustering else None
+    return clustering, partitioning
+
+def apply_table_layout(cfg:DatasetConfig, tableType:str, config):
+    """
+    Set the clustering and time partitioning of tableType on a QueryJobConfig,
+    LoadJobConfig or Table.
+    """
+    clustering, partitioning = table_layout(cfg, tableType)
+    if clustering:
+        config.clustering_fields = clustering
+    if partitioning:
+        config.time_partitioning = bigquery.TimePartitioning(type_=cfg.partition_granularity, field=partitioning)
+    return config
+
+def layout_matches(cfg:DatasetConfig, tableType:str, table:bigquery.Table) -> bool:
+    """
+    True if an existing table has the configured layout (and the excluded table its reason column).
+    """
+    clustering, partitioning = table_layout(cfg, tableType)
+    if (table.clustering_fields or None) != clustering:
+        return False
+    current = table.time_partitioning
+    if partitioning is None:
+        if current is not None:
+            return False
+    elif current is None or current.field != partitioning or current.type_ != cfg.partition_granularity:
+        return False
+    if tableType == "excluded" and "reason" not in [field.name for field in table.schema]:
+        return False
+    return True
+
+def layout_differs(cfg:DatasetConfig, client:bigquery.Client, tableType:str) -> bool:
+    """
+    True if tableType exists with another layout than the configured one.
+    """
+    from google.api_core.exceptions import NotFound
+    table = f"{cfg.project}.{cfg.dataset}.{obtain_table_name(cfg, tableType)}"
+    try:
+        current = client.get_table(table)
+    except NotFound:
+        return False
+    return not layout_matches(cfg, tableType, current)
+
+def replace_table(cfg:DatasetConfig, client:bigquery.Client, tableType:str, staging_table:str) -> None:
+    """
+    Replace tableType by a staging table written with the configured layout.
+    A table cannot be overwritten by one with another partitioning, so a table
+    with another layout is replaced in one DDL statement (CREATE OR REPLACE ...
+    COPY, which takes the layout of the staging table) instead of being dropped
+    first: if the write fails, the previous table is still there.
+    """
+    target_table = f"{cfg.project}.{cfg.dataset}.{obtain_table_name(cfg, tableType)}"
+    if layout_differs(cfg, client, tableType):
+        print(f"Recreating {target_table} with the configured partitioning / clustering")
+        do_script_job(cfg, client, f"CREATE OR REPLACE TABLE `{target_table}` COPY `{staging_table}`")
+        return
+    job = client.copy_table(
+        staging_table,
+        target_table,
+        job_config=bigquery.CopyJobConfig(write_disposition = "WRITE_TRUNCATE")
     )
     job.result()
 
-def do_data2table_job(cfg: DatasetConfig, client:bigquery.Client, tableType:str, df:pd.DataFrame, schema:list) -> None:
+def do_query_job(cfg:DatasetConfig,client:bigquery.Client, tableType:str, query:str) -> None:
     """
-    Convert a dataframe to a table
+    Execute the query and save the result in the specified table,
+    partitioned and clustered as configured (see table_layout).
+    If the table exists with another layout, the result is written to a staging
+    table first, then replaces it (see replace_table).
     """
-    table = obtain_table_name(cfg, tableType)
-    job = client.load_table_from_dataframe(
-        df,
-        f"{cfg.project}.{cfg.dataset}.{table}",
-        job_config=bigquery.LoadJobConfig(
-            write_disposition = "WRITE_TRUNCATE",
-            schema = schema
+    target_table = f"{cfg.project}.{cfg.dataset}.{obtain_table_name(cfg, tableType)}"
+    differs = layout_differs(cfg, client, tableType)
+    destination = f"{target_table}__staging_{uuid.uuid4().hex[:8]}" if differs else target_table
+    try:
+        job = client.query(
+            query,
+            job_config=apply_table_layout(cfg, tableType, bigquery.QueryJobConfig(
+                destination = destination,
+                write_disposition = "WRITE_TRUNCATE",
+            ))
         )
-    )
-    job.result()
\ No newline at end of file
+        job.result()
+        if differs:
+            replace_table(cfg, client, tableType, destination)
+    finally:
+        if differs:
+            client.delete_table(destination, not_found_ok=True)
+
+def split_dataframe(df:pd.DataFrame, chunk_rows:int) -> Iterator[pd.DataFrame]:
+    """
+    Yield slices (views, no copy) of chunk_rows rows of a dataframe
+    """
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def dataframe_to_parquet(df:pd.DataFrame, compression:str = "snappy") -> io.BytesIO:
+    """
+    Serialize a dataframe chunk to an in-memory compressed Parquet file
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer, compression=compression)
+    buffer.seek(0)
+    return buffer
+
+def do_data2table_job(
+        cfg: DatasetConfig,
+        client:bigquery.Client,
+        tableType:str,
+        df:Union[pd.DataFrame, Iterable[pd.DataFrame]],
+        schema:list,
+        chunk_rows:int = 500_000,
+        max_workers:int = 4,
+        compression:str = "snappy"
+) -> None:
+    """
+    Convert a dataframe (or an iterator of dataframe chunks) to a table.
+    Each chunk is serialized to compressed Parquet and appended to a staging table
+    by parallel load jobs; at most max_workers chunks are in memory at once.
+    The target table is then replaced atomically by a copy of the staging table
+    (partitioned and clustered as configured, see table_layout and replace_table).
+    """
+    table = obtain_table_name(cfg, tableType)
+    target_table = f"{cfg.project}.{cfg.dataset}.{table}"
+    staging_table = f"{target_table}__staging_{uuid.uuid4().hex[:8]}"
+    chunks = split_dataframe(df, chunk_rows) if isinstance(df, pd.DataFrame) else df
+
+    load_config = apply_table_layout(cfg, tableType, bigquery.LoadJobConfig(
+        source_format = bigquery.SourceFormat.PARQUET,
+        write_disposition = "WRITE_APPEND",
+        schema = schema
+    ))
+
+    def load_chunk(buffer: io.BytesIO) -> None:
+        job = client.load_table_from_file(buffer, staging_table, job_config=load_config)
+        job.result()
+
+    # The copy gives the target table the layout of the staging table
+    client.create_table(apply_table_layout(cfg, tableType, bigquery.Table(staging_table, schema=schema)))
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = set()
+            for chunk in chunks:
+                if len(in_flight) >= max_workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                in_flight.add(executor.submit(load_chunk, dataframe_to_parquet(chunk, compression)))
+            for future in in_flight:
+                future.result()
+
+        replace_table(cfg, client, tableType, staging_table)
+    finally:
+        client.delete_table(staging_table, not_found_ok=True)
+
+def do_script_job(cfg:DatasetConfig, client:bigquery.Client, query:str) -> None:
+    """
+    Execute a multi-statement query (the script writes its own tables)
+    """
+    job = client.query(query)
+    job.result()
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import re
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+
+
+class BudgetExceededError(RuntimeError):
+    """
+    Raised by the dry-run check when a step would process more bytes than allowed.
+    """
+
+
+@dataclass
+class StepStats:
+    step: str
+    job_type: str # query, load, copy or local
+    job_id: str = None
+    wall_time_s: float = 0.0
+    estimated_bytes: int = None # from the dry-run check
+    total_bytes_processed: int = None
+    total_bytes_billed: int = None
+    slot_millis: int = None
+    cache_hit: bool = None
+    output_rows: int = None
+
+
+class RunReport:
+    """
+    Structured report of all the jobs of a pipeline run, one StepStats per job.
+    """
+    def __init__(self):
+        self.jobs = []
+
+    def add(self, stats: StepStats) -> None:
+        self.jobs.append(stats)
+
+    @contextmanager
+    def timed(self, step: str, job_type: str = "local"):
+        """
+        Record the wall time of a block of work which is not a BigQuery job.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(StepStats(step=step, job_type=job_type, wall_time_s=time.perf_counter() - start))
+
+    def by_step(self) -> dict:
+        """
+        Sum the stats of the jobs of each step.
+        """
+        steps = {}
+        for job in self.jobs:
+            total = steps.setdefault(job.step, {
+                "jobs": 0, "wall_time_s": 0.0, "total_bytes_processed": 0,
+                "total_bytes_billed": 0, "slot_millis": 0, "cache_hits": 0
+            })
+            total["jobs"] += 1
+            total["wall_time_s"] += job.wall_time_s
+            total["total_bytes_processed"] += job.total_bytes_processed or 0
+            total["total_bytes_billed"] += job.total_bytes_billed or 0
+            total["slot_millis"] += job.slot_millis or 0
+            total["cache_hits"] += 1 if job.cache_hit else 0
+        return steps
+
+    def to_dict(self) -> dict:
+        return {"jobs": [asdict(job) for job in self.jobs], "steps": self.by_step()}
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2, default=str)
+
+    def summary(self) -> str:
+        lines = []
+        for step, total in self.by_step().items():
+            lines.append(
+                f"{step}: {total['jobs']} job(s), {total['wall_time_s']:.1f}s, "
+                f"{total['total_bytes_processed'] / 1e9:.3f} GB processed, "
+                f"{total['total_bytes_billed'] / 1e9:.3f} GB billed, "
+                f"{total['slot_millis']} slot-ms, {total['cache_hits']} cache hit(s)"
+            )
+        return "\n".join(lines)
+
+
+# Target of a statement writing a table, the pipeline quotes its permanent tables
+WRITE_TARGET = re.compile(
+    r"\b(?:MERGE(?:\s+INTO)?|UPDATE|INSERT(?:\s+INTO)?|DELETE(?:\s+FROM)?|TRUNCATE\s+TABLE"
+    r"|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|CREATE(?:\s+OR\s+REPLACE)?\s+TABLE(?:\s+IF\s+NOT\s+EXISTS)?)\s+`([^`]+)`",
+    re.IGNORECASE
+)
+
+
+def written_tables(query: str) -> list:
+    """
+    Tables written by a query: none for a single SELECT statement (only its
+    anonymous result table), the quoted targets of a script or DML statement,
+    None if they are unknown (all the tables may have changed).
+    """
+    statement = query.strip().rstrip(";")
+    words = statement.lstrip("( \n").split(None, 1)
+    if words and words[0].upper() in ("SELECT", "WITH") and ";" not in statement:
+        return []
+    return WRITE_TARGET.findall(query) or None
+
+
+class InstrumentedJob:
+    """
+    Proxy of a BigQuery job recording its stats into the report once it is finished.
+    """
+    def __init__(self, job, stats: StepStats, report: RunReport, start: float, on_done=None):
+        self._job = job
+        self._stats = stats
+        self._report = report
+        self._start = start
+        self._on_done = on_done
+        self._recorded = False
+
+    def result(self, *args, **kwargs):
+        result = self._job.result(*args, **kwargs)
+        if not self._recorded:
+            self._recorded = True
+            if self._on_done is not None:
+                self._on_done()
+            job = self._job
+            self._stats.job_id = getattr(job, "job_id", None)
+            self._stats.wall_time_s = time.perf_counter() - self._start
+            self._stats.total_bytes_processed = getattr(job, "total_bytes_processed", None)
+            self._stats.total_bytes_billed = getattr(job, "total_bytes_billed", None)
+            self._stats.slot_millis = getattr(job, "slot_millis", None)
+            self._stats.cache_hit = getattr(job, "cache_hit", None)
+            self._stats.output_rows = getattr(job, "output_rows", None)
+            self._report.add(self._stats)
+        return result
+
+    def to_dataframe(self, *args, **kwargs):
+        self.result()
+        return self._job.to_dataframe(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._job, name)
+
+
+class InstrumentedClient:
+    """
+    Wrap a bigquery.Client (or any stand-in with the same query/load methods) so
+    every job submitted through it is recorded in a RunReport under the current step.
+
+    With dry_run=True each query is first estimated with a dry run, and
+    BudgetExceededError is raised before submitting it if the estimated bytes of
+    its step exceed max_bytes_per_step.
+
+    With a modules.stageCache.MetadataCache, get_table is served from it and each
+    finished job invalidates the tables it wrote (see written_tables), a plain
+    SELECT none of them.
+    """
+    def __init__(self, client, report: RunReport = None, max_bytes_per_step: int = None, dry_run: bool = False, metadata=None):
+        self.client = client
+        self.report = report if report is not None else RunReport()
+        self.max_bytes_per_step = max_bytes_per_step
+        self.dry_run = dry_run
+        self.metadata = metadata
+        self.current_step = "unnamed"
+        self.estimated_bytes = {}
+
+    @contextmanager
+    def step(self, name: str):
+        previous = self.current_step
+        self.current_step = name
+        self.estimated_bytes[name] = 0
+        try:
+            yield self
+        finally:
+            self.current_step = previous
+
+    def estimate_bytes(self, query: str, job_config=None) -> int:
+        from google.cloud import bigquery
+        config = (
+            bigquery.QueryJobConfig.from_api_repr(job_config.to_api_repr())
+            if job_config is not None else bigquery.QueryJobConfig()
+        )
+        config.dry_run = True
+        config.use_query_cache = False
+        return self.client.query(query, job_config=config).total_bytes_processed or 0
+
+    def check_budget(self, query: str, job_config=None) -> int:
+        estimate = self.estimate_bytes(query, job_config)
+        step_total = self.estimated_bytes.get(self.current_step, 0) + estimate
+        if self.max_bytes_per_step is not None and step_total > self.max_bytes_per_step:
+            raise BudgetExceededError(
+                f"Step '{self.current_step}' would process {step_total} bytes, "
+                f"over the budget of {self.max_bytes_per_step} bytes."
+            )
+        self.estimated_bytes[self.current_step] = step_total
+        return estimate
+
+    def get_table(self, table):
+        if self.metadata is None:
+            return self.client.get_table(table)
+        return self.metadata.get_table(self.client, table)
+
+    def invalidation(self, tables=None):
+        """
+        Callback invalidating the metadata of a table or a list of tables (all the
+        tables if None) once a job is done.
+        """
+        if self.metadata is None or tables == []:
+            return None
+        if tables is not None and not isinstance(tables, list):
+            tables = [tables]
+
+        def invalidate():
+            for table in tables if tables is not None else [None]:
+                self.metadata.invalidate(table)
+        return invalidate
+
+    def query(self, query: str, job_config=None, **kwargs):
+        estimate = self.check_budget(query, job_config) if self.dry_run else None
+        stats = StepStats(step=self.current_step, job_type="query", estimated_bytes=estimate)
+        start = time.perf_counter()
+        job = self.client.query(query, job_config=job_config, **kwargs)
+        destination = getattr(job_config, "destination", None)
+        return InstrumentedJob(job, stats, self.report, start, self.invalidation(
+            [destination] if destination is not None else written_tables(query)
+        ))
+
+    def load_table_from_dataframe(self, dataframe, destination, *args, **kwargs):
+        stats = StepStats(step=self.current_step, job_type="load")
+        start = time.perf_counter()
+        job = self.client.load_table_from_dataframe(dataframe, destination, *args, **kwargs)
+        return InstrumentedJob(job, stats, self.report, start, self.invalidation(destination))
+
+    def load_table_from_file(self, file_obj, destination, *args, **kwargs):
+        stats = StepStats(step=self.current_step, job_type="load")
+        start = time.perf_counter()
+        job = self.client.load_table_from_file(file_obj, destination, *args, **kwargs)
+        return InstrumentedJob(job, stats, self.report, start, self.invalidation(destination))
+
+    def copy_table(self, sources, destination, *args, **kwargs):
+        stats = StepStats(step=self.current_step, job_type="copy")
+        start = time.perf_counter()
+        job = self.client.copy_table(sources, destination, *args, **kwargs)
+        return InstrumentedJob(job, stats, self.report, start, self.invalidation(destination))
+
+    def create_table(self, table, *args, **kwargs):
+        if self.metadata is not None:
+            self.metadata.invalidate(table)
+        return self.client.create_table(table, *args, **kwargs)
+
+    def delete_table(self, table, *args, **kwargs):
+        if self.metadata is not None:
+            self.metadata.invalidate(table)
+        return self.client.delete_table(table, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
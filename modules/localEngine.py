@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import sys
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from config.configuration import DatasetConfig
+from config.obtainInfo import load_check_rules
+from modules.standarize import standarize_by_frequence, save_frequence_mapping
+
+# Same attributes as bigquery.SchemaField used by the pipeline
+LocalField = namedtuple("LocalField", ["name", "field_type"])
+
+NULL_VALUES = ['', 'NULL', 'N/A', 'NAN', 'NA', 'N.A!']
+# RE2 (BigQuery) \s only matches ASCII whitespace
+RE2_SPACES = r'[\t\n\f\r ]+'
+BARCODE_LENGTHS = [7, 8, 10, 13]
+
+
+@lru_cache(maxsize=1)
+def _mark_table() -> dict:
+    """
+    Translation table removing every unicode mark (\\pM), built once.
+    """
+    return {
+        cp: None for cp in range(sys.maxunicode + 1)
+        if unicodedata.category(chr(cp)).startswith("M")
+    }
+
+def infer_schema(df: pd.DataFrame) -> list:
+    """
+    Infer a BigQuery-like schema (list of LocalField) from the dtypes of a dataframe.
+    """
+    schema = []
+    for col, dtype in df.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            field_type = "BOOL"
+        elif pd.api.types.is_integer_dtype(dtype):
+            field_type = "INT64"
+        elif pd.api.types.is_float_dtype(dtype):
+            field_type = "FLOAT64"
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            field_type = "TIMESTAMP"
+        else:
+            sample = df[col].dropna()
+            sample = sample.iloc[0] if len(sample) else None
+            if hasattr(sample, "year") and not hasattr(sample, "hour"):
+                field_type = "DATE"
+            else:
+                field_type = "STRING"
+        schema.append(LocalField(col, field_type))
+    return schema
+
+def clean_series(s: pd.Series) -> pd.Series:
+    """
+    Local equivalent of the cleaning clause of modules.generateQuery.generate_clean_clause.
+    Each distinct value is cleaned only once, then mapped back with its integer code.
+    """
+    codes, uniques = pd.factorize(s)
+    uniques = pd.Series(uniques, dtype="object").astype(str)
+
+    is_null = uniques.str.strip().str.upper().isin(NULL_VALUES)
+    cleaned = (
+        uniques.str.normalize("NFD")
+        .str.translate(_mark_table())
+        .str.replace(RE2_SPACES, " ", regex=True)
+        .str.upper()
+        .str.strip()
+    )
+    cleaned = cleaned.astype(object).where(~is_null, None)
+
+    values = np.append(cleaned.to_numpy(dtype=object), None)
+    return pd.Series(values[codes], index=s.index, name=s.name, dtype=object)
+
+def clean_dataframe(df: pd.DataFrame, schema: list, standarize_cols: list = None, fuzzy_distance: int = 0, mapping_path: str = None) -> pd.DataFrame:
+    """
+    Run step 1 (format-level cleaning + standarization) on a dataframe.
+
+    Args:
+        fuzzy_distance: See modules.standarize.frequence_mapping_table
+        mapping_path: Optional CSV file where the mapping used is saved, to review it
+    """
+    df = df.copy()
+    for field in schema:
+        if field.field_type == "STRING":
+            df[field.name] = clean_series(df[field.name])
+    if standarize_cols:
+        df, mapping = standarize_by_frequence(df, standarize_cols, return_mapping=True, fuzzy_distance=fuzzy_distance)
+        if mapping_path:
+            save_frequence_mapping(mapping, mapping_path)
+    return df
+
+def row_fingerprints(df: pd.DataFrame, columns: list) -> Tuple[pd.Series, pd.Series]:
+    """
+    Local equivalent of modules.generateQuery.generate_row_id_query:
+    hash of the whole row + occurrence of the row among its identical copies.
+    The hash differs from FARM_FINGERPRINT, so row_id is only comparable within a
+    backend, the rules never order the rows by it.
+    """
+    fingerprint = pd.util.hash_pandas_object(df[columns], index=False).astype("int64")
+    occurrence = fingerprint.groupby(fingerprint).cumcount() + 1
+    return fingerprint, occurrence
+
+def hierarchy_inconsistent(df: pd.DataFrame, cols: list, reference: pd.DataFrame, min_count: int = 1) -> pd.Series:
+    """
+    Local equivalent of modules.generateQuery.hierarchy_consistency_rule.
+    The values of each level (of reference and df together) are factorized into
+    integer codes, a link parent->child is the code parent * n_children + child,
+    and the valid links are the ones seen at least min_count times in reference.
+    """
+    invalid = np.zeros(len(df), dtype=bool)
+    n_reference = len(reference)
+    for parent, child in zip(cols[:-1], cols[1:]):
+        parent_codes, _ = pd.factorize(pd.concat([reference[parent], df[parent]], ignore_index=True))
+        child_codes, child_values = pd.factorize(pd.concat([reference[child], df[child]], ignore_index=True))
+        links = parent_codes.astype("int64") * len(child_values) + child_codes
+
+        known = (parent_codes[:n_reference] >= 0) & (child_codes[:n_reference] >= 0)
+        reference_links, counts = np.unique(links[:n_reference][known], return_counts=True)
+        valid_links = reference_links[counts >= min_count]
+
+        row_parents = parent_codes[n_reference:]
+        row_children = child_codes[n_reference:]
+        invalid |= (row_children >= 0) & (
+            (row_parents < 0) | ~np.isin(links[n_reference:], valid_links)
+        )
+    return pd.Series(invalid, index=df.index)
+
+def check_flags(cfg: DatasetConfig, df: pd.DataFrame, schema: list, taxonomy: pd.DataFrame = None, reference: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Compute, in one pass, one boolean column per active rule, named after the reason of the rule.
+
+    Args:
+        taxonomy: Reference taxonomy of the hierarchy_consistency rule (all its links are valid)
+        reference: Without taxonomy, the frequent links of this table are valid (default df)
+    """
+    columns = [field.name for field in schema]
+    active_rules = load_check_rules(cfg.dataset_type)
+    fingerprint, occurrence = row_fingerprints(df, columns)
+    flags = pd.DataFrame(index=df.index)
+
+    if "duplicate_row" in active_rules:
+        flags["all_line_duplicate"] = occurrence > 1
+    if "duplicate_key" in active_rules:
+        # Same order as modules.generateQuery.duplicate_keys_rule: the values of the row, NULLs first
+        keys = [key.strip() for key in cfg.key_cle.split(",")]
+        ordered = df[columns].assign(_occurrence=occurrence)
+        ordered = ordered.sort_values(columns + ["_occurrence"], na_position="first", kind="stable")
+        flags["primary_key_duplicate"] = ordered.duplicated(subset=keys, keep="first").reindex(df.index)
+    if "barcode_length" in active_rules:
+        lengths = df[cfg.main_barcode].astype("string").str.len()
+        flags["wrong_barcode_length"] = (lengths.notna() & ~lengths.isin(BARCODE_LENGTHS)).astype(bool)
+    if "date_format" in active_rules:
+        for field in schema:
+            if field.field_type == "DATE":
+                date_ref = field.name
+                break
+        else:
+            raise ValueError("No DATE field found in the schema.")
+        years = pd.to_datetime(df[date_ref], errors="coerce").dt.year
+        flags["wrong_date"] = (years.isna() | (years < 1900) | (years > 2100)).astype(bool)
+    if "hierarchy_consistency" in active_rules:
+        cols = [col.strip() for col in cfg.hierarchy_cols.split(",")]
+        missing = set(cols) - set(columns)
+        if missing:
+            raise ValueError(f"Hierarchy columns not found in the schema: {sorted(missing)}.")
+        if taxonomy is not None:
+            flags["hierarchy_inconsistent"] = hierarchy_inconsistent(df, cols, taxonomy)
+        else:
+            reference = df if reference is None else reference
+            flags["hierarchy_inconsistent"] = hierarchy_inconsistent(df, cols, reference, cfg.min_path_count)
+    return flags
+
+def check_exclude_dataframe(cfg: DatasetConfig, df: pd.DataFrame, schema: list, taxonomy: pd.DataFrame = None, reference: pd.DataFrame = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Local equivalent of modules.generateQuery.generate_check_exclude_query.
+    Returns (excluded rows with their reasons, reason and row_id, clean rows without the excluded ones).
+    taxonomy and reference: see check_flags.
+    """
+    columns = [field.name for field in schema]
+    flags = check_flags(cfg, df, schema, taxonomy, reference)
+    fingerprint, occurrence = row_fingerprints(df, columns)
+    is_excluded = flags.any(axis=1)
+
+    reasons = np.array(flags.columns)
+    excluded = df.loc[is_excluded, columns].copy()
+    excluded.insert(0, "row_id", fingerprint[is_excluded].astype(str) + "-" + occurrence[is_excluded].astype(str))
+    excluded.insert(0, "reasons", [list(reasons[row]) for row in flags.loc[is_excluded].to_numpy()])
+    excluded.insert(1, "reason", [",".join(row) for row in excluded["reasons"]])
+
+    filtered = df.loc[~is_excluded, columns]
+    return excluded.reset_index(drop=True), filtered.reset_index(drop=True)
+
+def key_mask(cfg: DatasetConfig, df: pd.DataFrame, delta: pd.DataFrame) -> pd.Series:
+    """
+    True for the rows of df whose primary key (cfg.key_cle) is listed in delta.
+    """
+    keys = [key.strip() for key in cfg.key_cle.split(",")]
+    matched = df[keys].merge(delta[keys].drop_duplicates(), how="left", on=keys, indicator=True)
+    return pd.Series((matched["_merge"] == "both").to_numpy(), index=df.index)
+
+def incremental_clean_dataframe(cfg: DatasetConfig, raw: pd.DataFrame, clean: pd.DataFrame, schema: list, mapping: dict = None, mapping_table: pd.DataFrame = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Local equivalent of modules.generateQuery.generate_incremental_clean_query
+    and generate_incremental_merge_query: a key changes when one of its raw rows
+    is newer than the watermark, or has a variant flagged in mapping_table
+    (see modules.standarize.flag_mapping_changes). Only the raw rows of the
+    changed keys are cleaned and standarized with mapping.
+    Returns (merged clean table, changed keys).
+    """
+    from modules.standarize import apply_frequence_mapping
+    if cfg.watermark_col is None:
+        raise ValueError("The incremental mode needs cfg.watermark_col.")
+    keys = [key.strip() for key in cfg.key_cle.split(",")]
+    mapping = mapping or {}
+
+    cols = list(dict.fromkeys(keys + list(mapping)))
+    cleaned = clean_dataframe(raw[cols], [field for field in schema if field.name in cols])
+    last_watermark = clean[cfg.watermark_col].max()
+    is_changed = pd.Series(True, index=raw.index) if pd.isnull(last_watermark) else raw[cfg.watermark_col] > last_watermark
+    if mapping_table is not None:
+        for col in mapping:
+            flagged = mapping_table.loc[(mapping_table["column_name"] == col) & mapping_table["changed"], "variant"]
+            is_changed |= cleaned[col].isin(flagged)
+    delta = cleaned.loc[is_changed.to_numpy(), keys].drop_duplicates().reset_index(drop=True)
+
+    rows = raw[key_mask(cfg, cleaned, delta).to_numpy()]
+    rebuilt = apply_frequence_mapping(clean_dataframe(rows, schema), mapping)
+    merged = pd.concat([clean[~key_mask(cfg, clean, delta)], rebuilt], ignore_index=True)
+    return merged, delta
+
+def incremental_check_exclude_dataframe(cfg: DatasetConfig, clean: pd.DataFrame, excluded: pd.DataFrame, delta: pd.DataFrame, schema: list, taxonomy: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Local equivalent of modules.generateQuery.generate_incremental_check_query.
+    Returns the merged excluded table.
+    """
+    delta_excluded, _ = check_exclude_dataframe(
+        cfg, clean[key_mask(cfg, clean, delta)], schema, taxonomy, reference=clean
+    )
+    return pd.concat(
+        [excluded[~key_mask(cfg, excluded, delta)], delta_excluded],
+        ignore_index=True
+    )
+
+def near_duplicate_dataframe(cfg: DatasetConfig, clean: pd.DataFrame, excluded: pd.DataFrame, schema: list, embed) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Local equivalent of the near_duplicate rule of BigQueryBackend.near_duplicates:
+    the clean rows not excluded yet are compared block by block, their near
+    duplicates are added to the excluded table with the reason 'near_duplicate'.
+    Returns (merged excluded table, near-duplicate pairs).
+
+    Args:
+        embed: Function returning the embeddings of a dataframe of rows (e.g. modules.nearDuplicate.ProductEmbedder)
+    """
+    from modules.nearDuplicate import find_near_duplicates
+    columns = [field.name for field in schema]
+    block_cols = [col.strip() for col in cfg.near_duplicate_block_cols.split(",")]
+    fingerprint, occurrence = row_fingerprints(clean, columns)
+    rows = clean[columns].assign(row_id=fingerprint.astype(str) + "-" + occurrence.astype(str))
+    rows = rows[~rows["row_id"].isin(excluded["row_id"])].sort_values(block_cols, kind="stable")
+
+    pairs = list(find_near_duplicates([rows], block_cols, embed, cfg.near_duplicate_threshold))
+    pairs = pd.concat(pairs, ignore_index=True) if pairs else pd.DataFrame(columns=["row_id", "near_duplicate_of", "similarity"])
+
+    added = rows[rows["row_id"].isin(pairs["row_id"])][["row_id"] + columns]
+    added.insert(0, "reasons", [["near_duplicate"]] * len(added))
+    added.insert(1, "reason", "near_duplicate")
+    return pd.concat([excluded, added], ignore_index=True), pairs
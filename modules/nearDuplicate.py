@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import numpy as np
+import pandas as pd
+from typing import Callable, Iterable, Iterator
+from modules.generateEmbedding import generate_embedding, product_description, build_encoder, TEXT_COLS
+
+
+def normalize_rows(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    return X / np.clip(np.linalg.norm(X, axis=1, keepdims=True), 1e-12, None)
+
+def lsh_signatures(X: np.ndarray, n_bits: int, n_tables: int, seed: int = 0) -> np.ndarray:
+    """
+    Random hyperplane LSH (SimHash) of normalized vectors: for each of the n_tables
+    tables, an n_bits integer whose bits are the sides of n_bits random hyperplanes.
+    Vectors with a high cosine similarity get the same signature with a high probability.
+    Returns an int64 array of shape [n_tables, rows].
+    """
+    planes = np.random.default_rng(seed).standard_normal((X.shape[1], n_bits * n_tables)).astype(np.float32)
+    bits = (X @ planes > 0).reshape(len(X), n_tables, n_bits)
+    weights = np.left_shift(1, np.arange(n_bits, dtype=np.int64))
+    return (bits * weights).sum(axis=2).T
+
+def pairs_above(X: np.ndarray, rows: np.ndarray, threshold: float, chunk_rows: int = 1024):
+    """
+    All the pairs (i < j) of rows whose cosine similarity is >= threshold, by blocks of chunk_rows rows.
+    """
+    left, right = [], []
+    vectors = X[rows]
+    for start in range(0, len(rows), chunk_rows):
+        similarities = vectors[start:start + chunk_rows] @ vectors.T
+        i, j = np.nonzero(similarities >= threshold)
+        i = i + start
+        keep = i < j
+        left.append(rows[i[keep]])
+        right.append(rows[j[keep]])
+    return np.concatenate(left), np.concatenate(right)
+
+def similar_pairs(X: np.ndarray, threshold: float, n_bits: int = None, n_tables: int = 8, bucket_rows: int = 256, exact_below: int = 512, seed: int = 0):
+    """
+    Pairs of rows of the normalized X with a cosine similarity >= threshold.
+    Below exact_below rows all the pairs are compared; otherwise only the rows
+    sharing an LSH signature in at least one of the n_tables tables (approximate,
+    sub-quadratic: a pair is missed only if it is split in every table).
+    Returns (left rows, right rows), left < right, without duplicates.
+
+    Args:
+        n_bits: Bits of each signature, default about rows / bucket_rows buckets per table
+            (more bits: smaller buckets, fewer comparisons but a lower recall)
+        n_tables: Number of LSH tables (more tables: higher recall)
+    """
+    if len(X) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    if len(X) < exact_below:
+        return pairs_above(X, np.arange(len(X)), threshold)
+
+    if n_bits is None:
+        n_bits = int(np.clip(np.ceil(np.log2(len(X) / bucket_rows)), 1, 62))
+    left, right = [], []
+    for signature in lsh_signatures(X, n_bits, n_tables, seed):
+        order = np.argsort(signature, kind="stable")
+        starts = np.flatnonzero(np.r_[True, signature[order][1:] != signature[order][:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts, ends):
+            if end - start > 1:
+                i, j = pairs_above(X, np.sort(order[start:end]), threshold)
+                left.append(i)
+                right.append(j)
+    if not left:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pairs = np.unique(np.stack([np.concatenate(left), np.concatenate(right)], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+def near_duplicates(X: np.ndarray, threshold: float, **kwargs):
+    """
+    Group the rows linked by similar pairs (union-find); the first row of each group
+    is kept and the other ones are its near duplicates.
+    Returns (is_duplicate, index of the kept row of each row, similarity to the kept row).
+    kwargs: see similar_pairs
+    """
+    X = normalize_rows(X)
+    parent = np.arange(len(X))
+
+    def find(i: int) -> int:
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    for i, j in zip(*similar_pairs(X, threshold, **kwargs)):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    kept = np.array([find(i) for i in range(len(X))], dtype=np.int64)
+    similarity = (X * X[kept]).sum(axis=1) if len(X) else np.zeros(0, dtype=np.float32)
+    return kept != np.arange(len(X)), kept, similarity
+
+class ProductEmbedder:
+    """
+    Embeddings of the product descriptions (the ones of the hierarchy classifier)
+    with generate_embedding, the encoder is created once and reused for every chunk.
+
+    Args:
+        model_path: SentenceTransformer folder, or the export folder of
+            modules.quantizeModel.export_onnx_int8 with backend="onnx-int8"
+        cache: Optional modules.embeddingCache.EmbeddingCache
+    """
+    def __init__(self, model_path: str, cache=None, backend: str = "torch"):
+        self.model_path = model_path
+        self.cache = cache
+        self.encoder = self.owned_encoder = build_encoder(model_path, backend)
+
+    def __call__(self, df: pd.DataFrame) -> np.ndarray:
+        X, _ = generate_embedding(
+            df=pd.DataFrame({"description": product_description(df).astype(object)}),
+            model_path=self.model_path,
+            text_cols="description",
+            value_cols=None,
+            category_cols=None,
+            label_cols=None,
+            cache=self.cache,
+            encoder=self.encoder
+        )
+        return X
+
+    def close(self) -> None:
+        """
+        Stop the encoder created here and write the index of the cache (which stays usable).
+        """
+        if self.owned_encoder is not None:
+            self.owned_encoder.close()
+            self.owned_encoder = None
+        if self.cache is not None:
+            self.cache.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def iter_blocks(chunks: Iterable[pd.DataFrame], block_cols: list) -> Iterator[pd.DataFrame]:
+    """
+    Regroup a stream of chunks sorted by block_cols into dataframes of complete
+    blocks (several blocks per dataframe, a block is never split).
+    """
+    pending = None
+    for chunk in chunks:
+        chunk = chunk if pending is None else pd.concat([pending, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+        last = chunk[block_cols].iloc[[-1]]
+        # Rows of the last block may continue in the next chunk
+        in_last = chunk[block_cols].merge(last, how="left", on=block_cols, indicator=True)["_merge"].eq("both").to_numpy()
+        pending = chunk[in_last].reset_index(drop=True)
+        if not in_last.all():
+            yield chunk[~in_last].reset_index(drop=True)
+    if pending is not None and not pending.empty:
+        yield pending
+
+def find_near_duplicates(
+        chunks: Iterable[pd.DataFrame],
+        block_cols: list,
+        embed: Callable,
+        threshold: float = 0.95,
+        **kwargs
+) -> Iterator[pd.DataFrame]:
+    """
+    Near-duplicate products within each block (e.g. same country and brand).
+
+    Args:
+        chunks: Rows with row_id and block_cols, sorted by block_cols
+        embed: Function returning the float32 embeddings of a dataframe of rows
+            (e.g. generate_embedding of the product descriptions)
+        threshold: Minimum cosine similarity of near duplicates
+        kwargs: See similar_pairs
+    Yields dataframes of row_id, near_duplicate_of (row_id of the kept row) and similarity.
+    """
+    for blocks in iter_blocks(chunks, block_cols):
+        # Deterministic kept row: the smallest row_id of each group
+        blocks = blocks.sort_values(block_cols + ["row_id"], kind="stable").reset_index(drop=True)
+        X = normalize_rows(embed(blocks))
+        results = []
+        for rows in blocks.groupby(block_cols, dropna=False, sort=False).indices.values():
+            is_duplicate, kept, similarity = near_duplicates(X[rows], threshold, **kwargs)
+            if is_duplicate.any():
+                results.append(pd.DataFrame({
+                    "row_id": blocks["row_id"].to_numpy()[rows[is_duplicate]],
+                    "near_duplicate_of": blocks["row_id"].to_numpy()[rows[kept[is_duplicate]]],
+                    "similarity": similarity[is_duplicate].astype("float64"),
+                }))
+        if results:
+            yield pd.concat(results, ignore_index=True)
@@ -2,29 +2,180 @@
 #Author: Liuxin YANG
 #Date: 2025-05-31
 
+import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, Sampler
 
 class NLPDataset(Dataset):
+    """
+    X and y are kept as numpy arrays (no copy when they already are float32 / int64),
+    possibly memory-mapped .npy files (see from_npy) so the data can exceed the RAM.
+    X can also be the (dense, CSR) tuple of generate_embedding(sparse=True): the
+    items then carry the sparse block of their rows as the (indices, offsets, weights)
+    of csr_to_bag, the input of a NLPHierarchyClassifier with sparse_dim > 0.
+    idx can be a single index or an array of indices: a whole batch is then read
+    with one fancy-indexing slice (use BatchIndexSampler with DataLoader(batch_size=None)).
+    """
     def __init__(self, X, y):
-        self.X = torch.tensor(X, dtype=torch.float32)
-        self.y = torch.tensor(y, dtype=torch.long)
+        X, X_sparse = X if isinstance(X, tuple) else (X, None)
+        self.X = X if isinstance(X, np.memmap) else np.asarray(X, dtype=np.float32)
+        self.y = y if isinstance(y, np.memmap) else np.asarray(y, dtype=np.int64)
+        self.X_sparse = X_sparse.tocsr() if X_sparse is not None else None
+        if self.X_sparse is not None and self.X_sparse.shape[0] != len(self.X):
+            raise ValueError("The dense and sparse blocks of X must have the same rows.")
+
+    @property
+    def sparse_dim(self) -> int:
+        return self.X_sparse.shape[1] if self.X_sparse is not None else 0
+
+    @classmethod
+    def from_npy(cls, x_path: str, y_path: str, x_sparse_path: str = None) -> "NLPDataset":
+        """
+        Memory-map features / labels saved with save_npy (or np.save),
+        the optional sparse block (.npz) is loaded in memory.
+        """
+        X = np.load(x_path, mmap_mode="r")
+        if x_sparse_path is not None:
+            import scipy.sparse as sp
+            X = (X, sp.load_npz(x_sparse_path))
+        return cls(X, np.load(y_path, mmap_mode="r"))
+
+    @staticmethod
+    def save_npy(X, y, x_path: str, y_path: str, x_sparse_path: str = None) -> None:
+        X, X_sparse = X if isinstance(X, tuple) else (X, None)
+        np.save(x_path, np.asarray(X, dtype=np.float32))
+        np.save(y_path, np.asarray(y, dtype=np.int64))
+        if X_sparse is not None:
+            if x_sparse_path is None:
+                raise ValueError("X has a sparse block, pass x_sparse_path.")
+            import scipy.sparse as sp
+            sp.save_npz(x_sparse_path, X_sparse.tocsr())
 
     def __len__(self):
         return len(self.X)
     
     def __getitem__(self, idx):
-        return torch.tensor(
-            self.X[idx], dtype=torch.float32), torch.tensor(self.y[idx], dtype=torch.long
-        )
+        """
+        Returns (X, y), or (X, y, (indices, offsets, weights)) with a sparse block.
+        """
+        # Fancy indexing already copies, a single row of a read-only memmap is copied here
+        X = np.require(self.X[idx], dtype=np.float32, requirements=["C", "W"])
+        y = np.require(self.y[idx], dtype=np.int64, requirements=["C", "W"])
+        if self.X_sparse is None:
+            return torch.from_numpy(X), torch.from_numpy(y)
+        return torch.from_numpy(X), torch.from_numpy(y), csr_to_bag(self.X_sparse[np.atleast_1d(idx)])
+
+class BatchIndexSampler(Sampler):
+    """
+    Yield one array of indices per batch, to be used with
+    DataLoader(dataset, sampler=BatchIndexSampler(...), batch_size=None)
+    so each batch is fetched by a single NLPDataset.__getitem__ call.
+
+    Args:
+        n_rows: Number of rows of the dataset, or an array of the row indices to sample from
+            (e.g. the training split)
+        contiguous: Shuffle the order of contiguous batches instead of the rows,
+            each batch is then a sequential read of the (memory-mapped) files
+    """
+    def __init__(self, n_rows, batch_size: int, shuffle: bool = True, drop_last: bool = False, contiguous: bool = False, seed: int = None):
+        self.indices = None
+        if not np.isscalar(n_rows):
+            self.indices = np.sort(np.asarray(n_rows, dtype=np.int64))
+            n_rows = len(self.indices)
+        self.n_rows = n_rows
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.contiguous = contiguous
+        self.generator = np.random.default_rng(seed)
+
+    def __len__(self):
+        if self.drop_last:
+            return self.n_rows // self.batch_size
+        return (self.n_rows + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield batch if self.indices is None else self.indices[batch]
+
+    def batches(self):
+        starts = np.arange(0, len(self) * self.batch_size, self.batch_size)
+        if self.contiguous or not self.shuffle:
+            if self.shuffle:
+                starts = self.generator.permutation(starts)
+            for start in starts:
+                yield np.arange(start, min(start + self.batch_size, self.n_rows))
+            return
+        order = self.generator.permutation(self.n_rows)
+        for start in starts:
+            # Sorted indices read the memory-mapped pages in order
+            yield np.sort(order[start:start + self.batch_size])
+
+def transition_masks(y, n_classes_per_level: list, chunk_rows: int = 1_000_000) -> list:
+    """
+    Parent->child masks of the label paths of y (rows of level codes, -1 unknown):
+    masks[l][p, c] is True if class c of level l + 1 was seen under class p of level l.
+    y can be memory-mapped, it is read by chunks of chunk_rows rows.
+    """
+    masks = [
+        np.zeros((n_parent, n_child), dtype=bool)
+        for n_parent, n_child in zip(n_classes_per_level[:-1], n_classes_per_level[1:])
+    ]
+    for start in range(0, len(y), chunk_rows):
+        chunk = np.asarray(y[start:start + chunk_rows])
+        for level, mask in enumerate(masks):
+            known = (chunk[:, level] >= 0) & (chunk[:, level + 1] >= 0)
+            mask[chunk[known, level], chunk[known, level + 1]] = True
+    return masks
+
+def decode_hierarchy(logits: list, masks: list):
+    """
+    Greedy top-down decoding: the classes of each level are restricted to the
+    children of the class predicted at the level above, so the path is always valid.
+
+    Args:
+        logits: Output of NLPHierarchyClassifier.forward
+        masks: Bool tensors of transition_masks
+    Returns (codes, confidences), two [batch, levels] tensors; the confidence is the
+    probability of the class among the allowed children.
+    """
+    codes, confidences = [], []
+    parent = None
+    for level, level_logits in enumerate(logits):
+        if parent is not None:
+            allowed = masks[level - 1][parent]
+            # A parent without known children is not constrained
+            allowed = allowed | ~allowed.any(dim=1, keepdim=True)
+            level_logits = level_logits.masked_fill(~allowed, float("-inf"))
+        confidence, parent = torch.softmax(level_logits, dim=1).max(dim=1)
+        codes.append(parent)
+        confidences.append(confidence)
+    return torch.stack(codes, dim=1), torch.stack(confidences, dim=1)
+
+def csr_to_bag(csr):
+    """
+    Convert a scipy CSR matrix (e.g. the sparse categorical block of generate_embedding)
+    to the (indices, offsets, weights) tensors of NLPHierarchyClassifier's sparse input.
+    """
+    return (
+        torch.as_tensor(csr.indices, dtype=torch.long),
+        torch.as_tensor(csr.indptr[:-1], dtype=torch.long),
+        torch.as_tensor(csr.data, dtype=torch.float32),
+    )
 
 class NLPHierarchyClassifier(nn.Module):
+    """
+    With sparse_dim > 0 the model also takes a sparse block of sparse_dim columns
+    (one-hot / hashed categories): its first layer is an EmbeddingBag summing only
+    the weights of the non-zero columns, added to the first dense layer.
+    """
     def __init__(
             self, 
             input_dim, 
             hidden_dim,
-            n_classes_per_level
+            n_classes_per_level,
+            sparse_dim = 0
     ):
         super().__init__()
 
@@ -36,12 +187,30 @@ class NLPHierarchyClassifier(nn.Module):
             nn.ReLU(),
         )
 
+        self.sparse_encoder = None
+        if sparse_dim > 0:
+            self.sparse_encoder = nn.EmbeddingBag(sparse_dim, hidden_dim, mode="sum")
+
         self.heads = nn.ModuleList([
             nn.Linear(hidden_dim, n_classes) for n_classes in n_classes_per_level
         ])
 
-    def forward(self, x):
-        output = self.encoder(x)
+    def forward(self, x, x_sparse=None):
+        """
+        Args:
+            x: Dense features
+            x_sparse: (indices, offsets, weights) of the sparse block, see csr_to_bag
+        """
+        if (self.sparse_encoder is None) != (x_sparse is None):
+            raise ValueError(
+                "Invalid x_sparse. Pass the sparse block (see csr_to_bag) if and only if the model has sparse_dim > 0."
+            )
+        if self.sparse_encoder is None:
+            output = self.encoder(x)
+        else:
+            indices, offsets, weights = x_sparse
+            first = self.encoder[0](x) + self.sparse_encoder(indices, offsets, per_sample_weights=weights)
+            output = self.encoder[1:](first)
         return [head(output) for head in self.heads]
     
     
\ No newline at end of file
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config.configuration import DatasetConfig
+from config.obtainInfo import obtain_table_name
+from modules.stageCache import MetadataCache, stage_tables
+
+STEPS = ("clean", "validate") # same as main.STAGES
+# Reasons of the BigQuery errors worth retrying
+TRANSIENT_REASONS = {"rateLimitExceeded", "jobRateLimitExceeded", "backendError", "internalError"}
+
+
+@dataclass
+class StepResult:
+    config: str
+    step: str
+    status: str = "pending" # running, succeeded, failed or skipped (a dependency failed)
+    attempts: int = 0
+    wall_time_s: float = 0.0
+    error: str = None
+
+
+def transient_errors() -> tuple:
+    errors = (ConnectionError, TimeoutError)
+    try:
+        from google.api_core import exceptions
+        errors += (
+            exceptions.TooManyRequests,
+            exceptions.InternalServerError,
+            exceptions.BadGateway,
+            exceptions.ServiceUnavailable,
+            exceptions.GatewayTimeout,
+        )
+    except ImportError:
+        pass
+    return errors
+
+def is_transient(error: Exception, errors: tuple) -> bool:
+    if isinstance(error, errors):
+        return True
+    # BigQuery reports its rate limits as 403 errors with a reason
+    reasons = {item.get("reason") for item in getattr(error, "errors", None) or [] if isinstance(item, dict)}
+    return bool(reasons & TRANSIENT_REASONS)
+
+
+class PipelineOrchestrator:
+    """
+    Run DataCleaningPipeline for several DatasetConfig (countries, dataset types)
+    concurrently. Each config has a clean step and a validate step; a step depends
+    on the previous step of its config and on the steps of other configs writing
+    one of the tables it reads. The ready steps run in a thread pool, each one
+    blocking on its own jobs, so the wall time is the one of the longest chain
+    instead of the sum of all the jobs.
+
+    Args:
+        configs: DatasetConfig to run
+        client: Optional client shared by the BigQuery backends (a bigquery.Client,
+            or any stand-in with the same methods), default one bigquery.Client
+        max_concurrent: Maximum number of steps running at once
+        max_retries: Extra attempts of a step failing with a transient error
+        backoff_s: Wait before the first retry, doubled at each retry
+        names: Optional names of the configs, default "<dataset>.<raw_table>"
+        backend_factory: Optional function cfg -> backend, default a BigQueryBackend
+            on the shared client or a LocalBackend (cfg.backend)
+    """
+    def __init__(
+            self,
+            configs: list,
+            client=None,
+            max_concurrent: int = 4,
+            max_retries: int = 3,
+            backoff_s: float = 2.0,
+            names: list = None,
+            backend_factory=None
+    ):
+        self.names = list(names) if names else [f"{cfg.dataset}.{cfg.raw_table}" for cfg in configs]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Duplicated config names, pass distinct names.")
+        self.configs = dict(zip(self.names, configs))
+        self.client = client
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.backend_factory = backend_factory
+        self.errors = transient_errors()
+        self.backends = {}
+        self.pipelines = {}
+        self.metadata = MetadataCache()
+        self.lock = threading.Lock()
+        self.dependencies = self.build_graph()
+        self.results = {step: StepResult(*step) for step in self.dependencies}
+
+    @staticmethod
+    def table_id(cfg: DatasetConfig, tableType: str) -> str:
+        table = obtain_table_name(cfg, tableType)
+        if table is None:
+            return None
+        if cfg.backend == "local":
+            return os.path.abspath(os.path.join(cfg.local_dir, f"{table}.{cfg.local_format}"))
+        return f"{cfg.project}.{cfg.dataset}.{table}"
+
+    def build_graph(self) -> dict:
+        """
+        Returns {(config name, step): set of the (config name, step) it depends on}.
+        """
+        writers = {}
+        for name, cfg in self.configs.items():
+            for step in STEPS:
+                for tableType in stage_tables(cfg, step)[1]:
+                    table = self.table_id(cfg, tableType)
+                    if table in writers and writers[table][0] != name:
+                        raise ValueError(f"Table {table} is written by the configs {writers[table][0]} and {name}.")
+                    writers.setdefault(table, (name, step))
+
+        dependencies = {}
+        for name, cfg in self.configs.items():
+            previous = None
+            for step in STEPS:
+                needed = {previous} if previous else set()
+                for tableType in stage_tables(cfg, step)[0]:
+                    writer = writers.get(self.table_id(cfg, tableType))
+                    if writer is not None and writer[0] != name:
+                        needed.add(writer)
+                dependencies[(name, step)] = needed
+                previous = (name, step)
+
+        # Topological check, a cycle would never become ready
+        remaining = {step: set(needed) for step, needed in dependencies.items()}
+        while remaining:
+            ready = [step for step, needed in remaining.items() if not needed]
+            if not ready:
+                raise ValueError(f"Dependency cycle between the steps {sorted(remaining)}.")
+            for step in ready:
+                del remaining[step]
+            for needed in remaining.values():
+                needed.difference_update(ready)
+        return dependencies
+
+    def backend(self, name: str):
+        with self.lock:
+            if name not in self.backends:
+                cfg = self.configs[name]
+                if self.backend_factory is not None:
+                    self.backends[name] = self.backend_factory(cfg)
+                elif cfg.backend == "bigquery":
+                    from modules.executionBackend import BigQueryBackend
+                    if self.client is None:
+                        from google.cloud import bigquery
+                        self.client = bigquery.Client()
+                    self.backends[name] = BigQueryBackend(cfg, self.client, self.metadata)
+                else:
+                    from modules.executionBackend import obtain_backend
+                    self.backends[name] = obtain_backend(cfg)
+            return self.backends[name]
+
+    def execute(self, name: str, step: str) -> None:
+        from main import DataCleaningPipeline
+        if name not in self.pipelines:
+            self.pipelines[name] = DataCleaningPipeline(self.configs[name], self.backend(name))
+        self.pipelines[name].run_stage(step)
+
+    def run_step(self, key: tuple) -> None:
+        """
+        Run a step, retried with an exponential backoff on transient errors.
+        """
+        result = self.results[key]
+        start = time.perf_counter()
+        try:
+            while True:
+                result.attempts += 1
+                try:
+                    self.execute(*key)
+                    return
+                except Exception as error:
+                    if result.attempts > self.max_retries or not is_transient(error, self.errors):
+                        raise
+                    delay = self.backoff_s * 2 ** (result.attempts - 1)
+                    print(f"{key[0]} {key[1]}: attempt {result.attempts} failed ({error}), retry in {delay:.1f}s")
+                    time.sleep(delay)
+        finally:
+            result.wall_time_s = time.perf_counter() - start
+
+    def run(self) -> dict:
+        """
+        Run all the steps, a failed step only skips the steps depending on it.
+        Returns the summary (see summary).
+        """
+        pending = dict(self.dependencies)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            while pending or running:
+                for key in list(pending):
+                    statuses = {self.results[needed].status for needed in pending[key]}
+                    if statuses & {"failed", "skipped"}:
+                        self.results[key].status = "skipped"
+                        del pending[key]
+                    elif statuses <= {"succeeded"} and len(running) < self.max_concurrent:
+                        self.results[key].status = "running"
+                        running[executor.submit(self.run_step, key)] = key
+                        del pending[key]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    result = self.results[key]
+                    if future.exception() is None:
+                        result.status = "succeeded"
+                    else:
+                        result.status = "failed"
+                        result.error = f"{type(future.exception()).__name__}: {future.exception()}"
+                    print(f"{key[0]} {key[1]}: {result.status} in {result.wall_time_s:.1f}s")
+        return self.summary()
+
+    def summary(self) -> dict:
+        """
+        {config name: {status, steps (StepResult), jobs (report of the backend by step)}}
+        """
+        summary = {}
+        for name in self.names:
+            steps = [self.results[(name, step)] for step in STEPS]
+            statuses = {result.status for result in steps}
+            backend = self.backends.get(name)
+            summary[name] = {
+                "status": "succeeded" if statuses == {"succeeded"} else "failed",
+                "steps": [asdict(result) for result in steps],
+                "jobs": backend.report.by_step() if backend is not None else {},
+            }
+        return summary
+
+    def print_summary(self) -> None:
+        for name, config_summary in self.summary().items():
+            print(f"{name}: {config_summary['status']}")
+            for result in config_summary["steps"]:
+                error = f" ({result['error']})" if result["error"] else ""
+                print(f"    {result['step']}: {result['status']}, {result['attempts']} attempt(s), {result['wall_time_s']:.1f}s{error}")
+            backend = self.backends.get(name)
+            if backend is not None and backend.report.jobs:
+                print("    " + backend.report.summary().replace("\n", "\n    "))
+
+    def save_summary(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2, default=str)
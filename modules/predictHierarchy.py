@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import torch
+from typing import Iterator
+from google.cloud import bigquery
+from config.configuration import DatasetConfig
+from config.obtainInfo import obtain_table_name, iter_dataframe
+from modules.generateEmbedding import generate_embedding, FeatureBuilder, product_description, build_encoder, TEXT_COLS
+from modules.generateQuery import do_data2table_job
+from modules.nlp import csr_to_bag, decode_hierarchy
+from modules.trainer import load_classifier
+
+
+
+class HierarchyPredictor:
+    """
+    Predict the hierarchy path of products with a checkpoint of HierarchyTrainer.
+    The embedding encoder, the model and the parent->child masks are loaded once
+    and reused for every chunk.
+
+    Args:
+        checkpoint_path: Checkpoint of HierarchyTrainer
+        feature_builder_path: FeatureBuilder fitted at training time (FeatureBuilder.save)
+        model_path: SentenceTransformer folder, or the export folder of
+            modules.quantizeModel.export_onnx_int8 with backend="onnx-int8"
+        cache: Optional modules.embeddingCache.EmbeddingCache
+        encoder: Optional encoder with an encode(texts) method, default an
+            EncoderService (torch) or an OnnxEncoder (onnx-int8) created once
+        batch_size: Rows per forward pass of the classifier
+        threads: torch CPU threads, default all cores
+    """
+    def __init__(
+            self,
+            checkpoint_path: str,
+            feature_builder_path: str,
+            model_path: str,
+            cache=None,
+            encoder=None,
+            backend: str = "torch",
+            batch_size: int = 4096,
+            threads: int = None
+    ):
+        if threads:
+            torch.set_num_threads(threads)
+        self.model, self.label_vocabularies, masks = load_classifier(checkpoint_path)
+        if masks is None:
+            raise ValueError("The checkpoint has no transition masks, retrain it with HierarchyTrainer.")
+        self.masks = [torch.from_numpy(mask) for mask in masks]
+        self.label_cols = list(self.label_vocabularies)
+        # code -> label of each level, to decode a whole column at once
+        self.labels = [
+            np.array(sorted(vocabulary, key=vocabulary.get), dtype=object)
+            for vocabulary in self.label_vocabularies.values()
+        ]
+        self.feature_builder = FeatureBuilder.load(feature_builder_path)
+        self.feature_cols = (self.feature_builder.value_cols or []) + (self.feature_builder.category_cols or [])
+        self.model_path = model_path
+        self.cache = cache
+        self.backend = backend
+        self.batch_size = batch_size
+
+        self.owned_encoder = None
+        if encoder is None:
+            encoder = self.owned_encoder = build_encoder(model_path, backend)
+        self.encoder = encoder
+
+    @torch.inference_mode()
+    def predict_codes(self, X):
+        """
+        Returns (codes, confidences) arrays of shape [rows, levels].
+        """
+        X_dense, X_sparse = X if isinstance(X, tuple) else (X, None)
+        codes, confidences = [], []
+        for start in range(0, len(X_dense), self.batch_size):
+            xb = torch.from_numpy(np.ascontiguousarray(X_dense[start:start + self.batch_size]))
+            xb_sparse = csr_to_bag(X_sparse[start:start + self.batch_size]) if X_sparse is not None else None
+            batch_codes, batch_confidences = decode_hierarchy(self.model(xb, xb_sparse), self.masks)
+            codes.append(batch_codes.numpy())
+            confidences.append(batch_confidences.numpy())
+        if not codes:
+            n_levels = len(self.labels)
+            return np.zeros((0, n_levels), dtype=np.int64), np.zeros((0, n_levels), dtype=np.float32)
+        return np.vstack(codes), np.vstack(confidences)
+
+    def predict_chunk(self, df: pd.DataFrame, key_cols: list) -> pd.DataFrame:
+        """
+        Returns the key columns of df with hierarchy_level<i>, hierarchy_level<i>_confidence
+        and the path confidence (product of the level confidences).
+        """
+        df = df[key_cols + self.feature_cols].assign(description=product_description(df).astype(object))
+        X, _ = generate_embedding(
+            df=df,
+            model_path=self.model_path,
+            text_cols="description",
+            value_cols=None,
+            category_cols=None,
+            label_cols=None,
+            cache=self.cache,
+            encoder=self.encoder,
+            feature_builder=self.feature_builder
+        )
+        codes, confidences = self.predict_codes(X)
+        output = df[key_cols].reset_index(drop=True)
+        for level, labels in enumerate(self.labels):
+            output[f"hierarchy_level{level + 1}"] = labels[codes[:, level]]
+            output[f"hierarchy_level{level + 1}_confidence"] = confidences[:, level]
+        output["path_confidence"] = confidences.prod(axis=1)
+        return output
+
+    def close(self) -> None:
+        """
+        Stop the encoder created here and write the index of the cache (which stays usable).
+        """
+        if self.owned_encoder is not None:
+            self.owned_encoder.close()
+            self.owned_encoder = None
+        if self.cache is not None:
+            self.cache.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def prediction_schema(source_schema: list, key_cols: list, n_levels: int) -> list:
+    schema = [field for field in source_schema if field.name in key_cols]
+    for level in range(1, n_levels + 1):
+        schema.append(bigquery.SchemaField(f"hierarchy_level{level}", "STRING"))
+        schema.append(bigquery.SchemaField(f"hierarchy_level{level}_confidence", "FLOAT"))
+    schema.append(bigquery.SchemaField("path_confidence", "FLOAT"))
+    return schema
+
+def do_prediction_job(
+        cfg: DatasetConfig,
+        client: bigquery.Client,
+        predictor: HierarchyPredictor,
+        tableType: str = "clean",
+        page_size: int = 100_000,
+        max_workers: int = 4
+) -> None:
+    """
+    Stream tableType by pages of page_size rows, predict each page and write the
+    predictions to the prediction table. Only a few pages are in memory at once
+    (the one being predicted and at most max_workers being uploaded).
+    """
+    key_cols = [col.strip() for col in cfg.key_cle.split(",")]
+    table = obtain_table_name(cfg, tableType)
+    source_schema = client.get_table(f"{cfg.project}.{cfg.dataset}.{table}").schema
+
+    def predictions() -> Iterator[pd.DataFrame]:
+        n_rows = 0
+        start = time.perf_counter()
+        chunks = iter_dataframe(
+            cfg, client, tableType,
+            columns=key_cols + TEXT_COLS + predictor.feature_cols,
+            page_size=page_size,
+            categorical_ratio=None
+        )
+        for chunk in chunks:
+            output = predictor.predict_chunk(chunk, key_cols)
+            n_rows += len(output)
+            print(f"Predicted {n_rows} rows, {n_rows / (time.perf_counter() - start) * 3600:.0f} rows/hour")
+            yield output
+
+    schema = prediction_schema(source_schema, key_cols, len(predictor.labels))
+    do_data2table_job(cfg, client, "prediction", predictions(), schema, max_workers=max_workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict the product hierarchy of a table.")
+    parser.add_argument("--checkpoint", required=True, help="Checkpoint of the trainer")
+    parser.add_argument("--feature-builder", required=True, help="Fitted FeatureBuilder (joblib)")
+    parser.add_argument("--model", required=True, help="SentenceTransformer folder or ONNX export folder")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx-int8"])
+    parser.add_argument("--table", default="clean", choices=["raw", "clean"])
+    parser.add_argument("--cache-dir", default=None, help="Folder of the embedding cache")
+    parser.add_argument("--page-size", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    cache = None
+    if args.cache_dir:
+        from modules.embeddingCache import EmbeddingCache
+        cache = EmbeddingCache(args.cache_dir, args.model)
+
+    with HierarchyPredictor(
+        args.checkpoint, args.feature_builder, args.model,
+        cache=cache, backend=args.backend, threads=args.threads
+    ) as predictor:
+        do_prediction_job(DatasetConfig(), bigquery.Client(), predictor, args.table, args.page_size)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+FP32_FILE = "model_fp32.onnx"
+INT8_FILE = "model_int8.onnx"
+POOLING_FILE = "pooling.json"
+
+
+def pooling_mode(pooling_config: dict) -> str:
+    """
+    Pooling mode of a sentence_transformers Pooling config (old and new formats).
+    """
+    if "pooling_mode" in pooling_config:
+        return pooling_config["pooling_mode"]
+    for mode in ("cls_token", "mean_tokens", "max_tokens"):
+        if pooling_config.get(f"pooling_mode_{mode}"):
+            return {"cls_token": "cls", "mean_tokens": "mean", "max_tokens": "max"}[mode]
+    return None
+
+def post_pooling_normalize(modules: list) -> bool:
+    """
+    True if the modules after the pooling of a SentenceTransformer only L2-normalize
+    the embeddings (done by OnnxEncoder), False if there is none. Any other module
+    (e.g. Dense) is not exported, ValueError is raised instead of silently
+    returning other embeddings.
+    """
+    names = [type(module).__name__ for module in modules]
+    unsupported = [name for name in names if name != "Normalize"]
+    if unsupported:
+        raise ValueError(f"Modules {unsupported} after the pooling are not supported by the ONNX backend.")
+    return bool(names)
+
+def export_onnx_int8(model_path: str, output_dir: str, opset: int = 17) -> str:
+    """
+    Export the transformer of a saved SentenceTransformer (e.g. the one of
+    test/download_model.py) to ONNX, then quantize its weights to int8 (dynamic
+    quantization: activations are quantized on the fly at inference).
+    The tokenizer and the pooling configuration (and a final Normalize) are saved
+    next to the graph, any other module after the pooling raises ValueError.
+
+    Returns the path of the int8 model.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_path, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    pooling = pooling_mode(st_model[1].get_config_dict()) if len(st_model) > 1 else "mean"
+    if pooling not in ("mean", "cls"):
+        raise ValueError(f"Pooling '{pooling}' is not supported by the ONNX backend.")
+    normalize = post_pooling_normalize(list(st_model)[2:])
+
+    class LastHiddenState(torch.nn.Module):
+        # Keyword call: the positional arguments of forward differ between transformers versions
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    dummy = tokenizer(["exemple de produit"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask"]
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset,
+            dynamo=False,
+        )
+
+    int8_path = os.path.join(output_dir, INT8_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, POOLING_FILE), "w") as file:
+        json.dump({"pooling": pooling, "normalize": normalize, "max_seq_length": st_model.max_seq_length}, file)
+    return int8_path
+
+
+class OnnxEncoder:
+    """
+    CPU encoder running the int8 ONNX graph of export_onnx_int8 with onnxruntime.
+    Same encode(texts) interface as modules.encoderService.EncoderService, so it
+    can be given to generate_embedding.
+
+    Args:
+        export_dir: Output folder of export_onnx_int8
+        batch_size: Texts per batch (texts are sorted by length before batching)
+        threads: onnxruntime intra-op threads, default all cores
+        quantized: Use the int8 graph, False uses the fp32 one
+    """
+    def __init__(self, export_dir: str, batch_size: int = 64, threads: int = None, quantized: bool = True):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(export_dir, POOLING_FILE)) as file:
+            config = json.load(file)
+        self.pooling = config["pooling"]
+        self.normalize = config.get("normalize", False)
+        self.max_seq_length = config["max_seq_length"]
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(export_dir, INT8_FILE if quantized else FP32_FILE),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+
+    def close(self) -> None:
+        # Nothing to release (no worker pool), same interface as EncoderService
+        pass
+
+    def encode_batch(self, texts: list) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+        )
+        attention_mask = tokens["attention_mask"].astype("int64")
+        hidden = self.session.run(None, {
+            "input_ids": tokens["input_ids"].astype("int64"),
+            "attention_mask": attention_mask,
+        })[0]
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype("float32")
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def encode(self, texts) -> np.ndarray:
+        texts = ["" if text is None else str(text) for text in texts]
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        embeddings = None
+        for start in range(0, len(texts), self.batch_size):
+            batch_index = order[start:start + self.batch_size]
+            batch = self.encode_batch([texts[i] for i in batch_index]).astype("float32")
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch.shape[1]), dtype="float32")
+            embeddings[batch_index] = batch
+        return embeddings if embeddings is not None else np.zeros((0, 0), dtype="float32")
+
+
+def measure_drift(model_path: str, export_dir: str, texts: list, batch_size: int = 64) -> dict:
+    """
+    Compare the int8 ONNX embeddings with the fp32 PyTorch ones on the same texts:
+    cosine similarity per text and throughput of each backend.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_path, device="cpu")
+    start = time.perf_counter()
+    reference = st_model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    fp32_seconds = time.perf_counter() - start
+
+    encoder = OnnxEncoder(export_dir, batch_size=batch_size)
+    start = time.perf_counter()
+    quantized = encoder.encode(texts)
+    int8_seconds = time.perf_counter() - start
+
+    cosine = (reference * quantized).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(quantized, axis=1) + 1e-12
+    )
+    return {
+        "texts": len(texts),
+        "cosine_mean": float(cosine.mean()),
+        "cosine_p01": float(np.quantile(cosine, 0.01)),
+        "cosine_min": float(cosine.min()),
+        "fp32_texts_per_sec": len(texts) / fp32_seconds,
+        "int8_texts_per_sec": len(texts) / int8_seconds,
+        "speedup": fp32_seconds / int8_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the sentence embedding model to int8 ONNX and measure its drift.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("--model", required=True, help="Saved SentenceTransformer folder")
+    export_parser.add_argument("--output", required=True, help="Output folder of the ONNX graphs")
+
+    drift_parser = subparsers.add_parser("drift")
+    drift_parser.add_argument("--model", required=True, help="Saved SentenceTransformer folder")
+    drift_parser.add_argument("--export", required=True, help="Output folder of the export command")
+    drift_parser.add_argument("--data", default="data/dataset.csv")
+    drift_parser.add_argument("--limit", type=int, default=10000)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        print(export_onnx_int8(args.model, args.output))
+    else:
+        from modules.generateEmbedding import product_description, TEXT_COLS
+        df = pd.read_csv(args.data, nrows=args.limit, usecols=TEXT_COLS)
+        # The texts encoded in production (see ProductEmbedder, HierarchyPredictor)
+        texts = product_description(df).astype(object).fillna("").tolist()
+        for name, value in measure_drift(args.model, args.export, texts).items():
+            print(f"{name}: {value}")
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import json
+import glob
+import hashlib
+import threading
+from dataclasses import asdict
+from functools import lru_cache
+from config.configuration import DatasetConfig
+from config.obtainInfo import load_check_rules
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Code of the pipeline steps, any change of these files invalidates all the stages
+CODE_PATTERNS = ["main.py", "config/*.py", "config/*.yaml", "modules/*.py", "correction/*.py"]
+# Settings without effect on the tables written
+VOLATILE_SETTINGS = {"dry_run_check", "max_bytes_per_step", "report_path", "stage_cache_path", "spell_workers"}
+
+
+def table_ref_name(table) -> str:
+    """
+    "project.dataset.table" of a table id, TableReference or Table.
+    """
+    if isinstance(table, str):
+        return table
+    return f"{table.project}.{table.dataset_id}.{table.table_id}"
+
+def stage_tables(cfg: DatasetConfig, stage: str) -> tuple:
+    """
+    Table types (read, written) by a stage of DataCleaningPipeline,
+    the tables a stage writes are not listed in the ones it reads.
+    """
+    if stage == "clean":
+        return ["raw"], (["clean", "mapping", "delta", "delta_clean"] if cfg.incremental else ["clean", "mapping"])
+    elif stage == "validate":
+        reads = ["raw", "clean", "taxonomy"] if cfg.taxonomy_table else ["raw", "clean"]
+        writes = ["excluded"]
+        if "near_duplicate" in load_check_rules(cfg.dataset_type):
+            writes.append("near_duplicate")
+        return reads, writes
+    raise ValueError("Invalid stage. Choose from 'clean' or 'validate'.")
+
+def stage_key(cfg: DatasetConfig, stage: str) -> str:
+    return f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}:{stage}"
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    digest = hashlib.sha256()
+    paths = sorted({path for pattern in CODE_PATTERNS for path in glob.glob(os.path.join(ROOT, pattern))})
+    for path in paths:
+        digest.update(os.path.relpath(path, ROOT).encode("utf-8"))
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def stage_fingerprint(cfg: DatasetConfig, stage: str, inputs: dict, sql=None) -> str:
+    """
+    Hash of everything a stage depends on: its input tables (see table_info of
+    the backends), its generated SQL, the rule set, the settings and the code version.
+    """
+    settings = {key: value for key, value in asdict(cfg).items() if key not in VOLATILE_SETTINGS}
+    files = {}
+    if stage == "clean" and cfg.spell_cols and os.path.exists(cfg.spell_index_path):
+        stat = os.stat(cfg.spell_index_path)
+        files[cfg.spell_index_path] = (stat.st_mtime_ns, stat.st_size)
+    payload = {
+        "stage": stage,
+        "inputs": inputs,
+        "files": files,
+        "sql": sql,
+        "rules": load_check_rules(cfg.dataset_type),
+        "settings": settings,
+        "code_version": code_version(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class MetadataCache:
+    """
+    Table metadata (schema, last modified time, rows) fetched once and shared by
+    all the lookups of a run (and by the backends of an orchestrator), thread-safe.
+    The jobs writing a table invalidate it, see modules.jobMonitor.InstrumentedClient.
+    """
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def get_table(self, client, table):
+        name = table_ref_name(table)
+        with self.lock:
+            if name in self.tables:
+                return self.tables[name]
+        # Not found errors are not cached
+        fetched = client.get_table(table)
+        with self.lock:
+            self.tables[name] = fetched
+        return fetched
+
+    def invalidate(self, table=None) -> None:
+        """
+        Forget a table, or all the tables (e.g. after a script).
+        """
+        with self.lock:
+            if table is None:
+                self.tables.clear()
+            else:
+                self.tables.pop(table_ref_name(table), None)
+
+
+class StageCache:
+    """
+    JSON file of the fingerprint of the last successful run of each stage and of
+    the state of the tables it wrote. A stage is skipped when its fingerprint is
+    unchanged and its output tables were not modified since. The stages are keyed
+    by their clean table (see stage_key), so several configs can share the file.
+
+    Args:
+        path: JSON file, created at the first run
+    """
+    lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stages = self.load()
+
+    def load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as file:
+            return json.load(file)
+
+    def is_valid(self, key: str, fingerprint: str, outputs: dict) -> bool:
+        entry = self.stages.get(key)
+        return (
+            entry is not None
+            and entry["fingerprint"] == fingerprint
+            and all(info is not None for info in outputs.values())
+            and json.loads(json.dumps(outputs, default=str)) == entry["outputs"]
+        )
+
+    def record(self, key: str, fingerprint: str, outputs: dict) -> None:
+        self.update(key, {"fingerprint": fingerprint, "outputs": json.loads(json.dumps(outputs, default=str))})
+
+    def invalidate(self, key: str) -> None:
+        if key in self.stages:
+            self.update(key, None)
+
+    def update(self, key: str, entry: dict) -> None:
+        """
+        Write one entry (None removes it), the entries of the other configs are
+        reloaded first so concurrent pipelines do not overwrite each other.
+        """
+        with self.lock:
+            stages = self.load()
+            if entry is None:
+                stages.pop(key, None)
+                self.stages.pop(key, None)
+            else:
+                stages[key] = self.stages[key] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(stages, file, indent=2)
+            os.replace(tmp_path, self.path)
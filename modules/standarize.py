@@ -2,56 +2,244 @@
 #Author: Liuxin YANG
 #Date: 2025-04-25
 
-import re
+import numpy as np
 import pandas as pd
-from google.cloud import bigquery
-from correction.correction_dict import correction_dict_es_cinema
-from config.configuration import DatasetConfig
+from correction.textRepair import TextRepairer
 
 
-def standarize_by_frequence(df:pd.DataFrame, cols: list) -> pd.DataFrame:
+def normalize_values(values) -> pd.Series:
     """
-    This function standardizes the brand names based on their frequency in the dataset.
-    It uses a dictionary to map common brand names to their standardized form.
-    """
-    def normalize(brand):
-        """
-        Normalize the brand name by removing non-alphanumeric characters.
-        """
-        if pd.isnull(brand):
-            return None
-        return re.sub(r'[^A-Z0-9]', '',brand)
-    
-    def mapping(col:str):
-        df["__normalized"] = df[col].apply(normalize)
-        most_frequent = (
-            df.groupby(["__normalized",col]).size()
-            .reset_index(name="count")
-            .sort_values(["__normalized", "count"], ascending=[True, False])
-            .drop_duplicates(subset=["__normalized"])
-            .set_index("__normalized")[col]
-            .to_dict()
-        )
+    Normalize the brand names by removing non-alphanumeric characters.
+    """
+    return pd.Series(values, dtype="object").astype(str).str.replace(r'[^A-Z0-9]', '', regex=True)
 
-        df[col] = df["__normalized"].map(most_frequent)
+def deletion_variants(text: str, max_distance: int) -> set:
+    """
+    All the strings obtained by deleting up to max_distance characters of text (text included).
+    """
+    variants = {text}
+    frontier = {text}
+    for _ in range(max_distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        variants |= frontier
+    return variants
 
+def bounded_edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Damerau-Levenshtein (optimal string alignment) distance of a and b,
+    max_distance + 1 as soon as it is known to be larger than max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        # A transposition can still come from the previous row
+        if min(current) > max_distance and min(previous) >= max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return min(previous[-1], max_distance + 1)
 
-    for col in cols:
-        mapping(col)
-    df = df.drop(columns=["__normalized"])
-    
-    return df
+def fuzzy_clusters(texts, max_distance: int = 1, min_length: int = 5, order=None) -> np.ndarray:
+    """
+    Cluster the distinct texts within max_distance edits of the center of their
+    cluster, without comparing all the pairs. The texts are visited in order (e.g.
+    most frequent first): each one joins the first visited center within the
+    distance, or becomes a center. Only the centers sharing a deletion variant
+    with the text (deletion-neighborhood index, as SymSpell) are compared, and
+    the matches never chain: A~B and B~C does not merge A and C if they are far apart.
+    Texts shorter than min_length are not clustered.
 
-def repare_point_interrogation(schema:list, df:pd.DataFrame) -> pd.DataFrame:
-    
-    cols = [field.name for field in schema]
+    Returns the cluster code of each text (the code of its center).
+    """
+    texts = list(texts)
+    cluster = np.arange(len(texts))
+    rank = {}
+    index = {}
+    for code in (range(len(texts)) if order is None else order):
+        rank[code] = len(rank)
+        text = texts[code]
+        if len(text) < min_length:
+            continue
+        variants = deletion_variants(text, max_distance)
+        centers = sorted({center for variant in variants for center in index.get(variant, [])}, key=rank.get)
+        for center in centers:
+            if bounded_edit_distance(text, texts[center], max_distance) <= max_distance:
+                cluster[code] = center
+                break
+        else:
+            for variant in variants:
+                index.setdefault(variant, []).append(code)
+    return cluster
+
+def frequence_mapping_table(values, counts, fuzzy_distance: int = 0) -> pd.DataFrame:
+    """
+    Build the variant -> standard mapping table of one column from its distinct
+    values and their counts, using integer codes only (no string groupby / sort):
+    the standard value of each normalized group is its most frequent variant,
+    ties -> smallest variant.
 
-    def fix_text_if_needed(text):
-        if text is not None and "?" in text:
-            return correction_dict_es_cinema.get(text, text)
-        return text
+    With fuzzy_distance > 0, the normalized groups within fuzzy_distance edits of
+    the standard of their cluster (e.g. "LOREAL" / "LOREL", "SAMSUNG" / "SAMSNUG")
+    are clustered first, see fuzzy_clusters.
 
+    Returns a DataFrame with columns variant, normalized, standard, count, and with
+    fuzzy_distance > 0 also cluster (the normalized form of the standard of the cluster)
+    and fuzzy (True if the variant was merged by the fuzzy match only), to review the merges.
+    """
+    values = np.asarray(values, dtype=object)
+    counts = np.asarray(counts, dtype="int64")
+    normalized = normalize_values(values)
+    norm_codes, norm_uniques = pd.factorize(normalized)
+    value_rank = np.empty(len(values), dtype="int64")
+    value_rank[np.argsort(values.astype(str), kind="stable")] = np.arange(len(values))
+
+    group_codes = norm_codes
+    if fuzzy_distance > 0:
+        # Groups visited by their most frequent variant, so the center of a cluster has its standard
+        by_frequence = norm_codes[np.lexsort((value_rank, -counts))]
+        _, first = np.unique(by_frequence, return_index=True)
+        group_codes = fuzzy_clusters(norm_uniques, fuzzy_distance, order=by_frequence[np.sort(first)])[norm_codes]
+
+    order = np.lexsort((value_rank, -counts, group_codes))
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = group_codes[order][1:] != group_codes[order][:-1]
+
+    standard_by_group = np.empty(len(norm_uniques), dtype=object)
+    standard_by_group[group_codes[order][is_first]] = values[order][is_first]
+
+    table = pd.DataFrame({
+        "variant": values,
+        "normalized": normalized.to_numpy(dtype=object),
+        "standard": standard_by_group[group_codes],
+        "count": counts
+    })
+    if fuzzy_distance > 0:
+        table["cluster"] = np.asarray(norm_uniques, dtype=object)[group_codes]
+        table["fuzzy"] = table["normalized"] != normalize_values(table["standard"]).to_numpy(dtype=object)
+    return table
+
+def standarize_by_frequence(df:pd.DataFrame, cols: list, return_mapping: bool = False, fuzzy_distance: int = 0):
+    """
+    This function standardizes the brand names based on their frequency in the dataset.
+    Each column is factorized once: the counts are computed on its integer codes and
+    the standard values are mapped back with the codes. The input dataframe is not modified.
+
+    Returns the standardized dataframe, and with return_mapping=True also the
+    {col: mapping table} used (see frequence_mapping_table), which can be saved
+    with save_frequence_mapping and reused on new batches with apply_frequence_mapping.
+    fuzzy_distance: see frequence_mapping_table.
+    """
+    df = df.copy(deep=False)
+    mapping = {}
     for col in cols:
-        df[col] = df[col].apply(lambda x: fix_text_if_needed(x)) 
-    
+        codes, uniques = pd.factorize(df[col])
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        mapping[col] = frequence_mapping_table(uniques, counts, fuzzy_distance)
+
+        standard = np.append(mapping[col]["standard"].to_numpy(dtype=object), None)
+        df[col] = pd.Series(standard[codes], index=df.index, dtype=object)
+
+    if return_mapping:
+        return df, mapping
     return df
+
+def build_frequence_mapping(counts: dict, fuzzy_distance: int = 0) -> dict:
+    """
+    Build the {col: mapping table} from the {col: counts of each value} (see counts_from_table).
+    """
+    return {
+        col: frequence_mapping_table(col_counts.index.to_numpy(dtype=object), col_counts.to_numpy(), fuzzy_distance)
+        for col, col_counts in counts.items()
+    }
+
+def apply_frequence_mapping(df: pd.DataFrame, mapping: dict) -> pd.DataFrame:
+    """
+    Standardize a (new) batch with saved mapping tables, without recomputing frequencies.
+    Values are matched on their normalized form, so unseen variants of a known group are
+    standardized too; values of an unknown group are kept as they are.
+    """
+    df = df.copy(deep=False)
+    for col, table in mapping.items():
+        standard_by_normalized = table.drop_duplicates("normalized").set_index("normalized")["standard"]
+        codes, uniques = pd.factorize(df[col])
+        uniques = np.asarray(uniques, dtype=object)
+        standard = normalize_values(uniques).map(standard_by_normalized).to_numpy(dtype=object)
+        standard = np.where(pd.isnull(standard), uniques, standard)
+        df[col] = pd.Series(np.append(standard, None)[codes], index=df.index, dtype=object)
+    return df
+
+def counts_from_table(counts: pd.DataFrame, cols: list) -> dict:
+    """
+    {col: counts} of build_frequence_mapping from a table of columns column_name, variant, count
+    (e.g. the result of modules.generateQuery.generate_variant_counts_query).
+    """
+    return {
+        col: pd.Series(
+            table["count"].to_numpy(dtype="int64"),
+            index=pd.Index(table["variant"].to_numpy(dtype=object), dtype=object)
+        )
+        for col, table in ((col, counts[counts["column_name"] == col]) for col in cols)
+    }
+
+def mapping_to_table(mapping: dict) -> pd.DataFrame:
+    """
+    Single table of the {col: mapping table} with a column_name column (e.g. to upload it).
+    """
+    tables = [table.assign(column_name=col) for col, table in mapping.items()]
+    if not tables:
+        return pd.DataFrame(columns=["column_name", "variant", "normalized", "standard", "count"])
+    table = pd.concat(tables, ignore_index=True)
+    return table[["column_name"] + [col for col in table.columns if col != "column_name"]]
+
+def flag_mapping_changes(table: pd.DataFrame, previous: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Add the changed column to a mapping table of mapping_to_table: True for the
+    variants which are new or whose standard differs from the previous mapping
+    table, or which were still flagged in it (their rows not rebuilt yet).
+    Without previous mapping table all the variants are flagged.
+    An incremental cleaning rebuilds the rows of the flagged variants.
+    """
+    table = table.copy()
+    if previous is None:
+        table["changed"] = True
+        return table
+    previous = pd.DataFrame({
+        "column_name": previous["column_name"].to_numpy(dtype=object),
+        "variant": previous["variant"].to_numpy(dtype=object),
+        "previous_standard": previous["standard"].to_numpy(dtype=object),
+        # The CSV files of the local backend store the booleans as text
+        "previous_changed": previous["changed"].astype(str).isin(["True", "true"]).to_numpy(),
+    })
+    merged = table[["column_name", "variant", "standard"]].merge(previous, how="left", on=["column_name", "variant"])
+    table["changed"] = (
+        merged["previous_standard"].isna()
+        | (merged["previous_standard"] != merged["standard"])
+        | merged["previous_changed"].fillna(False).astype(bool)
+    ).to_numpy()
+    return table
+
+def save_frequence_mapping(mapping: dict, path: str) -> None:
+    """
+    Save the {col: mapping table} in a single CSV file.
+    """
+    pd.concat(
+        [table.assign(column=col) for col, table in mapping.items()], ignore_index=True
+    ).to_csv(path, index=False)
+
+def repare_point_interrogation(schema:list, df:pd.DataFrame, dict_names: list = None) -> pd.DataFrame:
+    """
+    Repair the "?" left instead of accents in the STRING fields, also inside longer texts.
+    See correction.textRepair.TextRepairer.
+
+    Args:
+        dict_names: Correction dictionaries to use, default ["es_cinema"]
+    """
+    repairer = TextRepairer(dict_names or ["es_cinema"])
+    return repairer.repair_dataframe(schema, df)
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import copy
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+from config.configuration import TrainingConfig
+from modules.nlp import NLPDataset, NLPHierarchyClassifier, BatchIndexSampler, transition_masks
+
+
+def split_indices(n_rows: int, val_fraction: float, seed: int = None):
+    """
+    Random (train indices, validation indices) of a dataset of n_rows rows.
+    """
+    order = np.random.default_rng(seed).permutation(n_rows)
+    n_val = int(round(n_rows * val_fraction))
+    return np.sort(order[n_val:]), np.sort(order[:n_val])
+
+def model_config(model: NLPHierarchyClassifier) -> dict:
+    """
+    Arguments to rebuild the same NLPHierarchyClassifier.
+    """
+    return {
+        "input_dim": model.encoder[0].in_features,
+        "hidden_dim": model.encoder[0].out_features,
+        "n_classes_per_level": [head.out_features for head in model.heads],
+        "sparse_dim": model.sparse_encoder.num_embeddings if model.sparse_encoder is not None else 0,
+    }
+
+def load_classifier(path: str, device: str = "cpu"):
+    """
+    Rebuild the model of a checkpoint saved by HierarchyTrainer.
+    Returns (model in eval mode, label vocabularies {label column: {label: index}},
+    parent->child masks of the training label paths, see transition_masks).
+    """
+    checkpoint = torch.load(path, map_location=device, weights_only=False)
+    model = NLPHierarchyClassifier(**checkpoint["model_config"]).to(device)
+    model.load_state_dict(checkpoint["model"])
+    return model.eval(), checkpoint["label_vocabularies"], checkpoint.get("transition_masks")
+
+
+class HierarchyTrainer:
+    """
+    Train an NLPHierarchyClassifier on an NLPDataset (one cross-entropy per level,
+    labels -1 are ignored, the sparse block of the dataset feeds the sparse input), with a validation split, early stopping on the
+    per-level validation accuracies and resumable checkpoints.
+
+    Args:
+        model: The classifier to train
+        cfg: Training configuration
+        label_vocabularies: {label column: {label: index}} of the levels, in level order
+            (e.g. FeatureBuilder.label_map), saved with the checkpoints
+        device: Default cuda if available
+    """
+    def __init__(self, model: NLPHierarchyClassifier, cfg: TrainingConfig, label_vocabularies: dict = None, device=None):
+        if cfg.threads:
+            torch.set_num_threads(cfg.threads)
+        self.cfg = cfg
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.model = model.to(self.device)
+        self.forward = torch.compile(self.model) if cfg.compile else self.model
+        self.optimizer = torch.optim.Adam(self.model.parameters(), lr=cfg.learning_rate)
+        self.loss_fn = nn.CrossEntropyLoss(ignore_index=-1)
+        self.label_vocabularies = label_vocabularies
+        self.transition_masks = None
+
+        self.epoch = 0
+        self.best_score = None
+        self.best_state = None
+        self.bad_epochs = 0
+        self.history = []
+
+    def loader(self, dataset: NLPDataset, indices, shuffle: bool) -> DataLoader:
+        sampler = BatchIndexSampler(indices, self.cfg.batch_size, shuffle=shuffle, seed=self.cfg.seed + self.epoch)
+        return DataLoader(dataset, sampler=sampler, batch_size=None, num_workers=self.cfg.num_workers)
+
+    def to_device(self, batch: tuple, non_blocking: bool = False) -> tuple:
+        """
+        (xb, yb, x_sparse) of a batch of NLPDataset on the device, x_sparse is None without sparse block.
+        """
+        xb, yb = batch[0].to(self.device, non_blocking=non_blocking), batch[1].to(self.device, non_blocking=non_blocking)
+        x_sparse = None
+        if len(batch) > 2:
+            x_sparse = tuple(tensor.to(self.device, non_blocking=non_blocking) for tensor in batch[2])
+        return xb, yb, x_sparse
+
+    def train_epoch(self, loader: DataLoader) -> dict:
+        self.model.train()
+        total_loss = torch.zeros((), device=self.device)
+        n_samples = 0
+        step_times = []
+        data_time = 0.0
+        epoch_start = time.perf_counter()
+        wait_start = epoch_start
+        for batch in loader:
+            step_start = time.perf_counter()
+            data_time += step_start - wait_start
+            xb, yb, x_sparse = self.to_device(batch, non_blocking=True)
+
+            preds = self.forward(xb, x_sparse)
+            loss = torch.stack([self.loss_fn(pred, yb[:, i]) for i, pred in enumerate(preds)]).sum()
+
+            self.optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+            self.optimizer.step()
+
+            # Accumulated on the device, no synchronisation per step
+            total_loss += loss.detach() * len(xb)
+            n_samples += len(xb)
+            wait_start = time.perf_counter()
+            step_times.append(wait_start - step_start)
+
+        seconds = time.perf_counter() - epoch_start
+        step_ms = np.array(step_times) * 1000 if step_times else np.zeros(1)
+        return {
+            "train_loss": total_loss.item() / max(n_samples, 1),
+            "samples": n_samples,
+            "seconds": seconds,
+            "samples_per_sec": n_samples / max(seconds, 1e-9),
+            "step_ms_mean": float(step_ms.mean()),
+            "step_ms_p95": float(np.quantile(step_ms, 0.95)),
+            "data_wait_s": data_time,
+        }
+
+    @torch.no_grad()
+    def evaluate(self, dataset: NLPDataset, indices=None) -> list:
+        """
+        Accuracy of each level on the rows of indices (all the rows by default).
+        """
+        self.model.eval()
+        indices = np.arange(len(dataset)) if indices is None else indices
+        correct = torch.zeros(len(self.model.heads), device=self.device)
+        total = torch.zeros(len(self.model.heads), device=self.device)
+        for batch in self.loader(dataset, indices, shuffle=False):
+            xb, yb, x_sparse = self.to_device(batch)
+            for i, pred in enumerate(self.forward(xb, x_sparse)):
+                known = yb[:, i] >= 0
+                correct[i] += (pred.argmax(dim=1)[known] == yb[known, i]).sum()
+                total[i] += known.sum()
+        return (correct / total.clamp(min=1)).tolist()
+
+    def save_checkpoint(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        torch.save({
+            "model": self.model.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "model_config": model_config(self.model),
+            "label_vocabularies": self.label_vocabularies,
+            "transition_masks": self.transition_masks,
+            "epoch": self.epoch,
+            "best_score": self.best_score,
+            "bad_epochs": self.bad_epochs,
+            "history": self.history,
+            "training_config": vars(self.cfg),
+        }, tmp_path)
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, path: str) -> None:
+        checkpoint = torch.load(path, map_location=self.device, weights_only=False)
+        self.model.load_state_dict(checkpoint["model"])
+        self.optimizer.load_state_dict(checkpoint["optimizer"])
+        self.label_vocabularies = checkpoint["label_vocabularies"] or self.label_vocabularies
+        self.transition_masks = checkpoint.get("transition_masks")
+        self.epoch = checkpoint["epoch"]
+        self.best_score = checkpoint["best_score"]
+        self.bad_epochs = checkpoint["bad_epochs"]
+        self.history = checkpoint["history"]
+        if self.cfg.best_path and os.path.exists(self.cfg.best_path):
+            self.best_state = torch.load(self.cfg.best_path, map_location=self.device, weights_only=False)["model"]
+        print(f"Resumed from {path} at epoch {self.epoch}")
+
+    def fit(self, dataset: NLPDataset, val_indices=None) -> list:
+        """
+        Train until cfg.epochs or early stopping, then keep the weights of the best
+        validation epoch. Resumes from cfg.checkpoint_path if it exists.
+
+        Args:
+            val_indices: Validation rows, default a random cfg.val_fraction of the dataset
+        """
+        cfg = self.cfg
+        if dataset.sparse_dim != model_config(self.model)["sparse_dim"]:
+            raise ValueError(
+                f"Invalid dataset. Its sparse block has {dataset.sparse_dim} columns, "
+                f"the model sparse_dim is {model_config(self.model)['sparse_dim']}."
+            )
+        if val_indices is None:
+            train_indices, val_indices = split_indices(len(dataset), cfg.val_fraction, cfg.seed)
+        else:
+            val_indices = np.asarray(val_indices)
+            train_indices = np.setdiff1d(np.arange(len(dataset)), val_indices)
+        if cfg.checkpoint_path and os.path.exists(cfg.checkpoint_path):
+            self.load_checkpoint(cfg.checkpoint_path)
+        if self.transition_masks is None:
+            self.transition_masks = transition_masks(dataset.y, model_config(self.model)["n_classes_per_level"])
+
+        while self.epoch < cfg.epochs and self.bad_epochs < cfg.patience:
+            self.epoch += 1
+            metrics = self.train_epoch(self.loader(dataset, train_indices, shuffle=True))
+            metrics["epoch"] = self.epoch
+            if len(val_indices) > 0:
+                metrics["val_accuracy"] = self.evaluate(dataset, val_indices)
+                score = float(np.mean(metrics["val_accuracy"]))
+            else:
+                score = -metrics["train_loss"]
+
+            if self.best_score is None or score > self.best_score + cfg.min_delta:
+                self.best_score = score
+                self.bad_epochs = 0
+                self.best_state = copy.deepcopy(self.model.state_dict())
+                if cfg.best_path:
+                    self.save_checkpoint(cfg.best_path)
+            else:
+                self.bad_epochs += 1
+            self.history.append(metrics)
+
+            accuracy = ", ".join(f"{value:.3f}" for value in metrics.get("val_accuracy", []))
+            print(
+                f"Epoch {self.epoch}/{cfg.epochs}, Loss: {metrics['train_loss']:.4f}, "
+                f"Val accuracy: [{accuracy}], {metrics['samples_per_sec']:.0f} samples/sec, "
+                f"step {metrics['step_ms_mean']:.1f} ms (p95 {metrics['step_ms_p95']:.1f} ms), "
+                f"data wait {metrics['data_wait_s']:.1f}s"
+            )
+            if cfg.checkpoint_path:
+                self.save_checkpoint(cfg.checkpoint_path)
+
+        if self.bad_epochs >= cfg.patience:
+            print(f"Early stopping: no improvement of the validation accuracy for {cfg.patience} epochs")
+        if self.best_state is not None:
+            self.model.load_state_dict(self.best_state)
+        return self.history
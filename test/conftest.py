@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Scripts run by hand (they download a model or need data/), not pytest tests
+collect_ignore = ["test.py", "test_spellcheck.py", "download_model.py"]
+
+
+class FakeJob:
+    """
+    Finished job of FakeClient, its rows are a dataframe.
+    """
+    total_bytes_processed = 0
+    total_bytes_billed = 0
+    slot_millis = 0
+    cache_hit = False
+    output_rows = 0
+    job_id = "fake"
+
+    def __init__(self, rows: pd.DataFrame = None):
+        self.rows = rows if rows is not None else pd.DataFrame()
+
+    def result(self, *args, **kwargs):
+        return self
+
+    def to_dataframe(self, *args, **kwargs):
+        return self.rows
+
+    def to_dataframe_iterable(self, *args, **kwargs):
+        if isinstance(self.rows, list):
+            yield from self.rows
+        else:
+            yield self.rows
+
+
+class FakeClient:
+    """
+    Stand-in of bigquery.Client recording the jobs instead of running them.
+
+    Args:
+        tables: {table id: bigquery.Table}, the tables of get_table
+        answer: Optional function (sql) -> dataframe of the rows of a query
+        pages: Optional {table id: list of dataframes}, the pages of list_rows
+    """
+    def __init__(self, tables: dict, answer=None, pages: dict = None):
+        self.tables = dict(tables)
+        self.answer = answer
+        self.pages = pages or {}
+        self.queries = []
+        self.loads = {}
+        self.deleted = []
+
+    def get_table(self, table):
+        from google.api_core.exceptions import NotFound
+        name = table if isinstance(table, str) else f"{table.project}.{table.dataset_id}.{table.table_id}"
+        if name not in self.tables:
+            raise NotFound(name)
+        return self.tables[name]
+
+    def query(self, query, job_config=None, **kwargs):
+        self.queries.append((query, job_config))
+        destination = getattr(job_config, "destination", None)
+        if destination is not None:
+            name = f"{destination.project}.{destination.dataset_id}.{destination.table_id}"
+            self.tables.setdefault(name, self.table(name, []))
+        return FakeJob(self.answer(query) if self.answer else None)
+
+    def list_rows(self, table, *args, **kwargs):
+        return FakeJob(self.pages.get(f"{table.project}.{table.dataset_id}.{table.table_id}", []))
+
+    def load_table_from_dataframe(self, dataframe, destination, *args, **kwargs):
+        self.loads[str(destination)] = dataframe
+        return FakeJob()
+
+    def load_table_from_file(self, file_obj, destination, *args, **kwargs):
+        return FakeJob()
+
+    def copy_table(self, sources, destination, *args, **kwargs):
+        return FakeJob()
+
+    def create_table(self, table, *args, **kwargs):
+        return table
+
+    def delete_table(self, table, *args, **kwargs):
+        self.deleted.append(str(table))
+        self.tables.pop(str(table), None)
+
+    @staticmethod
+    def table(name: str, columns: list, field_type: str = "STRING"):
+        from google.cloud import bigquery
+        return bigquery.Table(name, schema=[bigquery.SchemaField(col, field_type) for col in columns])
+
+
+@pytest.fixture
+def fake_client():
+    return FakeClient
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import re
+from collections import Counter
+import pandas as pd
+import pytest
+from google.cloud import bigquery
+from config.configuration import DatasetConfig
+from modules.localEngine import LocalField, clean_series, check_flags, check_exclude_dataframe
+from modules.generateQuery import (
+    generate_clean_clause,
+    generate_clean_query,
+    generate_check_exclude_query,
+    do_query_job
+)
+
+COLS = ["country_id", "barcode", "item_desc"]
+
+
+def test_clean_series_matches_the_clean_clause():
+    clause = generate_clean_clause([LocalField("item_desc", "STRING"), LocalField("price", "FLOAT64")])
+    # NFD, marks removed, RE2 \s+ -> ' ', UPPER, TRIM; the NULL variants on UPPER(TRIM())
+    assert (
+        "TRIM(UPPER(REGEXP_REPLACE(REGEXP_REPLACE(NORMALIZE(item_desc, NFD), r'\\pM', ''), r'\\s+', ' ')))"
+        in clause
+    )
+    assert "UPPER(TRIM(item_desc)) IN ('', 'NULL', 'N/A', 'NAN', 'NA', 'N.A!')" in clause
+    assert "price AS price" in clause
+
+    # Results of the clause on BigQuery
+    values = {
+        "  crème   brûlée ": "CREME BRULEE",
+        "l'oréal\tparis": "L'OREAL PARIS",
+        "pâte à tartiner": "PATE A TARTINER", # RE2 \s is ASCII only
+        " n/a ": None,
+        "null": None,
+        "": None,
+        None: None,
+    }
+    cleaned = clean_series(pd.Series(list(values), dtype=object))
+    assert cleaned.tolist() == list(values.values())
+
+
+def sql_flags(df: pd.DataFrame, exclude_query: str) -> pd.DataFrame:
+    """
+    Flags of the rules of an exclude query evaluated with the BigQuery semantics
+    (ROW_NUMBER over the parsed PARTITION BY / ORDER BY with NULLs first, NULL
+    predicates -> FALSE), independently of modules.localEngine.
+    """
+    rows = [tuple(row) for row in df.itertuples(index=False)]
+    seen = Counter()
+    occurrence = []
+    for row in rows:
+        seen[row] += 1
+        occurrence.append(seen[row])
+    values = [dict(zip(df.columns, row), _row_fingerprint=0, _occurrence=n) for row, n in zip(rows, occurrence)]
+    flags = pd.DataFrame(index=df.index)
+    flags["all_line_duplicate"] = [n > 1 for n in occurrence]
+
+    partition, order = re.search(r"PARTITION BY (.+?) ORDER BY (.+?)\) > 1", exclude_query).groups()
+    partition, order = [col.strip() for col in partition.split(",")], [col.strip() for col in order.split(",")]
+    ranked = sorted(range(len(rows)), key=lambda i: [(values[i][col] is not None, values[i][col] or "") for col in order])
+    kept = set()
+    duplicate_key = [False] * len(rows)
+    for i in ranked:
+        key = tuple(values[i][col] for col in partition)
+        duplicate_key[i] = key in kept
+        kept.add(key)
+    flags["primary_key_duplicate"] = duplicate_key
+
+    col, lengths = re.search(r"LENGTH\((\w+)\) NOT IN \(([\d, ]+)\)", exclude_query).groups()
+    lengths = {int(length) for length in lengths.split(",")}
+    flags["wrong_barcode_length"] = [value[col] is not None and len(value[col]) not in lengths for value in values]
+    return flags
+
+
+def test_local_rules_match_the_sql_rules(fake_client):
+    cfg = DatasetConfig()
+    raw_id = f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}"
+    client = fake_client({raw_id: fake_client.table(raw_id, COLS)})
+    exclude_query, filter_query = generate_check_exclude_query(cfg, client)
+    assert "IFNULL(_occurrence > 1, FALSE) AS _flag_all_line_duplicate" in exclude_query
+    assert "IFNULL(LENGTH(barcode) NOT IN (7, 8, 10, 13), FALSE) AS _flag_wrong_barcode_length" in exclude_query
+    assert f"LEFT JOIN `{cfg.project}.{cfg.dataset}.{cfg.excluded_table}` e ON n.row_id = e.row_id" in filter_query
+
+    df = pd.DataFrame({
+        "country_id": ["FR", "FR", "FR", "FR", "ES", "ES", "ES", "ES"],
+        "barcode": ["1234567", "1234567", "123", None, "12345678", "12345678", "87654321", "87654321"],
+        "item_desc": ["A", "A", "B", "C", "E", "D", "F", None],
+    }, dtype=object)
+    schema = [LocalField(col, "STRING") for col in COLS]
+    expected = sql_flags(df, exclude_query)
+    pd.testing.assert_frame_equal(check_flags(cfg, df, schema), expected, check_dtype=False)
+
+    excluded, filtered = check_exclude_dataframe(cfg, df, schema)
+    # The second copy of a row, the barcode of length 3 and, for each key, every row
+    # but the first by value (NULLs first); a NULL barcode is not flagged (IFNULL)
+    assert excluded["item_desc"].tolist() == ["A", "B", "E", "F"]
+    assert excluded["reason"].tolist() == [
+        "all_line_duplicate,primary_key_duplicate", "wrong_barcode_length",
+        "primary_key_duplicate", "primary_key_duplicate"
+    ]
+    assert filtered["item_desc"].tolist() == ["A", "C", "D", None]
+    assert filtered["item_desc"].tolist() == df.loc[~expected.any(axis=1), "item_desc"].tolist()
+
+
+def test_clean_query_reads_the_raw_schema(fake_client):
+    cfg = DatasetConfig()
+    raw_id = f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}"
+    client = fake_client({raw_id: fake_client.table(raw_id, COLS)})
+    mapping_id = f"{cfg.project}.{cfg.dataset}.{cfg.mapping_table}"
+    query = generate_clean_query(cfg, client, "raw", ["item_desc"], mapping_id)
+    assert f"FROM `{raw_id}`" in query
+    assert "END AS country_id" in query and "END AS barcode" in query
+    assert f"`{mapping_id}`" in query and "WHERE column_name = 'item_desc'" in query
+
+
+def test_query_job_writes_the_configured_layout(fake_client):
+    cfg = DatasetConfig(clean_partitioning="updated", partition_granularity="MONTH")
+    client = fake_client({})
+    do_query_job(cfg, client, "clean", "SELECT 1")
+    sql, job_config = client.queries[0]
+    assert sql == "SELECT 1"
+    assert job_config.destination.table_id == cfg.clean_table
+    assert job_config.write_disposition == "WRITE_TRUNCATE"
+    assert job_config.clustering_fields == ["country_id", "barcode"]
+    assert job_config.time_partitioning.field == "updated" and job_config.time_partitioning.type_ == "MONTH"
+
+
+def test_table_with_another_layout_is_replaced_atomically(fake_client):
+    cfg = DatasetConfig()
+    clean_id = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    table = fake_client.table(clean_id, COLS)
+    table.time_partitioning = bigquery.TimePartitioning(type_="DAY", field="updated")
+
+    def answer(sql: str) -> pd.DataFrame:
+        if "broken" in sql:
+            raise RuntimeError("query failed")
+        return pd.DataFrame()
+
+    client = fake_client({clean_id: table}, answer)
+    with pytest.raises(RuntimeError):
+        do_query_job(cfg, client, "clean", "SELECT broken")
+    # The table with the previous layout is kept, only the staging table is dropped
+    staging_id = str(client.queries[0][1].destination)
+    assert staging_id.startswith(f"{clean_id}__staging_") and client.deleted == [staging_id]
+
+    client = fake_client({clean_id: table}, answer)
+    do_query_job(cfg, client, "clean", "SELECT 1")
+    (_, job_config), (replace_sql, _) = client.queries
+    staging_id = str(job_config.destination)
+    assert job_config.clustering_fields == ["country_id", "barcode"] and job_config.time_partitioning is None
+    assert replace_sql == f"CREATE OR REPLACE TABLE `{clean_id}` COPY `{staging_id}`"
+    assert client.deleted == [staging_id]
+
+    # Same layout: written in place
+    table.time_partitioning = None
+    table.clustering_fields = ["country_id", "barcode"]
+    client = fake_client({clean_id: table})
+    do_query_job(cfg, client, "clean", "SELECT 1")
+    assert str(client.queries[0][1].destination) == clean_id and client.deleted == []
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import os
+import numpy as np
+import pytest
+from modules.embeddingCache import EmbeddingCache
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return np.array([[len(text), 1.0] for text in texts], dtype="float32")
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    model = tmp_path / "model"
+    model.mkdir()
+    (model / "config.json").write_text('{"hidden_size": 2}')
+    (model / "model.safetensors").write_bytes(b"weights")
+    return str(model)
+
+
+def test_index_written_on_close_only(tmp_path, model_dir):
+    encoder = CountingEncoder()
+    with EmbeddingCache(str(tmp_path / "cache"), model_dir) as cache:
+        cache.encode(["a", "bb"], encoder)
+        cache.encode(["bb", "ccc"], encoder)
+        assert not os.path.exists(cache.index_path)
+    assert encoder.texts == ["a", "bb", "ccc"]
+
+    with EmbeddingCache(str(tmp_path / "cache"), model_dir) as cache:
+        np.testing.assert_array_equal(cache.encode(["ccc", "a"], encoder), [[3, 1], [1, 1]])
+    assert encoder.texts == ["a", "bb", "ccc"]
+
+
+def test_flush_every(tmp_path, model_dir):
+    cache = EmbeddingCache(str(tmp_path / "cache"), model_dir, flush_every=2)
+    cache.encode(["a"], CountingEncoder())
+    assert not os.path.exists(cache.index_path)
+    cache.encode(["b"], CountingEncoder())
+    assert os.path.exists(cache.index_path)
+
+
+def test_store_not_closed_is_reset(tmp_path, model_dir):
+    encoder = CountingEncoder()
+    with EmbeddingCache(str(tmp_path / "cache"), model_dir) as cache:
+        cache.encode(["a"], encoder)
+    cache = EmbeddingCache(str(tmp_path / "cache"), model_dir)
+    cache.encode(["b"], encoder)
+    # Vectors written after the last flush: the index on disk is stale
+    EmbeddingCache(str(tmp_path / "cache"), model_dir).encode(["a"], encoder)
+    assert encoder.texts == ["a", "b", "a"]
+
+
+@pytest.mark.parametrize("changed_file", ["config.json", "model.safetensors"])
+def test_new_weights_at_the_same_path_reset_the_store(tmp_path, model_dir, changed_file):
+    encoder = CountingEncoder()
+    with EmbeddingCache(str(tmp_path / "cache"), model_dir) as cache:
+        cache.encode(["a"], encoder)
+    path = os.path.join(model_dir, changed_file)
+    with open(path, "ab") as file:
+        file.write(b" ")
+    with EmbeddingCache(str(tmp_path / "cache"), model_dir) as cache:
+        cache.encode(["a"], encoder)
+    assert encoder.texts == ["a", "a"]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import numpy as np
+from modules.encoderService import EncoderService
+
+
+class LengthModel:
+    """
+    Stand-in of a SentenceTransformer embedding a text as [its length].
+    """
+    def encode(self, texts, **kwargs):
+        return np.array([[len(text)] for text in texts], dtype="float32")
+
+
+def test_throughput_is_reported_once(capsys):
+    encoder = EncoderService.__new__(EncoderService)
+    encoder.batch_size, encoder.window, encoder.pool, encoder.model = 2, 4, None, LengthModel()
+    encoder.stats = {"texts": 0, "seconds": 0.0, "texts_per_sec": 0.0}
+
+    for texts in (["aaa", "b", None, "cc", "dddd"], ["ee"]):
+        embeddings = encoder.encode(texts)
+        assert embeddings[:, 0].tolist() == [len(text or "") for text in texts]
+    assert capsys.readouterr().out == ""
+    assert encoder.stats["texts"] == 6
+
+    encoder.close()
+    assert capsys.readouterr().out.startswith("Encoded 6 texts")
+    encoder.close()
+    assert capsys.readouterr().out == ""
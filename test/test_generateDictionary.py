@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import json
+import pytest
+from modules.generateDictionary import byte_ranges, count_byte_range, count_lines
+
+
+@pytest.fixture
+def kaikki_path(tmp_path):
+    path = tmp_path / "kaikki.jsonl"
+    with open(path, "w") as file:
+        for i in range(100):
+            language = "French" if i % 3 else "English"
+            file.write(json.dumps({"word": f"Mot{i % 7}", "lang": language}) + "\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 33, 66, 10 ** 6])
+def test_chunked_count_equals_single_pass(kaikki_path, chunk_bytes):
+    languages = ["French", "English"]
+    with open(kaikki_path, "rb") as file:
+        expected = count_lines(file, languages)
+
+    totals = {language: {} for language in languages}
+    for start, end in byte_ranges(kaikki_path, chunk_bytes):
+        for language, counter in count_byte_range((kaikki_path, start, end, languages)).items():
+            for word, count in counter.items():
+                totals[language][word] = totals[language].get(word, 0) + count
+    assert totals == {language: dict(counter) for language, counter in expected.items()}
+    assert sum(sum(counter.values()) for counter in totals.values()) == 100
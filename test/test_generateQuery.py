@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import threading
+import pandas as pd
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+from config.configuration import DatasetConfig
+from modules.generateQuery import do_data2table_job
+
+SCHEMA = [bigquery.SchemaField("country_id", "STRING"), bigquery.SchemaField("barcode", "STRING")]
+
+
+def test_chunks_are_loaded_as_parquet_then_copied(fake_client):
+    class UploadClient(fake_client):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.lock = threading.Lock()
+            self.created, self.files, self.copies = [], [], []
+
+        def create_table(self, table, *args, **kwargs):
+            self.created.append(table)
+            return table
+
+        def load_table_from_file(self, file_obj, destination, *args, **kwargs):
+            with self.lock:
+                self.files.append((destination, kwargs["job_config"], pq.read_table(file_obj).to_pandas()))
+            return super().load_table_from_file(file_obj, destination)
+
+        def copy_table(self, sources, destination, *args, **kwargs):
+            self.copies.append((sources, destination, kwargs["job_config"].write_disposition))
+            return super().copy_table(sources, destination)
+
+    cfg = DatasetConfig()
+    clean_id = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    df = pd.DataFrame({"country_id": ["FR", "ES"] * 5, "barcode": [str(i) for i in range(10)]})
+    client = UploadClient({})
+    do_data2table_job(cfg, client, "clean", df, SCHEMA, chunk_rows=3, max_workers=2)
+
+    staging, = client.created
+    staging_id = f"{staging.project}.{staging.dataset_id}.{staging.table_id}"
+    assert staging_id.startswith(f"{clean_id}__staging_") and staging.clustering_fields == ["country_id", "barcode"]
+    # 4 Parquet chunks appended to the staging table, with all the rows
+    assert len(client.files) == 4 and {destination for destination, _, _ in client.files} == {staging_id}
+    _, load_config, _ = client.files[0]
+    assert load_config.source_format == "PARQUET" and load_config.write_disposition == "WRITE_APPEND"
+    loaded = pd.concat([rows for _, _, rows in client.files]).sort_values("barcode", key=lambda s: s.astype(int))
+    pd.testing.assert_frame_equal(loaded.reset_index(drop=True), df)
+    # Then copied over the target and dropped
+    assert client.copies == [(staging_id, clean_id, "WRITE_TRUNCATE")]
+    assert client.deleted == [staging_id]
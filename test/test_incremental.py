@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import pandas as pd
+from google.cloud import bigquery
+from config.configuration import DatasetConfig
+from modules.executionBackend import BigQueryBackend, LocalBackend
+
+COLS = ["country_id", "barcode", "local_brand_name", "updated"]
+
+
+def raw_rows(brands: list, first: int, updated: str) -> pd.DataFrame:
+    return pd.DataFrame({
+        "country_id": "FR",
+        "barcode": [str(1000000 + first + i) for i in range(len(brands))],
+        "local_brand_name": brands,
+        "updated": updated,
+    })
+
+
+def local_clean(tmp_path, raw: pd.DataFrame, incremental: bool) -> pd.DataFrame:
+    cfg = DatasetConfig(backend="local", local_dir=str(tmp_path), incremental=incremental, watermark_col="updated")
+    tmp_path.mkdir(exist_ok=True)
+    raw.to_parquet(tmp_path / f"{cfg.raw_table}.parquet", index=False)
+    backend = LocalBackend(cfg)
+    backend.clean(["local_brand_name"])
+    return backend.read_table("clean").sort_values("barcode").reset_index(drop=True)
+
+
+def test_changed_standard_rebuilds_all_its_keys(tmp_path):
+    old = raw_rows(["l'oreal"] * 3 + ["l oreal"] * 2, 0, "2026-01-01")
+    assert set(local_clean(tmp_path, old, incremental=True)["local_brand_name"]) == {"L'OREAL"}
+
+    # The new rows make "L OREAL" the most frequent variant
+    raw = pd.concat([old, raw_rows(["l oreal"] * 4, 10, "2026-01-02")], ignore_index=True)
+    clean = local_clean(tmp_path, raw, incremental=True)
+    assert set(clean["local_brand_name"]) == {"L OREAL"}
+    assert len(clean) == len(raw)
+    pd.testing.assert_frame_equal(clean, local_clean(tmp_path / "full", raw, incremental=False))
+
+    delta = pd.read_parquet(tmp_path / f"{DatasetConfig().delta_table}.parquet")
+    assert len(delta) == len(raw)
+
+
+def test_unchanged_standard_only_rebuilds_new_keys(tmp_path):
+    old = raw_rows(["nike"] * 3, 0, "2026-01-01")
+    local_clean(tmp_path, old, incremental=True)
+    raw = pd.concat([old, raw_rows(["nike", "adidas"], 10, "2026-01-02")], ignore_index=True)
+    clean = local_clean(tmp_path, raw, incremental=True)
+    delta = pd.read_parquet(tmp_path / f"{DatasetConfig().delta_table}.parquet")
+    assert delta["barcode"].tolist() == ["1000010", "1000011"]
+    assert clean["local_brand_name"].tolist() == ["NIKE"] * 4 + ["ADIDAS"]
+
+
+def test_bigquery_incremental_only_writes_the_delta(fake_client):
+    cfg = DatasetConfig(incremental=True, watermark_col="updated")
+    table_id = lambda table: f"{cfg.project}.{cfg.dataset}.{table}"
+    clean = fake_client.table(table_id(cfg.clean_table), COLS)
+    clean.clustering_fields = ["country_id", "barcode"]
+    mapping = fake_client.table(table_id(cfg.mapping_table), ["column_name", "variant", "standard"])
+    mapping.schema = mapping.schema + [bigquery.SchemaField("changed", "BOOL")]
+
+    def answer(sql: str) -> pd.DataFrame:
+        if "COUNT(*) AS count" in sql:
+            return pd.DataFrame({"column_name": "local_brand_name", "variant": ["L OREAL", "L'OREAL"], "count": [6, 3]})
+        if "SELECT column_name, variant, standard, changed" in sql:
+            return pd.DataFrame({"column_name": "local_brand_name", "variant": ["L OREAL", "L'OREAL"], "standard": "L'OREAL", "changed": False})
+        return pd.DataFrame()
+
+    client = fake_client({
+        table_id(cfg.raw_table): fake_client.table(table_id(cfg.raw_table), COLS),
+        table_id(cfg.clean_table): clean,
+        table_id(cfg.mapping_table): mapping,
+    }, answer)
+    backend = BigQueryBackend(cfg, client)
+    backend.clean(["local_brand_name"])
+
+    assert backend.delta_ready
+    uploaded = client.loads[table_id(cfg.mapping_table)]
+    assert uploaded["changed"].tolist() == [True, True]
+    assert all(job_config is None or job_config.destination is None for _, job_config in client.queries)
+    scripts = [sql for sql, _ in client.queries if "CREATE OR REPLACE TABLE" in sql or "MERGE" in sql]
+    delta_script, merge_script = scripts
+    # The raw rows are filtered on the changed keys before being cleaned
+    delta_clean = delta_script[delta_script.index(f"`{table_id(cfg.delta_clean_table)}`"):]
+    assert delta_clean.index("IN (SELECT key_fingerprint") < delta_clean.index("LEFT JOIN local_brand_name_map")
+    assert "WHERE column_name = 'local_brand_name' AND changed" in delta_script
+    assert f"USING `{table_id(cfg.delta_clean_table)}`" in merge_script
+    assert "SET changed = FALSE" in merge_script
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+from collections import Counter
+import pandas as pd
+import pytest
+from google.cloud import bigquery
+from config.configuration import DatasetConfig
+from modules.executionBackend import BigQueryBackend
+from modules.jobMonitor import BudgetExceededError, InstrumentedClient, RunReport, written_tables
+from modules.stageCache import MetadataCache
+
+COLS = ["country_id", "barcode", "local_brand_name"]
+
+
+def test_raw_table_is_fetched_once_per_run(fake_client):
+    cfg = DatasetConfig()
+    raw_id = f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}"
+    fetched = Counter()
+
+    class CountingClient(fake_client):
+        def get_table(self, table):
+            fetched[table if isinstance(table, str) else f"{table.project}.{table.dataset_id}.{table.table_id}"] += 1
+            return super().get_table(table)
+
+    def answer(sql: str) -> pd.DataFrame:
+        if "AS variant" in sql:
+            return pd.DataFrame({"column_name": ["local_brand_name"], "variant": ["NIKE"], "count": [2]})
+        return pd.DataFrame()
+
+    backend = BigQueryBackend(cfg, CountingClient({raw_id: fake_client.table(raw_id, COLS)}, answer))
+    backend.clean(["local_brand_name"])
+    backend.validate()
+    assert fetched[raw_id] == 1
+
+
+def test_job_stats_are_reported_by_step(fake_client):
+    report = RunReport()
+    client = InstrumentedClient(fake_client({}), report)
+    with client.step("clean"):
+        client.query("SELECT 1").result()
+        client.load_table_from_dataframe(pd.DataFrame(), "p.d.t").result()
+    with client.step("validate"):
+        job = client.query("SELECT 2")
+        job.result()
+        job.result() # recorded once
+    with report.timed("spell_correct"):
+        pass
+
+    assert [(job.step, job.job_type) for job in report.jobs] == [
+        ("clean", "query"), ("clean", "load"), ("validate", "query"), ("spell_correct", "local")
+    ]
+    assert report.by_step()["clean"]["jobs"] == 2
+    assert report.to_dict()["jobs"][0]["job_id"] == "fake"
+    assert report.summary().startswith("clean: 2 job(s)")
+
+
+def test_dry_run_budget_of_a_step(fake_client):
+    class EstimatingClient(fake_client):
+        def query(self, query, job_config=None, **kwargs):
+            job = super().query(query, job_config, **kwargs)
+            job.total_bytes_processed = 100 if job_config is not None and job_config.dry_run else 0
+            return job
+
+    client = InstrumentedClient(EstimatingClient({}), max_bytes_per_step=150, dry_run=True)
+    with client.step("clean"):
+        client.query("SELECT 1")
+        with pytest.raises(BudgetExceededError):
+            client.query("SELECT 2")
+    with client.step("validate"):
+        client.query("SELECT 3")
+    assert client.estimated_bytes == {"clean": 100, "validate": 100}
+
+
+def test_jobs_invalidate_the_tables_they_write(fake_client):
+    names = ["p.d.raw", "p.d.clean", "p.d.mapping"]
+    client = InstrumentedClient(
+        fake_client({name: fake_client.table(name, ["a"]) for name in names}),
+        metadata=MetadataCache()
+    )
+    for name in names:
+        client.get_table(name)
+
+    client.query("WITH t AS (SELECT 1) SELECT * FROM `p.d.raw`").result()
+    assert set(client.metadata.tables) == set(names)
+    client.query("SELECT 1", job_config=bigquery.QueryJobConfig(destination="p.d.clean")).result()
+    assert set(client.metadata.tables) == {"p.d.raw", "p.d.mapping"}
+    client.query("UPDATE `p.d.mapping` SET changed = FALSE WHERE changed").result()
+    assert set(client.metadata.tables) == {"p.d.raw"}
+    client.query("DECLARE x INT64 DEFAULT 1; SELECT x").result()
+    assert client.metadata.tables == {}
+
+
+def test_written_tables_of_a_script():
+    script = """
+    CREATE TEMP TABLE _rows AS SELECT * FROM `p.d.clean`;
+    MERGE `p.d.excluded` T USING _rows S ON FALSE
+    WHEN NOT MATCHED THEN INSERT ROW;
+    CREATE OR REPLACE TABLE `p.d.delta` AS SELECT 1
+    """
+    assert written_tables(script) == ["p.d.excluded", "p.d.delta"]
+    assert written_tables("SELECT 1;") == []
+    assert written_tables("SELECT 1; SELECT 2") is None
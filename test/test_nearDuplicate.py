@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import numpy as np
+import pandas as pd
+from config.configuration import DatasetConfig
+from modules.executionBackend import BigQueryBackend
+
+COLS = ["country_id", "barcode", "item_desc", "local_brand_name", "global_brand_name"]
+
+
+class FakeEmbedder:
+    """
+    Embed the first letter of item_desc, so the descriptions starting with the same letter are duplicates.
+    """
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, rows: pd.DataFrame) -> np.ndarray:
+        X = np.zeros((len(rows), 26), dtype=np.float32)
+        X[np.arange(len(rows)), [ord(text[0]) - ord("A") for text in rows["item_desc"]]] = 1
+        return X
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def test_blocks_are_read_by_partition(fake_client, monkeypatch):
+    cfg = DatasetConfig(near_duplicate_partitions=2)
+    raw_id = f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}"
+    partitions = {
+        # Rows of a partition come back unsorted, the blocks are sorted in memory
+        0: pd.DataFrame({
+            "row_id": ["3", "1", "2"], "country_id": ["FR", "ES", "FR"],
+            "local_brand_name": ["NIKE", "NIKE", "NIKE"], "item_desc": ["AIR 2", "AIR", "AIR 1"],
+        }),
+        1: pd.DataFrame({
+            "row_id": ["4", "5"], "country_id": ["FR", "FR"],
+            "local_brand_name": ["PUMA", "PUMA"], "item_desc": ["AXE", "BOX"],
+        }),
+    }
+
+    def answer(sql: str) -> pd.DataFrame:
+        for partition, rows in partitions.items():
+            if sql.endswith(f"WHERE _partition = {partition}"):
+                return rows
+        return pd.DataFrame()
+
+    client = fake_client({raw_id: fake_client.table(raw_id, COLS)}, answer)
+    written = []
+    monkeypatch.setattr("modules.nearDuplicate.ProductEmbedder", FakeEmbedder)
+    monkeypatch.setattr(
+        "modules.generateQuery.do_data2table_job",
+        lambda cfg, client, tableType, chunks, schema: written.extend(chunks)
+    )
+    BigQueryBackend(cfg, client).near_duplicates()
+
+    source_sql, source_config = client.queries[0]
+    assert "ORDER BY" not in source_sql and "MOD(ABS(FARM_FINGERPRINT(TO_JSON_STRING(STRUCT(n.country_id, n.local_brand_name)))), 2)" in source_sql
+    assert source_config.range_partitioning.field == "_partition"
+    assert [sql.endswith(f"WHERE _partition = {partition}") for partition, (sql, _) in enumerate(client.queries[1:3])] == [True, True]
+    pairs = pd.concat(written, ignore_index=True)
+    assert pairs[["row_id", "near_duplicate_of"]].values.tolist() == [["3", "2"]]
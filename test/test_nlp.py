@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+import torch
+from config.configuration import TrainingConfig
+from modules.nlp import NLPDataset, NLPHierarchyClassifier, csr_to_bag
+from modules.trainer import HierarchyTrainer
+
+
+@pytest.fixture
+def sparse_data():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((64, 4)).astype(np.float32)
+    X_sparse = sp.random(64, 10, density=0.3, format="csr", dtype=np.float32, random_state=0)
+    y = np.stack([rng.integers(0, 2, 64), rng.integers(0, 3, 64)], axis=1)
+    return X, X_sparse, y
+
+
+def test_forward_needs_the_sparse_block(sparse_data):
+    X, X_sparse, _ = sparse_data
+    model = NLPHierarchyClassifier(4, 8, [2, 3], sparse_dim=10)
+    with pytest.raises(ValueError):
+        model(torch.from_numpy(X))
+    assert model(torch.from_numpy(X), csr_to_bag(X_sparse))[1].shape == (64, 3)
+    with pytest.raises(ValueError):
+        NLPHierarchyClassifier(4, 8, [2, 3])(torch.from_numpy(X), csr_to_bag(X_sparse))
+
+
+def test_dataset_batches_carry_the_sparse_rows(sparse_data):
+    X, X_sparse, y = sparse_data
+    dataset = NLPDataset((X, X_sparse), y)
+    xb, yb, (indices, offsets, weights) = dataset[np.array([3, 5])]
+    expected = X_sparse[[3, 5]]
+    assert xb.shape == (2, 4) and yb.shape == (2, 2)
+    assert indices.tolist() == expected.indices.tolist()
+    assert offsets.tolist() == expected.indptr[:-1].tolist()
+    assert len(dataset[7]) == 3
+
+
+def test_trainer_trains_the_sparse_encoder(sparse_data):
+    X, X_sparse, y = sparse_data
+    model = NLPHierarchyClassifier(4, 8, [2, 3], sparse_dim=10)
+    before = model.sparse_encoder.weight.detach().clone()
+    trainer = HierarchyTrainer(model, TrainingConfig(batch_size=16, epochs=1, seed=0), device="cpu")
+    trainer.fit(NLPDataset((X, X_sparse), y))
+    assert not torch.equal(before, model.sparse_encoder.weight.detach())
+
+    with pytest.raises(ValueError):
+        HierarchyTrainer(NLPHierarchyClassifier(4, 8, [2, 3], sparse_dim=10), TrainingConfig(epochs=1), device="cpu").fit(NLPDataset(X, y))
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import datetime
+from decimal import Decimal
+import pandas as pd
+from google.cloud import bigquery
+from config.configuration import DatasetConfig
+from config.obtainInfo import iter_dataframe
+
+
+def test_only_string_fields_are_compacted(fake_client):
+    cfg = DatasetConfig()
+    clean_id = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    table = bigquery.Table(clean_id, schema=[
+        bigquery.SchemaField("country_id", "STRING"),
+        bigquery.SchemaField("price", "NUMERIC"),
+        bigquery.SchemaField("updated", "DATE"),
+        bigquery.SchemaField("tags", "STRING", mode="REPEATED"),
+    ])
+    page = pd.DataFrame({
+        "country_id": ["FR", "FR", "FR", "ES"],
+        "price": [Decimal("1.10")] * 4,
+        "updated": [datetime.date(2026, 1, 1)] * 4,
+        "tags": [["A"], ["A"], ["B"], []],
+    })
+    client = fake_client({clean_id: table}, pages={clean_id: [page.copy()]})
+    chunk, = iter_dataframe(cfg, client, "clean")
+
+    assert isinstance(chunk["country_id"].dtype, pd.CategoricalDtype)
+    for col in ["price", "updated", "tags"]:
+        assert chunk[col].dtype == object
+        assert chunk[col].tolist() == page[col].tolist()
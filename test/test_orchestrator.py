@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import pandas as pd
+import pytest
+from config.configuration import DatasetConfig
+from modules.orchestrator import PipelineOrchestrator
+
+COLS = ["country_id", "barcode", "local_brand_name"]
+
+
+def country_config(country: str, **kwargs) -> DatasetConfig:
+    return DatasetConfig(
+        raw_table=f"products_{country}",
+        clean_table=f"products_{country}_cleaned",
+        excluded_table=f"products_{country}_excluded",
+        **kwargs
+    )
+
+
+def test_configs_write_their_own_mapping(fake_client):
+    configs = [country_config("fr", fuzzy_distance=1), country_config("es", fuzzy_distance=1)]
+    tables = {}
+    for cfg in configs:
+        raw_id = f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}"
+        tables[raw_id] = fake_client.table(raw_id, COLS)
+
+    def answer(sql: str) -> pd.DataFrame:
+        if "AS variant" in sql:
+            brand = "L'OREAL" if "products_fr`" in sql else "LOREAL"
+            return pd.DataFrame({"column_name": ["local_brand_name"], "variant": [brand], "count": [3]})
+        return pd.DataFrame()
+
+    client = fake_client(tables, answer)
+    orchestrator = PipelineOrchestrator(configs, client=client, names=["fr", "es"], max_retries=0)
+    # Distinct tables, the steps of the two configs are independent
+    assert orchestrator.dependencies[("es", "clean")] == set()
+    summary = orchestrator.run()
+    assert {name: result["status"] for name, result in summary.items()} == {"fr": "succeeded", "es": "succeeded"}
+
+    for cfg, brand in zip(configs, ["L'OREAL", "LOREAL"]):
+        mapping_id = f"{cfg.project}.{cfg.dataset}.{cfg.mapping_table}"
+        assert cfg.mapping_table == f"{cfg.clean_table}_mapping"
+        assert client.loads[mapping_id]["variant"].tolist() == [brand]
+        clean_query = next(
+            sql for sql, job_config in client.queries
+            if getattr(job_config, "destination", None) is not None and job_config.destination.table_id == cfg.clean_table
+        )
+        assert f"`{mapping_id}`" in clean_query
+
+
+def test_shared_working_table_is_rejected():
+    configs = [country_config("fr", mapping_table="brands"), country_config("es", mapping_table="brands")]
+    with pytest.raises(ValueError, match="brands is written by the configs fr and es"):
+        PipelineOrchestrator(configs, client=object(), names=["fr", "es"])
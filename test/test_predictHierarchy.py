@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import numpy as np
+import pandas as pd
+import torch
+from config.configuration import TrainingConfig
+from modules.generateEmbedding import FeatureBuilder, generate_embedding, product_description
+from modules.nlp import NLPDataset, NLPHierarchyClassifier, decode_hierarchy
+from modules.predictHierarchy import HierarchyPredictor
+from modules.trainer import HierarchyTrainer
+
+LEVELS = {"a": ["x", "y"], "b": ["z"]}
+
+
+class CharEncoder:
+    def encode(self, texts):
+        return np.array([[len(text), text.count("a"), text.count("b"), text.count("x")] for text in texts], dtype=np.float32)
+
+
+def test_decoding_keeps_the_children_of_the_predicted_parent():
+    masks = [torch.tensor([[True, True, False], [False, False, False]])]
+    logits = [torch.tensor([[2.0, 0.0], [0.0, 2.0]]), torch.tensor([[0.0, 1.0, 5.0], [0.0, 1.0, 5.0]])]
+    codes, confidences = decode_hierarchy(logits, masks)
+    # Class 2 is not a child of class 0, class 1 has no known children
+    assert codes.tolist() == [[0, 1], [1, 2]]
+    expected = torch.softmax(torch.tensor([0.0, 1.0]), dim=0)[1]
+    assert torch.isclose(confidences[0, 1], expected)
+
+
+def test_predictions_are_valid_paths(tmp_path):
+    rng = np.random.default_rng(0)
+    parents = rng.choice(list(LEVELS), 40)
+    df = pd.DataFrame({
+        "country_id": "FR",
+        "barcode": [str(i) for i in range(40)],
+        "item_desc": [f"{parent} item {i}" for i, parent in enumerate(parents)],
+        "local_brand_name": "brand",
+        "global_brand_name": "brand",
+        "hierarchy_level1": parents,
+        "hierarchy_level2": [rng.choice(LEVELS[parent]) for parent in parents],
+    })
+    label_cols = ["hierarchy_level1", "hierarchy_level2"]
+    builder = FeatureBuilder(label_cols=label_cols)
+    X, y = generate_embedding(
+        df.assign(description=product_description(df)), "unused", "description",
+        None, None, None, encoder=CharEncoder(), feature_builder=builder
+    )
+    cfg = TrainingConfig(batch_size=8, epochs=2, seed=0, best_path=str(tmp_path / "best.pt"))
+    HierarchyTrainer(NLPHierarchyClassifier(4, 8, [2, 3]), cfg, builder.label_map, device="cpu").fit(NLPDataset(X, y))
+    builder.save(str(tmp_path / "features.joblib"))
+
+    with HierarchyPredictor(
+        cfg.best_path, str(tmp_path / "features.joblib"), "unused", encoder=CharEncoder(), batch_size=16
+    ) as predictor:
+        output = predictor.predict_chunk(df.drop(columns=label_cols), ["country_id", "barcode"])
+
+    assert output["barcode"].tolist() == df["barcode"].tolist()
+    for parent, child in zip(output["hierarchy_level1"], output["hierarchy_level2"]):
+        assert child in LEVELS[parent]
+    confidences = output[["hierarchy_level1_confidence", "hierarchy_level2_confidence"]]
+    assert ((confidences > 0) & (confidences <= 1)).all().all()
+    assert np.allclose(output["path_confidence"], confidences.prod(axis=1))
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import pytest
+from modules.quantizeModel import post_pooling_normalize
+
+
+class Normalize:
+    pass
+
+
+class Dense:
+    pass
+
+
+def test_modules_after_the_pooling():
+    assert post_pooling_normalize([]) is False
+    assert post_pooling_normalize([Normalize()]) is True
+    with pytest.raises(ValueError, match="Dense"):
+        post_pooling_normalize([Dense(), Normalize()])
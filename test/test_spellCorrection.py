@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import pandas as pd
+import pytest
+from config.configuration import DatasetConfig
+from modules.executionBackend import BigQueryBackend
+
+pytest.importorskip("symspellpy")
+
+COLS = ["country_id", "barcode", "item_desc", "local_brand_name"]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    from correction.spellCorrection import build_spell_index
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("pomme 100\ncanard 80\nbleu 50\n")
+    build_spell_index(str(dictionary), str(tmp_path / "index.pkl"))
+    return str(tmp_path / "index.pkl")
+
+
+def test_brands_of_other_pages_are_protected(index_path, fake_client, monkeypatch):
+    cfg = DatasetConfig(spell_cols="item_desc", brand_cols="local_brand_name", spell_index_path=index_path)
+    clean_id = f"{cfg.project}.{cfg.dataset}.{cfg.clean_table}"
+    pages = [
+        pd.DataFrame({"country_id": ["FR"], "barcode": ["1"], "item_desc": ["POMM CANAR"], "local_brand_name": ["NIKE"]}),
+        pd.DataFrame({"country_id": ["FR"], "barcode": ["2"], "item_desc": ["BLEU"], "local_brand_name": ["POMM"]}),
+    ]
+    queries = []
+
+    def answer(sql: str) -> pd.DataFrame:
+        queries.append(sql)
+        return pd.DataFrame({"value": ["NIKE", "POMM"]})
+
+    client = fake_client({clean_id: fake_client.table(clean_id, COLS)}, answer, pages={clean_id: pages})
+    written = []
+    monkeypatch.setattr(
+        "modules.generateQuery.do_data2table_job",
+        lambda cfg, client, tableType, chunks, schema: written.extend(chunks)
+    )
+    BigQueryBackend(cfg, client).spell_correct()
+
+    assert len(queries) == 1 and "SELECT DISTINCT value" in queries[0]
+    assert pd.concat(written)["item_desc"].tolist() == ["POMM CANARD", "BLEU"]
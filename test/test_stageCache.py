@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import pytest
+from config.configuration import DatasetConfig
+from main import DataCleaningPipeline
+from modules.jobMonitor import RunReport
+from modules.stageCache import StageCache
+
+
+class FakeBackend:
+    """
+    Backend whose table_info is a version per table type, each stage bumps the
+    versions of the tables it writes.
+    """
+    def __init__(self):
+        self.versions = {"raw": 1}
+        self.calls = []
+        self.fail = None
+        self.report = RunReport()
+
+    def get_schema(self, tableType):
+        return []
+
+    def table_info(self, tableType):
+        version = self.versions.get(tableType)
+        return None if version is None else {"last_modified": version, "rows": 10}
+
+    def stage_sql(self, stage, standarize_cols):
+        return f"SELECT {stage}"
+
+    def run(self, stage, writes):
+        self.calls.append(stage)
+        if self.fail == stage:
+            raise RuntimeError(f"{stage} failed")
+        for tableType in writes:
+            self.versions[tableType] = self.versions.get(tableType, 0) + 1
+
+    def clean(self, standarize_cols):
+        self.run("clean", ["clean", "mapping"])
+
+    def validate(self):
+        self.run("validate", ["excluded"])
+
+
+def test_entries_are_valid_until_the_fingerprint_or_outputs_change(tmp_path):
+    path = str(tmp_path / "stages.json")
+    outputs = {"clean": {"last_modified": 1, "rows": 10}}
+    StageCache(path).record("a:clean", "f1", outputs)
+    StageCache(path).record("b:clean", "f2", outputs)
+
+    cache = StageCache(path)
+    assert cache.is_valid("a:clean", "f1", outputs) and cache.is_valid("b:clean", "f2", outputs)
+    assert not cache.is_valid("a:clean", "f2", outputs)
+    assert not cache.is_valid("a:clean", "f1", {"clean": {"last_modified": 2, "rows": 10}})
+    assert not cache.is_valid("a:clean", "f1", {"clean": None})
+    assert not cache.is_valid("c:clean", "f1", outputs)
+
+    cache.invalidate("a:clean")
+    assert set(StageCache(path).stages) == {"b:clean"}
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    cfg = DatasetConfig(stage_cache_path=str(tmp_path / "stages.json"))
+    backend = FakeBackend()
+    DataCleaningPipeline(cfg, backend).run()
+    backend.calls.clear()
+    return lambda: DataCleaningPipeline(cfg, backend).run(), backend
+
+
+def test_unchanged_stages_are_skipped(pipeline):
+    run, backend = pipeline
+    run()
+    assert backend.calls == []
+
+    # A new raw table reruns everything
+    backend.versions["raw"] += 1
+    run()
+    assert backend.calls == ["clean", "validate"]
+
+
+def test_modified_output_reruns_its_stage_only(pipeline):
+    run, backend = pipeline
+    backend.versions["excluded"] += 1
+    run()
+    assert backend.calls == ["validate"]
+
+
+def test_rerun_resumes_from_the_failed_stage(pipeline):
+    run, backend = pipeline
+    backend.versions["raw"] += 1
+    backend.fail = "validate"
+    with pytest.raises(RuntimeError):
+        run()
+    backend.fail = None
+    backend.calls.clear()
+    run()
+    assert backend.calls == ["validate"]
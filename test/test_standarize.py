@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import pandas as pd
+from config.configuration import DatasetConfig
+from modules.executionBackend import BigQueryBackend, LocalBackend
+from modules.localEngine import clean_series
+from modules.standarize import build_frequence_mapping, counts_from_table, frequence_mapping_table
+
+BRANDS = ["l'oreal"] * 5 + ["L OREAL"] * 5 + ["lorel"] * 8
+
+
+def variant_counts(raw: pd.DataFrame, cols: list) -> pd.DataFrame:
+    """
+    Rows of generate_variant_counts_query on a raw dataframe.
+    """
+    tables = []
+    for col in cols:
+        counts = clean_series(raw[col]).dropna().value_counts()
+        tables.append(pd.DataFrame({"column_name": col, "variant": counts.index.to_numpy(dtype=object), "count": counts.to_numpy()}))
+    return pd.concat(tables, ignore_index=True)
+
+
+def test_fuzzy_standard_is_the_most_frequent_variant():
+    table = frequence_mapping_table(["L'OREAL", "L OREAL", "LOREL"], [5, 5, 8], fuzzy_distance=1)
+    assert table["standard"].tolist() == ["LOREL"] * 3
+    assert table["fuzzy"].tolist() == [True, True, False]
+
+
+def test_fuzzy_matches_do_not_chain():
+    # SAMSUNX is 1 edit from SAMSUNG, SAMSUXX 1 edit from SAMSUNX but 2 from SAMSUNG
+    table = frequence_mapping_table(["SAMSUNG", "SAMSUNX", "SAMSUXX"], [10, 5, 3], fuzzy_distance=1)
+    assert table["standard"].tolist() == ["SAMSUNG", "SAMSUNG", "SAMSUXX"]
+    assert table["cluster"].tolist() == ["SAMSUNG", "SAMSUNG", "SAMSUXX"]
+
+
+def test_fuzzy_mapping_parity(tmp_path, fake_client):
+    raw = pd.DataFrame({
+        "country_id": ["FR"] * len(BRANDS),
+        "barcode": [str(1000000 + i) for i in range(len(BRANDS))],
+        "local_brand_name": BRANDS,
+    })
+    cols = ["local_brand_name"]
+
+    cfg = DatasetConfig(backend="local", local_dir=str(tmp_path), fuzzy_distance=1)
+    raw.to_parquet(tmp_path / f"{cfg.raw_table}.parquet", index=False)
+    local = LocalBackend(cfg)
+    local.clean(cols)
+    local_brands = set(local.read_table("clean")["local_brand_name"])
+
+    cfg = DatasetConfig(fuzzy_distance=1)
+    raw_id = f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}"
+    client = fake_client({raw_id: fake_client.table(raw_id, list(raw.columns))}, answer=lambda sql: variant_counts(raw, cols))
+    BigQueryBackend(cfg, client).standarize_mapping(cols)
+    uploaded = client.loads[f"{cfg.project}.{cfg.dataset}.{cfg.mapping_table}"]
+
+    assert local_brands == {"LOREL"}
+    assert set(uploaded["standard"]) == local_brands
+    assert sorted(uploaded["variant"]) == ["L OREAL", "L'OREAL", "LOREL"]
+
+
+def test_counts_from_table_keeps_each_column():
+    counts = counts_from_table(pd.DataFrame({
+        "column_name": ["a", "a", "b"], "variant": ["X", "Y", "X"], "count": [1, 2, 3]
+    }), ["a", "b", "c"])
+    mapping = build_frequence_mapping(counts)
+    assert mapping["a"]["standard"].tolist() == ["X", "Y"]
+    assert mapping["b"]["count"].tolist() == [3]
+    assert mapping["c"].empty
+
+
+def test_exact_standarization_runs_in_the_cleaning_query(fake_client):
+    cfg = DatasetConfig()
+    raw_id = f"{cfg.project}.{cfg.dataset}.{cfg.raw_table}"
+    client = fake_client({raw_id: fake_client.table(raw_id, ["country_id", "barcode", "local_brand_name"])})
+    BigQueryBackend(cfg, client).clean(["local_brand_name"])
+
+    # No counts downloaded nor mapping uploaded, one query writes the clean table
+    assert client.loads == {}
+    (clean_query, job_config), = client.queries
+    assert job_config.destination.table_id == cfg.clean_table
+    assert "local_brand_name_map AS (" in clean_query
+    assert "ARRAY_AGG(local_brand_name ORDER BY cnt DESC, local_brand_name ASC LIMIT 1)" in clean_query
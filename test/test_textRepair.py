@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import re
+import pandas as pd
+import pytest
+from correction.textRepair import TextRepairer
+
+CASES = [
+    # Truncated key inside a longer word: left alone
+    ("El casopl?n", "El casopl?n"),
+    # Whole cell, and the longer key of the same title
+    ("El casopl?", "El casoplón"),
+    ("es El casopl?n", "es El casoplón"),
+    # Inside a longer text, followed by a punctuation or a space
+    ("Ver El casopl?, hoy", "Ver El casoplón, hoy"),
+    ("Misi?n Panda", "Misión Panda"),
+    ("Misi?nes", "Misi?nes"),
+    ("Acci?n y Animaci?n", "Acción y Animación"),
+]
+
+
+@pytest.fixture(params=["automaton", "regex"])
+def repairer(request):
+    repairer = TextRepairer(["es_cinema"])
+    if request.param == "regex":
+        keys = sorted(repairer.corrections, key=len, reverse=True)
+        repairer.automaton = None
+        repairer.pattern = re.compile("(?:" + "|".join(re.escape(key) for key in keys) + r")(?!\w)")
+    elif repairer.automaton is None:
+        pytest.skip("pyahocorasick is not installed")
+    return repairer
+
+
+@pytest.mark.parametrize("text, expected", CASES)
+def test_repair_text_word_boundary(repairer, text, expected):
+    assert repairer.repair_text(text) == expected
+
+
+def test_repair_series_keeps_other_cells(repairer):
+    s = pd.Series(["El casopl?n", "El casopl?", None, "sin marca"])
+    repaired = repairer.repair_series(s)
+    assert repaired[[0, 1, 3]].tolist() == ["El casopl?n", "El casoplón", "sin marca"]
+    assert pd.isna(repaired[2])
+
+
+def test_shorter_key_when_longest_is_not_a_word():
+    repairer = TextRepairer(extra_dict={"ab?": "abé", "ab?c": "abéc"})
+    assert repairer.repair_text("ab?cd") == "ab?cd"
+    assert repairer.repair_text("ab? x ab?c") == "abé x abéc"
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#Author: Liuxin YANG
+#Date: 2026-10-18
+
+import numpy as np
+import pytest
+import torch
+from config.configuration import TrainingConfig
+from modules.nlp import NLPDataset, NLPHierarchyClassifier
+from modules.trainer import HierarchyTrainer, load_classifier
+
+VOCABULARIES = {"hierarchy_level1": {"a": 0, "b": 1}, "hierarchy_level2": {"x": 0, "y": 1, "z": 2}}
+
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((64, 4)).astype(np.float32)
+    level1 = rng.integers(0, 2, 64)
+    return NLPDataset(X, np.stack([level1, level1 + rng.integers(0, 2, 64)], axis=1))
+
+
+def trainer(tmp_path, **kwargs):
+    cfg = TrainingConfig(
+        batch_size=16, seed=0, val_fraction=0.25,
+        checkpoint_path=str(tmp_path / "last.pt"), best_path=str(tmp_path / "best.pt"), **kwargs
+    )
+    return HierarchyTrainer(NLPHierarchyClassifier(4, 8, [2, 3]), cfg, VOCABULARIES, device="cpu")
+
+
+def test_fit_resumes_from_the_last_checkpoint(tmp_path, dataset, capsys):
+    first = trainer(tmp_path, epochs=2, min_delta=-1)
+    first.fit(dataset)
+    assert torch.load(tmp_path / "last.pt", weights_only=False)["epoch"] == 2
+
+    resumed = trainer(tmp_path, epochs=3, min_delta=-1)
+    history = resumed.fit(dataset)
+    assert "Resumed from" in capsys.readouterr().out
+    # Only the third epoch is trained, after the two of the checkpoint
+    assert [metrics["epoch"] for metrics in history] == [1, 2, 3]
+    assert history[:2] == first.history
+    assert torch.load(tmp_path / "last.pt", weights_only=False)["epoch"] == 3
+
+
+def test_fit_stops_early_and_keeps_the_best_epoch(tmp_path, dataset, capsys):
+    fitted = trainer(tmp_path, epochs=10, patience=2, min_delta=10)
+    history = fitted.fit(dataset)
+    # No epoch improves by min_delta on the first one
+    assert len(history) == 3 and fitted.bad_epochs == 2
+    assert "Early stopping" in capsys.readouterr().out
+
+    best = torch.load(tmp_path / "best.pt", weights_only=False)
+    assert best["epoch"] == 1
+    for name, weights in fitted.model.state_dict().items():
+        assert torch.equal(weights, best["model"][name])
+
+
+def test_best_checkpoint_rebuilds_the_classifier(tmp_path, dataset):
+    fitted = trainer(tmp_path, epochs=2, min_delta=-1)
+    fitted.fit(dataset)
+    model, vocabularies, masks = load_classifier(str(tmp_path / "best.pt"))
+    xb = dataset[np.arange(8)][0]
+    for loaded, trained in zip(model(xb), fitted.model.eval()(xb)):
+        assert torch.allclose(loaded, trained)
+    assert vocabularies == VOCABULARIES
+    # Level 2 is level 1 or level 1 + 1 in the training labels
+    assert masks[0].tolist() == [[True, True, False], [False, True, True]]